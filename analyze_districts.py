@@ -27,8 +27,14 @@ def parse_price_level(price_str):
         return 1
     return None
 
-def analyze_districts():
-    """Analyze restaurant distribution with deep insights."""
+RECOMMENDATIONS_FILE = 'static/district_recommendations.json'
+
+def analyze_districts(only_pc4s=None):
+    """Analyze restaurant distribution with deep insights.
+    
+    When only_pc4s is given, only those districts are recomputed and patched
+    into the existing recommendations file.
+    """
     
     # Load restaurant data
     with open('restaurants_data.json', 'r', encoding='utf-8') as f:
@@ -85,7 +91,19 @@ def analyze_districts():
     # Analyze each district
     recommendations = {}
     
+    if only_pc4s is not None:
+        try:
+            with open(RECOMMENDATIONS_FILE, 'r', encoding='utf-8') as f:
+                recommendations = json.load(f)
+        except FileNotFoundError:
+            only_pc4s = None
+        else:
+            for pc4 in only_pc4s:
+                recommendations.pop(pc4, None)
+    
     for pc4, data in districts.items():
+        if only_pc4s is not None and pc4 not in only_pc4s:
+            continue
         if data['total'] < 5:  # Skip districts with too few restaurants
             continue
         
@@ -186,11 +204,14 @@ def analyze_districts():
         }
     
     # Save recommendations
-    with open('static/district_recommendations.json', 'w', encoding='utf-8') as f:
+    with open(RECOMMENDATIONS_FILE, 'w', encoding='utf-8') as f:
         json.dump(recommendations, f, indent=2, ensure_ascii=False)
     
-    print(f"\n✓ Generated deep analysis for {len(recommendations)} districts")
-    print("✓ Saved to static/district_recommendations.json")
+    if only_pc4s is not None:
+        print(f"\n✓ Patched deep analysis for {len(only_pc4s)} districts")
+    else:
+        print(f"\n✓ Generated deep analysis for {len(recommendations)} districts")
+    print(f"✓ Saved to {RECOMMENDATIONS_FILE}")
     
     # Print sample
     print("\nSample analysis:")
@@ -4,23 +4,48 @@ Batch analyzer for generating AI insights for all Amsterdam districts.
 Pre-generates and caches analyses for instant access.
 """
 
+import argparse
+import asyncio
+import hashlib
 import json
+import os
 import time
 from datetime import datetime
 from pathlib import Path
 from district_analytics import DistrictAnalytics
-from llm_analyzer import LLMAnalyzer
+from llm_analyzer import LLMAnalyzer, render_sections
+from llm_router import ModelRouter, BATCH
+from llm_metrics import format_summary
+from analyze_districts import analyze_districts
+from json_utils import convert_numpy_types, write_json_atomic
+from rate_limiter import TokenBucket
 
 
 class BatchAnalyzer:
-    def __init__(self, data_file='restaurants_data.json', cache_file='district_analyses_cache.json'):
+    def __init__(self, data_file='restaurants_data.json', cache_file='district_analyses_cache.json',
+                 concurrency=4, batch_size=1):
         self.data_file = data_file
         self.cache_file = cache_file
+        # Append-only per-district results of the current run
+        self.checkpoint_file = str(Path(cache_file).with_suffix('.jsonl'))
+        self.concurrency = concurrency
+        # Districts packed into one LLM call (1 = one prompt per district)
+        self.batch_size = max(1, batch_size)
         self.district_analytics = DistrictAnalytics(data_file)
-        self.llm = LLMAnalyzer()
+        self.router = ModelRouter()
+        # Primary batch model, used for batched prompts and the fallback text
+        self.llm = LLMAnalyzer(model=self.router.routes[BATCH]['models'][0])
         
-    def generate_all_analyses(self, rate_limit_seconds=1):
-        """Generate AI insights for all districts and cache them."""
+    def generate_all_analyses(self, rate_limit_seconds=1, resume=False):
+        """Generate AI insights for all districts and cache them.
+        
+        Analytics are computed for every district up front; insights are then
+        generated by a pool of self.concurrency workers, starting at most one
+        request every rate_limit_seconds (0 disables the limit). Each finished
+        district is appended to the checkpoint file. With resume=True, districts
+        whose analytics fingerprint matches an entry in the cache or checkpoint
+        are reused instead of regenerated.
+        """
         print("=" * 70)
         print("BATCH DISTRICT ANALYSIS - AI INSIGHTS GENERATION")
         print("=" * 70)
@@ -30,7 +55,8 @@ class BatchAnalyzer:
         total_districts = len(districts_summary)
         
         print(f"\nTotal districts to process: {total_districts}")
-        print(f"Estimated time: ~{total_districts * 8 / 60:.1f} minutes")
+        print(f"Concurrency: {self.concurrency} worker(s)")
+        print(f"Batch size: {self.batch_size} district(s) per LLM call")
         print(f"Rate limit: {rate_limit_seconds} second(s) between requests\n")
         
         # Check if LLM is available
@@ -42,8 +68,13 @@ class BatchAnalyzer:
             print("✓ Ollama is running and ready")
             use_llm = True
         
-        # Load existing cache if available
-        cache = self._load_cache()
+        # Entries from the last completed run and any interrupted one
+        if resume:
+            previous = self._load_previous_entries()
+            print(f"✓ Found {len(previous)} previously generated districts")
+        else:
+            previous = {}
+            self._clear_checkpoint()
         
         # Process each district
         results = {
@@ -54,51 +85,25 @@ class BatchAnalyzer:
         }
         
         start_time = time.time()
+        metrics_mark = self.llm.metrics.mark()
         
-        for idx, district_summary in enumerate(districts_summary, 1):
-            pc4 = district_summary['pc4']
-            
-            print(f"\n[{idx}/{total_districts}] Processing {pc4}...")
-            
-            try:
-                # Get detailed analytics
-                analytics_data = self.district_analytics.get_detailed_analytics(pc4)
-                
-                if analytics_data and 'error' not in analytics_data:
-                    # Generate AI insights
-                    print(f"  → Generating AI insights...")
-                    insight_start = time.time()
-                    
-                    if use_llm:
-                        try:
-                            insights = self.llm.generate_district_analysis(pc4, analytics_data)
-                        except Exception as e:
-                            print(f"  ⚠️  LLM error: {e}, using fallback")
-                            insights = self.llm._generate_fallback_analysis(pc4, analytics_data)
-                    else:
-                        insights = self.llm._generate_fallback_analysis(pc4, analytics_data)
-                    
-                    insight_time = time.time() - insight_start
-                    
-                    # Store in results
-                    results['districts'][pc4] = {
-                        'analytics': analytics_data,
-                        'ai_insights': insights,
-                        'generated_at': datetime.now().isoformat(),
-                        'generation_time_seconds': round(insight_time, 2)
-                    }
-                    
-                    print(f"  ✓ Complete ({insight_time:.1f}s) - {len(insights)} characters")
-                    
-                    # Rate limiting
-                    if idx < total_districts:
-                        time.sleep(rate_limit_seconds)
-                else:
-                    print(f"  ✗ Skipped - insufficient data")
-                    
-            except Exception as e:
-                print(f"  ✗ Error: {e}")
-                continue
+        jobs = self._compute_analytics([d['pc4'] for d in districts_summary])
+        print(f"✓ Computed analytics for {len(jobs)} districts in {time.time() - start_time:.1f}s")
+        
+        reused = {
+            pc4: previous[pc4] for pc4, analytics_data in jobs.items()
+            if self._is_reusable(previous.get(pc4), analytics_data, use_llm)
+        }
+        if resume:
+            print(f"✓ Skipping {len(reused)} unchanged districts, generating {len(jobs) - len(reused)}")
+        
+        generated = self._generate_insights(
+            {pc4: a for pc4, a in jobs.items() if pc4 not in reused}, use_llm, rate_limit_seconds, previous
+        )
+        results['districts'] = {
+            pc4: reused.get(pc4) or generated[pc4]
+            for pc4 in jobs if pc4 in reused or pc4 in generated
+        }
         
         total_time = time.time() - start_time
         
@@ -108,9 +113,12 @@ class BatchAnalyzer:
         print(f"{'=' * 70}")
         print(f"Total time: {total_time / 60:.1f} minutes")
         print(f"Districts processed: {len(results['districts'])}/{total_districts}")
-        print(f"Average time per district: {total_time / len(results['districts']):.1f}s")
+        if results['districts']:
+            print(f"Average time per district: {total_time / len(results['districts']):.1f}s")
+        self._print_llm_metrics(metrics_mark)
         
         self._save_cache(results)
+        self._clear_checkpoint()
         print(f"\n✓ Cache saved to: {self.cache_file}")
         
         # Export text reports
@@ -118,6 +126,380 @@ class BatchAnalyzer:
         
         return results
     
+    def update_dirty_analyses(self, rate_limit_seconds=1):
+        """Regenerate insights only for districts whose prompt inputs changed.
+        
+        Analytics are recomputed for every district, since citywide benchmarks,
+        underserved-cuisine popularity and the neighbour-smoothed spatial context
+        also change when other districts' restaurants do. Where only values the
+        prompts don't show changed, the cached analytics are refreshed and the
+        insights kept; insights are regenerated (stale sections only) where the
+        rendered prompt data changed.
+        """
+        print("=" * 70)
+        print("INCREMENTAL DISTRICT ANALYSIS - DIRTY DISTRICTS ONLY")
+        print("=" * 70)
+        
+        cache = self._load_cache()
+        if not cache or not cache.get('districts'):
+            print("\nNo existing cache found, running full batch instead.")
+            return self.generate_all_analyses(rate_limit_seconds)
+        
+        # Districts that qualify for analysis in the new dataset
+        current_districts = [d['pc4'] for d in self.district_analytics.get_district_summary()]
+        jobs = self._compute_analytics(current_districts)
+        
+        dirty = []
+        refreshed = []
+        for pc4, analytics_data in jobs.items():
+            entry = cache['districts'].get(pc4)
+            if not entry or entry.get('prompt_fingerprint') != self.llm.prompt_fingerprint(analytics_data):
+                dirty.append(pc4)
+            elif entry.get('analytics_fingerprint') != self._analytics_fingerprint(analytics_data):
+                refreshed.append(pc4)
+        dirty.sort()
+        removed = sorted(set(cache['districts']) - set(jobs))
+        
+        print(f"\nDistricts in dataset: {len(current_districts)}")
+        print(f"Dirty districts (prompt data changed): {len(dirty)}")
+        print(f"Refreshed analytics (insights kept): {len(refreshed)}")
+        print(f"Removed districts: {len(removed)}")
+        
+        if not dirty and not refreshed and not removed:
+            print("\n✓ Cache is up to date")
+            return cache
+        
+        fingerprints = self.district_analytics.get_district_fingerprints()
+        for pc4 in refreshed:
+            cache['districts'][pc4].update({
+                'analytics': jobs[pc4],
+                'data_fingerprint': fingerprints.get(pc4),
+                'analytics_fingerprint': self._analytics_fingerprint(jobs[pc4])
+            })
+        
+        use_llm = self.llm.check_availability()
+        if not use_llm:
+            print("⚠️  WARNING: Ollama is not running. Using fallback analysis.")
+        
+        start_time = time.time()
+        metrics_mark = self.llm.metrics.mark()
+        
+        for pc4 in removed:
+            del cache['districts'][pc4]
+        
+        # Only sections whose analytics inputs changed are regenerated
+        entries = self._generate_insights(
+            {pc4: jobs[pc4] for pc4 in dirty}, use_llm, rate_limit_seconds, previous=cache['districts']
+        )
+        
+        for pc4 in dirty:
+            if pc4 in entries:
+                cache['districts'][pc4] = entries[pc4]
+            else:
+                cache['districts'].pop(pc4, None)
+        
+        cache['generated_at'] = datetime.now().isoformat()
+        cache['total_districts'] = len(current_districts)
+        cache['llm_used'] = cache.get('llm_used', False) or use_llm
+        
+        print(f"\n{'=' * 70}")
+        print(f"INCREMENTAL UPDATE COMPLETE ({time.time() - start_time:.1f}s)")
+        print(f"{'=' * 70}")
+        self._print_llm_metrics(metrics_mark)
+        
+        self._save_cache(cache)
+        self._clear_checkpoint()
+        print(f"\n✓ Cache patched: {self.cache_file}")
+        
+        # Reports also show analytics the prompts don't, e.g. citywide cuisine popularity
+        self._export_text_reports(cache, only_pc4s=set(dirty) | set(refreshed), removed_pc4s=removed)
+        
+        # The map recommendations compare every district with citywide averages,
+        # so they are rebuilt as a whole (a single cheap pass over the data)
+        analyze_districts()
+        
+        return cache
+    
+    def _print_llm_metrics(self, since):
+        """Print token throughput and latency of the LLM calls made this run."""
+        summary = self.llm.metrics.summary(since)
+        if summary['calls']:
+            print()
+            print(format_summary(summary, title="LLM THROUGHPUT"))
+    
+    def _compute_analytics(self, pc4s):
+        """Compute detailed analytics for each district, skipping thin ones."""
+        jobs = {}
+        
+        for pc4 in pc4s:
+            try:
+                analytics_data = self.district_analytics.get_detailed_analytics(pc4)
+            except Exception as e:
+                print(f"  ✗ {pc4}: Error computing analytics: {e}")
+                continue
+            
+            if not analytics_data or 'error' in analytics_data:
+                print(f"  ✗ {pc4}: Skipped - insufficient data")
+                continue
+            
+            jobs[pc4] = analytics_data
+        
+        return jobs
+    
+    def _generate_insights(self, jobs, use_llm, rate_limit_seconds=1, previous=None):
+        """Generate insights for {pc4: analytics} through the async worker pool.
+        
+        previous maps PC4s to their earlier cache entries; their insight
+        sections are reused where the underlying analytics are unchanged.
+        """
+        fingerprints = self.district_analytics.get_district_fingerprints()
+        requests_per_second = 1 / rate_limit_seconds if rate_limit_seconds else None
+        
+        return asyncio.run(
+            self._generate_concurrently(jobs, use_llm, fingerprints, requests_per_second, previous or {})
+        )
+    
+    async def _generate_concurrently(self, jobs, use_llm, fingerprints, requests_per_second, previous):
+        """Run district generations on a bounded worker pool, collecting results as they finish.
+        
+        With batch_size > 1 (and the LLM available) each queue item is a chunk
+        of districts generated by one batched call.
+        """
+        queue = asyncio.Queue()
+        items = list(jobs.items())
+        chunk_size = self.batch_size if use_llm else 1
+        for i in range(0, len(items), chunk_size):
+            queue.put_nowait(items[i:i + chunk_size])
+        
+        bucket = TokenBucket(requests_per_second, capacity=self.concurrency) if requests_per_second else None
+        entries = {}
+        total = len(jobs)
+        
+        async def worker():
+            while True:
+                try:
+                    chunk = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                
+                if bucket:
+                    await bucket.acquire()
+                
+                try:
+                    chunk_entries = await asyncio.to_thread(
+                        self._generate_chunk, chunk, use_llm, fingerprints, previous
+                    )
+                except Exception as e:
+                    # Only reached if even the fallback failed; the rest of the run goes on
+                    print(f"  ✗ {', '.join(pc4 for pc4, _ in chunk)}: Error: {e}")
+                    continue
+                
+                for pc4, entry in chunk_entries.items():
+                    entries[pc4] = entry
+                    try:
+                        self._append_checkpoint(pc4, entry)
+                    except Exception as e:
+                        print(f"  ⚠️  {pc4}: checkpoint write failed: {e}")
+                    print(f"  [{len(entries)}/{total}] ✓ {pc4} ({entry['generation_time_seconds']:.1f}s) "
+                          f"- {len(entry['ai_insights'])} characters")
+        
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, min(self.concurrency, queue.qsize())))]
+        await asyncio.gather(*workers)
+        
+        return entries
+    
+    def _generate_chunk(self, chunk, use_llm, fingerprints, previous):
+        """Generate entries for a list of (pc4, analytics) pairs.
+        
+        Chunks of several districts share one batched LLM call; districts with
+        earlier sections to reuse, and those that cannot be split out of the
+        batched response, are generated one by one.
+        """
+        singles = chunk if len(chunk) == 1 or not use_llm else [
+            (pc4, analytics_data) for pc4, analytics_data in chunk if previous.get(pc4, {}).get('sections')
+        ]
+        entries = {
+            pc4: self._generate_entry(pc4, analytics_data, use_llm, fingerprints.get(pc4), previous.get(pc4))
+            for pc4, analytics_data in singles
+        }
+        chunk = [(pc4, analytics_data) for pc4, analytics_data in chunk if pc4 not in entries]
+        if not chunk:
+            return entries
+        
+        batch_start = time.time()
+        try:
+            insights = self.llm.generate_batch_analyses(dict(chunk))
+        except Exception as e:
+            # Every district of the chunk is generated individually below
+            print(f"  ⚠️  Batched LLM call failed: {e}")
+            insights = {}
+        # Attribute the batched call's time evenly to the districts it produced
+        per_district = (time.time() - batch_start) / max(1, len(insights))
+        
+        for pc4, analytics_data in chunk:
+            if pc4 in insights:
+                try:
+                    entries[pc4] = self._build_entry(
+                        analytics_data, insights[pc4], use_llm, fingerprints.get(pc4), per_district, self.llm.model
+                    )
+                    continue
+                except Exception as e:
+                    print(f"  ⚠️  {pc4}: Error: {e}, generating individually")
+            else:
+                print(f"  ⚠️  {pc4}: missing from batched response, generating individually")
+            entries[pc4] = self._generate_entry(pc4, analytics_data, use_llm, fingerprints.get(pc4))
+        
+        return entries
+    
+    def _generate_entry(self, pc4, analytics_data, use_llm, data_fingerprint=None, previous_entry=None):
+        """Generate AI insights for one district and build its cache entry.
+        
+        Insights are written as structured sections; sections of previous_entry
+        whose analytics inputs are unchanged are kept as they are.
+        """
+        insight_start = time.time()
+        
+        try:
+            return self._generate_llm_entry(
+                pc4, analytics_data, use_llm, data_fingerprint, previous_entry, insight_start
+            )
+        except Exception as e:
+            # One district's failure must not stop the batch run
+            print(f"  ⚠️  {pc4}: Error: {e}, using fallback")
+            insights = self.llm._generate_fallback_analysis(pc4, analytics_data)
+            return self._build_entry(analytics_data, insights, False, data_fingerprint, time.time() - insight_start)
+    
+    def _generate_llm_entry(self, pc4, analytics_data, use_llm, data_fingerprint, previous_entry, insight_start):
+        """Route one district's generation across the LLM models and build its entry."""
+        model = None
+        sections = None
+        if use_llm:
+            # Larger batch model first, smaller ones when it breaches its latency budget
+            previous_sections = (previous_entry or {}).get('sections')
+            sections, regenerated, model = self.router.route_section_analysis(
+                pc4, analytics_data, previous_sections, mode=BATCH
+            )
+            if sections is not None:
+                insights = render_sections(sections)
+                if previous_sections:
+                    print(f"  ↻ {pc4}: regenerated {len(regenerated)}/{len(sections)} sections "
+                          f"({', '.join(regenerated) or 'none'})")
+            else:
+                # Sections failed on every model; try a single free-text analysis
+                insights, model = self.router.route_district_analysis(pc4, analytics_data, mode=BATCH)
+                if model is None:
+                    print(f"  ⚠️  {pc4}: no LLM model succeeded, using fallback")
+        else:
+            insights = self.llm._generate_fallback_analysis(pc4, analytics_data)
+        
+        return self._build_entry(
+            analytics_data, insights, model is not None, data_fingerprint, time.time() - insight_start, model, sections
+        )
+    
+    def _build_entry(self, analytics_data, insights, use_llm, data_fingerprint, insight_time, model=None,
+                     sections=None):
+        """Build a district cache entry."""
+        return {
+            'analytics': analytics_data,
+            'ai_insights': insights,
+            'sections': sections,
+            'llm_used': use_llm,
+            'model': model,
+            'data_fingerprint': data_fingerprint,
+            'analytics_fingerprint': self._analytics_fingerprint(analytics_data),
+            'prompt_fingerprint': self.llm.prompt_fingerprint(analytics_data),
+            'generated_at': datetime.now().isoformat(),
+            'generation_time_seconds': round(insight_time, 2)
+        }
+    
+    def compare_batch_throughput(self, sample_size=8, batch_sizes=(1, 4)):
+        """Compare one-by-one and batched generation on the same districts.
+        
+        Generations bypass the response cache so every mode pays for real
+        LLM calls. Returns per batch size: wall time, districts per minute,
+        LLM token counts and how many districts fell back to single calls.
+        """
+        pc4s = [d['pc4'] for d in self.district_analytics.get_district_summary()[:sample_size]]
+        jobs = self._compute_analytics(pc4s)
+        items = list(jobs.items())
+        report = {}
+        
+        for batch_size in batch_sizes:
+            mark = self.llm.metrics.mark()
+            start = time.time()
+            fallbacks = 0
+            
+            for i in range(0, len(items), batch_size):
+                chunk = dict(items[i:i + batch_size])
+                if batch_size > 1:
+                    insights = self.llm.generate_batch_analyses(chunk, use_cache=False)
+                else:
+                    insights = {}
+                missing = [pc4 for pc4 in chunk if pc4 not in insights]
+                if batch_size > 1:
+                    fallbacks += len(missing)
+                for pc4 in missing:
+                    self.llm.generate_district_analysis(pc4, chunk[pc4], use_cache=False)
+            
+            elapsed = time.time() - start
+            metrics = self.llm.metrics.summary(mark)
+            report[batch_size] = {
+                'districts': len(items),
+                'llm_calls': metrics['calls'],
+                'seconds': round(elapsed, 1),
+                'districts_per_minute': round(len(items) / elapsed * 60, 1) if elapsed else None,
+                'prompt_tokens': metrics['prompt_tokens'],
+                'eval_tokens': metrics['eval_tokens'],
+                'single_call_fallbacks': fallbacks
+            }
+        
+        return report
+    
+    def _analytics_fingerprint(self, analytics_data):
+        """Stable hash of a district's analytics, used to detect unchanged inputs."""
+        canonical = json.dumps(convert_numpy_types(analytics_data), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+    
+    def _is_reusable(self, entry, analytics_data, use_llm):
+        """Whether a previous entry still matches the district's analytics."""
+        if not entry or not entry.get('analytics_fingerprint'):
+            return False
+        # Don't keep fallback text once the LLM is available again
+        if use_llm and not entry.get('llm_used', True):
+            return False
+        return entry['analytics_fingerprint'] == self._analytics_fingerprint(analytics_data)
+    
+    def _load_previous_entries(self):
+        """Merge entries from the cache file with newer checkpointed ones."""
+        cache = self._load_cache() or {}
+        entries = dict(cache.get('districts', {}))
+        
+        checkpoint_path = Path(self.checkpoint_file)
+        if checkpoint_path.exists():
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final line from a crash mid-write
+                        continue
+                    entries[record.pop('pc4')] = record
+        
+        return entries
+    
+    def _append_checkpoint(self, pc4, entry):
+        """Durably append one finished district to the checkpoint file."""
+        line = json.dumps({'pc4': pc4, **convert_numpy_types(entry)}, ensure_ascii=False)
+        
+        with open(self.checkpoint_file, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _clear_checkpoint(self):
+        """Remove the checkpoint once its entries are in the cache file."""
+        Path(self.checkpoint_file).unlink(missing_ok=True)
+    
     def _load_cache(self):
         """Load existing cache if available."""
         cache_path = Path(self.cache_file)
@@ -127,16 +509,17 @@ class BatchAnalyzer:
         return None
     
     def _save_cache(self, data):
-        """Save cache to file."""
-        # Convert numpy types before saving
-        from server import convert_numpy_types
-        data = convert_numpy_types(data)
+        """Save cache to file.
         
-        with open(self.cache_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        Written via a temp file and rename, as the server may read it meanwhile.
+        """
+        write_json_atomic(self.cache_file, convert_numpy_types(data))
     
-    def _export_text_reports(self, results):
-        """Export text reports for presentations."""
+    def _export_text_reports(self, results, only_pc4s=None, removed_pc4s=()):
+        """Export text reports for presentations.
+        
+        When only_pc4s is given, only those district reports are rewritten.
+        """
         print(f"\n{'=' * 70}")
         print("EXPORTING TEXT REPORTS")
         print(f"{'=' * 70}")
@@ -145,8 +528,15 @@ class BatchAnalyzer:
         reports_dir = Path('district_reports')
         reports_dir.mkdir(exist_ok=True)
         
+        # Drop reports of districts that no longer qualify
+        for pc4 in removed_pc4s:
+            (reports_dir / f"district_{pc4}_analysis.txt").unlink(missing_ok=True)
+        
         # Export individual district reports
         for pc4, data in results['districts'].items():
+            if only_pc4s is not None and pc4 not in only_pc4s:
+                continue
+            
             report_file = reports_dir / f"district_{pc4}_analysis.txt"
             
             with open(report_file, 'w', encoding='utf-8') as f:
@@ -199,7 +589,8 @@ class BatchAnalyzer:
                 f.write(f"Report generated: {data['generated_at']}\n")
                 f.write("=" * 70 + "\n")
         
-        print(f"✓ Exported {len(results['districts'])} individual district reports")
+        exported = len(results['districts']) if only_pc4s is None else len(only_pc4s)
+        print(f"✓ Exported {exported} individual district reports")
         
         # Export summary report
         summary_file = reports_dir / "city_wide_summary.txt"
@@ -237,10 +628,45 @@ class BatchAnalyzer:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Batch AI insights for all districts')
+    parser.add_argument('--incremental',
+                        action='store_true',
+                        help='Only regenerate districts whose restaurants changed since the cached run')
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Reuse cached/checkpointed districts whose analytics are unchanged')
+    parser.add_argument('--concurrency',
+                        type=int,
+                        default=4,
+                        help='Number of concurrent LLM generations (default: 4)')
+    parser.add_argument('--batch-size',
+                        type=int,
+                        default=1,
+                        help='Districts packed into one LLM call (default: 1)')
+    parser.add_argument('--compare-batching',
+                        type=int,
+                        metavar='N',
+                        help='Compare one-by-one and batched generation throughput over N districts')
+    args = parser.parse_args()
+    
+    if args.compare_batching:
+        analyzer = BatchAnalyzer(batch_size=args.batch_size)
+        batch_sizes = (1, args.batch_size if args.batch_size > 1 else 4)
+        print(f"Comparing batch sizes {batch_sizes} over {args.compare_batching} districts...")
+        for batch_size, stats in analyzer.compare_batch_throughput(args.compare_batching, batch_sizes).items():
+            print(f"  batch size {batch_size}: {stats['seconds']}s for {stats['districts']} districts "
+                  f"({stats['districts_per_minute']}/min), {stats['llm_calls']} LLM calls, "
+                  f"{stats['prompt_tokens']:,} prompt + {stats['eval_tokens']:,} generated tokens, "
+                  f"{stats['single_call_fallbacks']} single-call fallbacks")
+        raise SystemExit(0)
+    
     print("\nStarting batch analysis...\n")
     
-    analyzer = BatchAnalyzer()
-    results = analyzer.generate_all_analyses(rate_limit_seconds=0.5)
+    analyzer = BatchAnalyzer(concurrency=args.concurrency, batch_size=args.batch_size)
+    if args.incremental:
+        results = analyzer.update_dirty_analyses(rate_limit_seconds=0.5)
+    else:
+        results = analyzer.generate_all_analyses(rate_limit_seconds=0.5, resume=args.resume)
     
     print(f"\n{'=' * 70}")
     print("ALL DONE!")
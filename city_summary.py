@@ -4,19 +4,153 @@ City-wide summary generator for Amsterdam restaurant market.
 Aggregates insights across all districts and generates strategic recommendations.
 """
 
+import bisect
+import hashlib
+import heapq
 import json
+import os
+import threading
+from datetime import datetime
 from pathlib import Path
-from collections import Counter, defaultdict
+import numpy as np
 from llm_analyzer import LLMAnalyzer
+from json_utils import convert_numpy_types, write_json_atomic
+
+
+DISTRICT_CACHE_FILE = 'district_analyses_cache.json'
+# Persisted LLM narrative, keyed by a hash of its prompt
+RECOMMENDATIONS_CACHE_FILE = 'city_summary_cache.json'
+
+# Never suggested as underserved cuisines
+EXCLUDED_CUISINES = {'cannabis store', 'coffee shop', 'coffeeshop'}
+
+
+# Quality vs saturation quadrants
+QUADRANTS = (
+    'high_quality_low_saturation',   # Best opportunities
+    'high_quality_high_saturation',  # Competitive markets
+    'low_quality_low_saturation',    # Emerging markets
+    'low_quality_high_saturation'    # Challenging markets
+)
+
+
+def _district_row(data):
+    """Summary fields of one district cache entry.
+    
+    Categorical fields keep None when missing; each section applies its own default.
+    """
+    analytics = data['analytics']
+    overview = analytics.get('overview', {})
+    opp = analytics.get('growth_opportunities', {})
+    comp = analytics.get('competition_analysis', {})
+    underserved = opp.get('underserved_cuisines', [])
+    
+    return {
+        'potential': float(opp.get('market_potential_score', 0)),
+        'restaurant_count': int(overview.get('total_restaurants', 0)),
+        'avg_rating': float(overview.get('avg_rating', 0)),
+        'quality_gap': float(opp.get('quality_improvement_potential', 0)),
+        'underserved_count': len(underserved),
+        'saturation': comp.get('market_saturation'),
+        'positioning': analytics.get('market_positioning', {}).get('positioning'),
+        'entry_barriers': comp.get('entry_barriers', 'High'),
+        'underserved': [
+            c['cuisine'] for c in underserved if c['cuisine'].lower() not in EXCLUDED_CUISINES
+        ]
+    }
+
+
+class DistrictTable:
+    """Columnar view of the district cache: one array per summary field, one row per PC4."""
+    
+    NUMERIC = ('potential', 'restaurant_count', 'avg_rating', 'quality_gap', 'underserved_count')
+    CATEGORICAL = ('saturation', 'positioning', 'entry_barriers')
+    
+    def __init__(self, pc4s, rows):
+        self.pc4s = list(pc4s)
+        self.potential = np.array([r['potential'] for r in rows], dtype=float)
+        self.restaurant_count = np.array([r['restaurant_count'] for r in rows], dtype=int)
+        self.avg_rating = np.array([r['avg_rating'] for r in rows], dtype=float)
+        self.quality_gap = np.array([r['quality_gap'] for r in rows], dtype=float)
+        self.underserved_count = np.array([r['underserved_count'] for r in rows], dtype=int)
+        self.saturation = np.array([r['saturation'] for r in rows], dtype=object)
+        self.positioning = np.array([r['positioning'] for r in rows], dtype=object)
+        self.entry_barriers = np.array([r['entry_barriers'] for r in rows], dtype=object)
+        # Long format: one (district row, cuisine) pair per underserved cuisine
+        self.underserved_rows = np.array([i for i, r in enumerate(rows) for _ in r['underserved']], dtype=int)
+        self.underserved_cuisines = np.array([c for r in rows for c in r['underserved']], dtype=object)
+    
+    def __len__(self):
+        return len(self.pc4s)
+    
+    @classmethod
+    def from_districts(cls, districts_data):
+        """Flatten {pc4: cache entry} in a single pass."""
+        return cls(districts_data.keys(), [_district_row(data) for data in districts_data.values()])
+
+
+def _descending(values):
+    """Indices sorting values high to low, ties kept in table order (like a stable reverse sort)."""
+    return np.argsort(-np.asarray(values), kind='stable')
+
+
+def _investment_scores(potential, quality_gap, barriers):
+    """Investment score (rounded to 2 decimals) and recommendation for each district."""
+    barriers = np.asarray(barriers, dtype=object)
+    
+    # Potential is most important, quality gap is opportunity, barriers cost
+    score = np.asarray(potential, dtype=float) * 0.5 + np.asarray(quality_gap, dtype=float) * 2
+    score -= np.select([barriers == 'High', barriers == 'Medium'], [2, 1], default=0)
+    
+    recommendations = np.select(
+        [(score > 6) & (barriers != 'High'), score > 4, score > 2],
+        [
+            'Strong Buy - High potential, manageable barriers',
+            'Buy - Good opportunity with moderate risk',
+            'Hold - Consider with caution'
+        ],
+        default='Avoid - High risk, low potential'
+    )
+    
+    return np.round(score, 2), recommendations
+
+
+def _opportunity_levels(counts):
+    """Opportunity level of underserved cuisines by number of districts missing them."""
+    counts = np.asarray(counts)
+    return np.select([counts > 40, counts > 20], ['High', 'Medium'], default='Low')
+
+
+def _heap_top(heap, k, is_current):
+    """First k current entries of a lazily-deleted heap.
+    
+    Stale entries popped on the way are dropped for good; the current ones
+    are pushed back.
+    """
+    top = []
+    while heap and len(top) < k:
+        item = heapq.heappop(heap)
+        # Re-adding a district with unchanged values leaves an identical duplicate
+        if is_current(item) and (not top or item != top[-1]):
+            top.append(item)
+    for item in top:
+        heapq.heappush(heap, item)
+    return top
 
 
 class CitySummaryGenerator:
-    def __init__(self, cache_file='district_analyses_cache.json'):
+    def __init__(self, cache_file=DISTRICT_CACHE_FILE, recommendations_file=RECOMMENDATIONS_CACHE_FILE):
         self.cache_file = cache_file
+        self.recommendations_file = recommendations_file
         self.llm = LLMAnalyzer()
         
-    def generate_summary(self):
-        """Generate comprehensive city-wide summary."""
+    def generate_summary(self, generate_recommendations=True):
+        """Generate comprehensive city-wide summary.
+        
+        With generate_recommendations=False the LLM is never called: the
+        persisted narrative is used if its inputs are unchanged, otherwise the
+        summary carries 'recommendations_stale': True.
+        """
         # Load cached analyses
         cache_path = Path(self.cache_file)
         if not cache_path.exists():
@@ -30,189 +164,195 @@ class CitySummaryGenerator:
         if not districts_data:
             return {"error": "No district data available"}
         
-        # Aggregate metrics
-        summary = {
-            'generated_at': cache.get('generated_at'),
-            'total_districts': len(districts_data),
-            'top_opportunities': self._get_top_opportunities(districts_data),
-            'underserved_cuisines': self._get_underserved_cuisines(districts_data),
-            'quality_saturation_analysis': self._analyze_quality_saturation(districts_data),
-            'market_segments': self._analyze_market_segments(districts_data),
-            'investment_priorities': self._get_investment_priorities(districts_data),
-            'strategic_recommendations': self._generate_strategic_recommendations(districts_data)
+        # Flatten the nested cache once; every section works on its columns
+        table = DistrictTable.from_districts(districts_data)
+        
+        return self._complete_summary(cache.get('generated_at'), self._aggregate(table), generate_recommendations)
+    
+    def _aggregate(self, table):
+        """Compute every summary section from the district table."""
+        return {
+            'total_districts': len(table),
+            'top_opportunities': self._get_top_opportunities(table),
+            'underserved_cuisines': self._get_underserved_cuisines(table),
+            'quality_saturation_analysis': self._analyze_quality_saturation(table),
+            'market_segments': self._analyze_market_segments(table),
+            'investment_priorities': self._get_investment_priorities(table)
         }
+    
+    def _complete_summary(self, generated_at, sections, generate_recommendations=True):
+        """Add the strategic recommendations to the aggregated sections."""
+        total = sections['total_districts']
+        top_opps = sections['top_opportunities'][:5]
+        underserved = sections['underserved_cuisines'][:5]
         
-        return summary
+        if generate_recommendations:
+            recommendations = self._generate_strategic_recommendations(total, top_opps, underserved)
+            stale = False
+        else:
+            recommendations = self._load_recommendations(
+                self._create_recommendations_prompt(total, top_opps, underserved)
+            )
+            stale = recommendations is None
+        
+        return {
+            'generated_at': generated_at,
+            **sections,
+            'strategic_recommendations': recommendations,
+            'recommendations_stale': stale
+        }
     
-    def _get_top_opportunities(self, districts_data, top_n=10):
+    def _get_top_opportunities(self, table, top_n=10):
         """Get top districts by market potential."""
-        opportunities = []
+        order = _descending(table.potential)[:top_n]
         
-        for pc4, data in districts_data.items():
-            analytics = data['analytics']
-            opp = analytics.get('growth_opportunities', {})
-            overview = analytics.get('overview', {})
-            
-            opportunities.append({
-                'pc4': pc4,
-                'potential_score': opp.get('market_potential_score', 0),
-                'restaurant_count': overview.get('total_restaurants', 0),
-                'avg_rating': overview.get('avg_rating', 0),
-                'saturation': analytics.get('competition_analysis', {}).get('market_saturation', 'N/A'),
-                'positioning': analytics.get('market_positioning', {}).get('positioning', 'N/A'),
-                'quality_gap': opp.get('quality_improvement_potential', 0),
-                'underserved_count': len(opp.get('underserved_cuisines', []))
-            })
-        
-        # Sort by potential score
-        opportunities.sort(key=lambda x: x['potential_score'], reverse=True)
-        return opportunities[:top_n]
-    
-    def _get_underserved_cuisines(self, districts_data):
+        return [
+            {
+                'pc4': table.pc4s[i],
+                'potential_score': table.potential[i].item(),
+                'restaurant_count': table.restaurant_count[i].item(),
+                'avg_rating': table.avg_rating[i].item(),
+                'saturation': table.saturation[i] or 'N/A',
+                'positioning': table.positioning[i] or 'N/A',
+                'quality_gap': table.quality_gap[i].item(),
+                'underserved_count': table.underserved_count[i].item()
+            }
+            for i in order
+        ]
+    
+    def _get_underserved_cuisines(self, table):
         """Find cuisines that are underserved citywide."""
         # Count all underserved cuisines across districts
-        underserved_counter = Counter()
-        excluded_cuisines = ['cannabis store', 'coffee shop', 'coffeeshop']
+        cuisines = table.underserved_cuisines
+        if not len(cuisines):
+            return []
+        
+        names, first_seen, counts = np.unique(cuisines, return_index=True, return_counts=True)
+        # Most common first, ties in order of first appearance (as Counter.most_common)
+        order = np.lexsort((first_seen, -counts))[:15]
         
-        for data in districts_data.values():
-            underserved = data['analytics'].get('growth_opportunities', {}).get('underserved_cuisines', [])
-            for cuisine in underserved:
-                if cuisine['cuisine'].lower() not in excluded_cuisines:
-                    underserved_counter[cuisine['cuisine']] += 1
+        levels = _opportunity_levels(counts)
         
         # Get top underserved cuisines
-        top_underserved = [
+        return [
             {
-                'cuisine': cuisine,
-                'districts_missing': count,
-                'opportunity_level': 'High' if count > 40 else 'Medium' if count > 20 else 'Low'
+                'cuisine': names[i],
+                'districts_missing': counts[i].item(),
+                'opportunity_level': str(levels[i])
             }
-            for cuisine, count in underserved_counter.most_common(15)
+            for i in order
         ]
-        
-        return top_underserved
     
-    def _analyze_quality_saturation(self, districts_data):
+    def _analyze_quality_saturation(self, table):
         """Analyze quality vs saturation matrix."""
-        matrix = {
-            'high_quality_low_saturation': [],  # Best opportunities
-            'high_quality_high_saturation': [],  # Competitive markets
-            'low_quality_low_saturation': [],   # Emerging markets
-            'low_quality_high_saturation': []   # Challenging markets
-        }
+        high_quality = table.avg_rating >= 4.3
+        high_saturation = table.saturation == 'High'
         
-        for pc4, data in districts_data.items():
-            analytics = data['analytics']
-            avg_rating = analytics.get('overview', {}).get('avg_rating', 0)
-            saturation = analytics.get('competition_analysis', {}).get('market_saturation', 'Medium')
-            count = analytics.get('overview', {}).get('total_restaurants', 0)
-            
-            district_info = {
-                'pc4': pc4,
-                'avg_rating': avg_rating,
-                'restaurant_count': count,
-                'saturation': saturation
-            }
-            
-            # Classify
-            high_quality = avg_rating >= 4.3
-            high_saturation = saturation == 'High'
-            
-            if high_quality and not high_saturation:
-                matrix['high_quality_low_saturation'].append(district_info)
-            elif high_quality and high_saturation:
-                matrix['high_quality_high_saturation'].append(district_info)
-            elif not high_quality and not high_saturation:
-                matrix['low_quality_low_saturation'].append(district_info)
-            else:
-                matrix['low_quality_high_saturation'].append(district_info)
+        masks = dict(zip(QUADRANTS, (
+            high_quality & ~high_saturation,
+            high_quality & high_saturation,
+            ~high_quality & ~high_saturation,
+            ~high_quality & high_saturation
+        )))
         
-        # Sort each category
-        for category in matrix:
-            matrix[category].sort(key=lambda x: x['avg_rating'], reverse=True)
+        matrix = {}
+        for category, mask in masks.items():
+            members = np.flatnonzero(mask)
+            # Sort each category by rating
+            members = members[_descending(table.avg_rating[members])]
+            matrix[category] = [
+                {
+                    'pc4': table.pc4s[i],
+                    'avg_rating': table.avg_rating[i].item(),
+                    'restaurant_count': table.restaurant_count[i].item(),
+                    'saturation': table.saturation[i] or 'Medium'
+                }
+                for i in members
+            ]
         
         return matrix
     
-    def _analyze_market_segments(self, districts_data):
+    def _analyze_market_segments(self, table):
         """Analyze market by positioning segments."""
-        segments = defaultdict(list)
+        positioning = np.array([p or 'Unknown' for p in table.positioning], dtype=object)
+        if not len(positioning):
+            return {}
         
-        for pc4, data in districts_data.items():
-            positioning = data['analytics'].get('market_positioning', {}).get('positioning', 'Unknown')
-            overview = data['analytics'].get('overview', {})
-            
-            segments[positioning].append({
-                'pc4': pc4,
-                'restaurant_count': overview.get('total_restaurants', 0),
-                'avg_rating': overview.get('avg_rating', 0)
-            })
+        segments, first_seen, segment_ids = np.unique(positioning, return_index=True, return_inverse=True)
+        district_count = np.bincount(segment_ids)
+        total_restaurants = np.bincount(segment_ids, weights=table.restaurant_count)
+        rating_sum = np.bincount(segment_ids, weights=table.avg_rating)
         
-        # Calculate segment statistics
+        # Calculate segment statistics, segments in order of first appearance
         segment_stats = {}
-        for segment, districts in segments.items():
-            segment_stats[segment] = {
-                'district_count': len(districts),
-                'total_restaurants': sum(d['restaurant_count'] for d in districts),
-                'avg_rating': sum(d['avg_rating'] for d in districts) / len(districts) if districts else 0,
-                'districts': sorted(districts, key=lambda x: x['restaurant_count'], reverse=True)[:5]
+        for s in np.argsort(first_seen):
+            members = np.flatnonzero(segment_ids == s)
+            members = members[_descending(table.restaurant_count[members])][:5]
+            
+            segment_stats[segments[s]] = {
+                'district_count': district_count[s].item(),
+                'total_restaurants': int(total_restaurants[s]),
+                'avg_rating': (rating_sum[s] / district_count[s]).item(),
+                'districts': [
+                    {
+                        'pc4': table.pc4s[i],
+                        'restaurant_count': table.restaurant_count[i].item(),
+                        'avg_rating': table.avg_rating[i].item()
+                    }
+                    for i in members
+                ]
             }
         
         return segment_stats
     
-    def _get_investment_priorities(self, districts_data):
+    def _get_investment_priorities(self, table, top_n=15):
         """Generate investment priority ranking."""
-        priorities = []
+        barriers = table.entry_barriers
+        rounded, recommendations = _investment_scores(table.potential, table.quality_gap, barriers)
         
-        for pc4, data in districts_data.items():
-            analytics = data['analytics']
-            overview = analytics.get('overview', {})
-            opp = analytics.get('growth_opportunities', {})
-            comp = analytics.get('competition_analysis', {})
-            
-            # Calculate investment score
-            potential = opp.get('market_potential_score', 0)
-            quality_gap = opp.get('quality_improvement_potential', 0)
-            entry_barriers = comp.get('entry_barriers', 'High')
-            
-            # Score calculation
-            score = potential * 0.5  # Potential is most important
-            score += quality_gap * 2  # Quality gap is opportunity
-            score -= 2 if entry_barriers == 'High' else 1 if entry_barriers == 'Medium' else 0
-            
-            priorities.append({
-                'pc4': pc4,
-                'investment_score': round(score, 2),
-                'potential_score': potential,
-                'quality_gap': quality_gap,
-                'entry_barriers': entry_barriers,
-                'restaurant_count': overview.get('total_restaurants', 0),
-                'recommendation': self._get_investment_recommendation(score, entry_barriers)
-            })
-        
-        priorities.sort(key=lambda x: x['investment_score'], reverse=True)
-        return priorities[:15]
-    
-    def _get_investment_recommendation(self, score, barriers):
-        """Get investment recommendation based on score."""
-        if score > 6 and barriers != 'High':
-            return 'Strong Buy - High potential, manageable barriers'
-        elif score > 4:
-            return 'Buy - Good opportunity with moderate risk'
-        elif score > 2:
-            return 'Hold - Consider with caution'
-        else:
-            return 'Avoid - High risk, low potential'
+        return [
+            {
+                'pc4': table.pc4s[i],
+                'investment_score': rounded[i].item(),
+                'potential_score': table.potential[i].item(),
+                'quality_gap': table.quality_gap[i].item(),
+                'entry_barriers': barriers[i],
+                'restaurant_count': table.restaurant_count[i].item(),
+                'recommendation': str(recommendations[i])
+            }
+            for i in _descending(rounded)[:top_n]
+        ]
     
-    def _generate_strategic_recommendations(self, districts_data):
-        """Generate AI-powered strategic recommendations."""
-        # Prepare summary data for LLM
-        top_opps = self._get_top_opportunities(districts_data, 5)
-        underserved = self._get_underserved_cuisines(districts_data)[:5]
+    def _generate_strategic_recommendations(self, total_districts, top_opps, underserved):
+        """Generate AI-powered strategic recommendations.
+        
+        The LLM narrative is persisted and reused until its prompt inputs
+        (top districts and underserved cuisines) change.
+        """
+        prompt = self._create_recommendations_prompt(total_districts, top_opps, underserved)
         
+        recommendations = self._load_recommendations(prompt)
+        if recommendations is not None:
+            return recommendations
+        
+        try:
+            if self.llm.check_availability():
+                recommendations = self.llm._call_llm(prompt)
+                self._save_recommendations(prompt, recommendations)
+            else:
+                recommendations = self._generate_fallback_recommendations(top_opps, underserved)
+        except Exception as e:
+            print(f"Error generating recommendations: {e}")
+            recommendations = self._generate_fallback_recommendations(top_opps, underserved)
+        
+        return recommendations
+    
+    def _create_recommendations_prompt(self, total_districts, top_opps, underserved):
+        """Build the strategic recommendations prompt from the top 5 districts and cuisines."""
         prompt = f"""You are a restaurant market strategist analyzing Amsterdam's dining landscape.
 
 MARKET OVERVIEW:
-- Total Districts Analyzed: {len(districts_data)}
+- Total Districts Analyzed: {total_districts}
 - Top 5 Opportunity Districts: {', '.join([f"{d['pc4']} (score: {d['potential_score']}/10)" for d in top_opps])}
 - Top 5 Underserved Cuisines: {', '.join([c['cuisine'] for c in underserved])}
 
@@ -229,16 +369,42 @@ Structure:
 
 Do NOT use bullet points. Write in fluid, engaging paragraphs. Total length: 300-400 words."""
 
+        return prompt
+    
+    def _load_recommendations(self, prompt):
+        """Return the persisted LLM narrative for this prompt, or None."""
+        path = Path(self.recommendations_file)
+        if not path.exists():
+            return None
+        
         try:
-            if self.llm.check_availability():
-                recommendations = self.llm._call_llm(prompt)
-            else:
-                recommendations = self._generate_fallback_recommendations(top_opps, underserved)
-        except Exception as e:
-            print(f"Error generating recommendations: {e}")
-            recommendations = self._generate_fallback_recommendations(top_opps, underserved)
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
         
-        return recommendations
+        if stored.get('prompt_hash') != self._prompt_hash(prompt):
+            return None
+        return stored.get('recommendations')
+    
+    def _save_recommendations(self, prompt, recommendations):
+        """Persist an LLM narrative (fallback text is never stored)."""
+        if not recommendations:
+            return
+        
+        stored = {
+            'prompt_hash': self._prompt_hash(prompt),
+            'model': self.llm.model,
+            'generated_at': datetime.now().isoformat(),
+            'recommendations': recommendations
+        }
+        tmp_path = f"{self.recommendations_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.recommendations_file)
+    
+    def _prompt_hash(self, prompt):
+        return hashlib.sha1(f"{self.llm.model}\n{prompt}".encode('utf-8')).hexdigest()
     
     def _generate_fallback_recommendations(self, top_opps, underserved):
         """Generate detailed rule-based recommendations as fallback."""
@@ -270,6 +436,443 @@ Do NOT use bullet points. Write in fluid, engaging paragraphs. Total length: 300
         return recs
 
 
+class CitySummaryAggregates:
+    """City summary aggregates that absorb one district at a time.
+    
+    apply() and remove() update the underserved-cuisine counters, segment
+    sums, quadrant membership and the top-k heaps in O(log n) per district,
+    without touching the other districts. Heap entries are never removed in
+    place: a superseded entry stays until it surfaces and is dropped then
+    (lazy deletion). sections() renders the same sections as
+    CitySummaryGenerator._aggregate().
+    """
+    
+    def __init__(self):
+        self.rows = {}
+        self.cuisine_counts = {}
+        self.cuisine_first_seen = {}
+        self.quadrants = {name: [] for name in QUADRANTS}  # Sorted (-avg_rating, order, pc4)
+        self.segments = {}
+        self._potential_heap = []
+        self._priority_heap = []
+        self._cuisine_heap = []
+        self._next_order = 0
+    
+    @classmethod
+    def from_districts(cls, districts_data):
+        aggregates = cls()
+        for pc4, data in districts_data.items():
+            aggregates.apply(pc4, data)
+        return aggregates
+    
+    def apply(self, pc4, data):
+        """Add or update one district from its cache entry; returns False if nothing changed."""
+        row = _district_row(data)
+        previous = self.rows.get(pc4)
+        
+        if previous is not None:
+            if all(previous[key] == value for key, value in row.items()):
+                return False
+            self._discard(pc4, previous)
+            # Keep the district's position so ties rank as in the cache
+            row['order'] = previous['order']
+        else:
+            row['order'] = self._next_order
+            self._next_order += 1
+        
+        score, recommendation = _investment_scores([row['potential']], [row['quality_gap']], [row['entry_barriers']])
+        row['investment_score'] = score[0].item()
+        row['recommendation'] = str(recommendation[0])
+        
+        self.rows[pc4] = row
+        self._add(pc4, row)
+        self._compact_heaps()
+        return True
+    
+    def remove(self, pc4):
+        """Drop a district; returns False if it was not aggregated."""
+        row = self.rows.pop(pc4, None)
+        if row is None:
+            return False
+        self._discard(pc4, row)
+        return True
+    
+    def sync(self, districts_data):
+        """Apply the districts of a rewritten cache that differ; returns how many changed."""
+        changed = sum(self.remove(pc4) for pc4 in list(self.rows) if pc4 not in districts_data)
+        changed += sum(self.apply(pc4, data) for pc4, data in districts_data.items())
+        return changed
+    
+    def sections(self):
+        rows = self.rows
+        
+        top_opportunities = [
+            {
+                'pc4': pc4,
+                'potential_score': rows[pc4]['potential'],
+                'restaurant_count': rows[pc4]['restaurant_count'],
+                'avg_rating': rows[pc4]['avg_rating'],
+                'saturation': rows[pc4]['saturation'] or 'N/A',
+                'positioning': rows[pc4]['positioning'] or 'N/A',
+                'quality_gap': rows[pc4]['quality_gap'],
+                'underserved_count': rows[pc4]['underserved_count']
+            }
+            for _, _, pc4 in _heap_top(self._potential_heap, 10, self._is_current_potential)
+        ]
+        
+        top_cuisines = _heap_top(self._cuisine_heap, 15, self._is_current_cuisine)
+        levels = _opportunity_levels([-count for count, _, _ in top_cuisines])
+        underserved_cuisines = [
+            {
+                'cuisine': cuisine,
+                'districts_missing': -count,
+                'opportunity_level': str(level)
+            }
+            for (count, _, cuisine), level in zip(top_cuisines, levels)
+        ]
+        
+        quality_saturation = {
+            category: [
+                {
+                    'pc4': pc4,
+                    'avg_rating': rows[pc4]['avg_rating'],
+                    'restaurant_count': rows[pc4]['restaurant_count'],
+                    'saturation': rows[pc4]['saturation'] or 'Medium'
+                }
+                for _, _, pc4 in members
+            ]
+            for category, members in self.quadrants.items()
+        }
+        
+        market_segments = {
+            segment: {
+                'district_count': stats['district_count'],
+                'total_restaurants': stats['total_restaurants'],
+                'avg_rating': self._segment_avg_rating(stats),
+                'districts': [
+                    {
+                        'pc4': pc4,
+                        'restaurant_count': rows[pc4]['restaurant_count'],
+                        'avg_rating': rows[pc4]['avg_rating']
+                    }
+                    for _, _, pc4 in _heap_top(
+                        stats['heap'], 5, lambda item, segment=segment: self._is_current_member(item, segment)
+                    )
+                ]
+            }
+            for segment, stats in self.segments.items()
+        }
+        
+        investment_priorities = [
+            {
+                'pc4': pc4,
+                'investment_score': rows[pc4]['investment_score'],
+                'potential_score': rows[pc4]['potential'],
+                'quality_gap': rows[pc4]['quality_gap'],
+                'entry_barriers': rows[pc4]['entry_barriers'],
+                'restaurant_count': rows[pc4]['restaurant_count'],
+                'recommendation': rows[pc4]['recommendation']
+            }
+            for _, _, pc4 in _heap_top(self._priority_heap, 15, self._is_current_priority)
+        ]
+        
+        return {
+            'total_districts': len(rows),
+            'top_opportunities': top_opportunities,
+            'underserved_cuisines': underserved_cuisines,
+            'quality_saturation_analysis': quality_saturation,
+            'market_segments': market_segments,
+            'investment_priorities': investment_priorities
+        }
+    
+    def _add(self, pc4, row):
+        order = row['order']
+        heapq.heappush(self._potential_heap, (-row['potential'], order, pc4))
+        heapq.heappush(self._priority_heap, (-row['investment_score'], order, pc4))
+        
+        for cuisine in row['underserved']:
+            # Ties between cuisines rank in the order they were first seen
+            first_seen = self.cuisine_first_seen.setdefault(cuisine, len(self.cuisine_first_seen))
+            self.cuisine_counts[cuisine] = self.cuisine_counts.get(cuisine, 0) + 1
+            heapq.heappush(self._cuisine_heap, (-self.cuisine_counts[cuisine], first_seen, cuisine))
+        
+        bisect.insort(self.quadrants[self._quadrant(row)], (-row['avg_rating'], order, pc4))
+        
+        segment = row['positioning'] or 'Unknown'
+        stats = self.segments.setdefault(segment, {
+            'district_count': 0, 'total_restaurants': 0, 'members': set(), 'heap': []
+        })
+        stats['district_count'] += 1
+        stats['total_restaurants'] += row['restaurant_count']
+        stats['members'].add(pc4)
+        heapq.heappush(stats['heap'], (-row['restaurant_count'], order, pc4))
+    
+    def _discard(self, pc4, row):
+        # Heap entries of the district go stale by themselves; only counts and sums are undone
+        for cuisine in row['underserved']:
+            count = self.cuisine_counts[cuisine] - 1
+            if count:
+                self.cuisine_counts[cuisine] = count
+                heapq.heappush(self._cuisine_heap, (-count, self.cuisine_first_seen[cuisine], cuisine))
+            else:
+                del self.cuisine_counts[cuisine]
+        
+        members = self.quadrants[self._quadrant(row)]
+        del members[bisect.bisect_left(members, (-row['avg_rating'], row['order'], pc4))]
+        
+        segment = row['positioning'] or 'Unknown'
+        stats = self.segments[segment]
+        stats['district_count'] -= 1
+        stats['total_restaurants'] -= row['restaurant_count']
+        stats['members'].discard(pc4)
+        if not stats['district_count']:
+            del self.segments[segment]
+    
+    def _compact_heaps(self):
+        """Rebuild the heaps once stale entries outnumber current ones."""
+        if len(self._potential_heap) + len(self._cuisine_heap) <= 4 * (len(self.rows) + len(self.cuisine_counts)) + 64:
+            return
+        
+        self._potential_heap = [(-row['potential'], row['order'], pc4) for pc4, row in self.rows.items()]
+        self._priority_heap = [(-row['investment_score'], row['order'], pc4) for pc4, row in self.rows.items()]
+        self._cuisine_heap = [
+            (-count, self.cuisine_first_seen[cuisine], cuisine) for cuisine, count in self.cuisine_counts.items()
+        ]
+        for stats in self.segments.values():
+            stats['heap'] = []
+        for pc4, row in self.rows.items():
+            self.segments[row['positioning'] or 'Unknown']['heap'].append((-row['restaurant_count'], row['order'], pc4))
+        
+        for heap in (self._potential_heap, self._priority_heap, self._cuisine_heap,
+                     *(stats['heap'] for stats in self.segments.values())):
+            heapq.heapify(heap)
+    
+    def _segment_avg_rating(self, stats):
+        # Summed from the members in cache order rather than kept as a running
+        # float, so repeated updates give exactly the full recompute's value
+        ratings = sorted((self.rows[pc4]['order'], self.rows[pc4]['avg_rating']) for pc4 in stats['members'])
+        return sum(rating for _, rating in ratings) / stats['district_count']
+    
+    @staticmethod
+    def _quadrant(row):
+        high_quality = row['avg_rating'] >= 4.3
+        high_saturation = row['saturation'] == 'High'
+        return QUADRANTS[(0 if high_quality else 2) + (1 if high_saturation else 0)]
+    
+    def _is_current_potential(self, item):
+        row = self.rows.get(item[2])
+        return row is not None and row['order'] == item[1] and row['potential'] == -item[0]
+    
+    def _is_current_priority(self, item):
+        row = self.rows.get(item[2])
+        return row is not None and row['order'] == item[1] and row['investment_score'] == -item[0]
+    
+    def _is_current_cuisine(self, item):
+        return self.cuisine_counts.get(item[2]) == -item[0]
+    
+    def _is_current_member(self, item, segment):
+        row = self.rows.get(item[2])
+        return (row is not None and row['order'] == item[1] and row['restaurant_count'] == -item[0]
+                and (row['positioning'] or 'Unknown') == segment)
+
+
+class CitySummaryCache:
+    """City summary memoized on the district cache file's version.
+    
+    get() always answers from memory. When the district cache changes, the
+    previous summary is served while a background thread applies the changed
+    districts to the aggregates (stale-while-revalidate); update_district()
+    patches a single district and applies it as a delta right away. A changed
+    LLM narrative is generated in the background, with the previous narrative
+    shown until it is ready.
+    """
+    
+    def __init__(self, cache_file=DISTRICT_CACHE_FILE, recommendations_file=RECOMMENDATIONS_CACHE_FILE):
+        self.generator = CitySummaryGenerator(cache_file, recommendations_file)
+        self.version = None
+        self.summary = None
+        self.aggregates = None
+        self.generated_at = None
+        self._stat = None
+        self._file_hash = None
+        # Parsed district cache file and the version it was read at
+        self._document = None
+        self._document_version = None
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._refreshing = False
+        self._narrating = False
+        self._pending_narrative = None
+    
+    def get(self):
+        """Return the current summary, scheduling a refresh if the inputs changed."""
+        version = self._current_version()
+        
+        if self.summary is None:
+            # Nothing to serve yet: build the aggregates now, narrative in the background
+            self._rebuild(version)
+        elif version != self.version:
+            self._start_refresh(version)
+        
+        return self.summary
+    
+    def warm(self):
+        """Build the summary ahead of the first request."""
+        self.get()
+    
+    def update_district(self, pc4, entry):
+        """Merge entry into one district's cache entry and apply it to the summary.
+        
+        The district cache file is rewritten atomically from the in-memory copy,
+        which is only re-read when another writer (a batch run) changed the
+        file. When the summary was up to date with the file, only this
+        district's delta is applied; otherwise the next get() catches up as usual.
+        """
+        entry = convert_numpy_types(entry)
+        path = Path(self.generator.cache_file)
+        
+        with self._update_lock:
+            current = self._current_version()
+            in_sync = self.aggregates is not None and current == self.version
+            
+            cache = self._load_document(current)
+            districts = cache.setdefault('districts', {})
+            districts[pc4] = {**districts.get(pc4, {}), **entry}
+            
+            payload = write_json_atomic(path, cache)
+            stat = path.stat()
+            self._stat = (stat.st_mtime_ns, stat.st_size)
+            self._file_hash = hashlib.sha1(payload).hexdigest()
+            version = self._document_version = self._file_hash
+            
+            if in_sync:
+                if self.aggregates.apply(pc4, districts[pc4]):
+                    self._publish(self._summarize(), version)
+                else:
+                    self.version = version
+    
+    def _current_version(self):
+        """SHA-1 of the district cache file, rehashed only when its stat changes."""
+        path = Path(self.generator.cache_file)
+        if not path.exists():
+            return None
+        
+        stat = path.stat()
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if stat_key != self._stat:
+            self._stat = stat_key
+            self._file_hash = hashlib.sha1(path.read_bytes()).hexdigest()
+        return self._file_hash
+    
+    def _load_document(self, version):
+        """Parsed district cache file at version, read from disk only when it changed."""
+        if self._document is None or self._document_version != version:
+            path = Path(self.generator.cache_file)
+            cache = {'districts': {}}
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+            self._document = cache
+            self._document_version = version
+        return self._document
+    
+    def _start_refresh(self, version):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, args=(version,), daemon=True).start()
+    
+    def _refresh(self, version):
+        try:
+            self._rebuild(version)
+        finally:
+            with self._lock:
+                self._refreshing = False
+    
+    def _rebuild(self, version):
+        """Bring the aggregates up to date with the cache file without calling the LLM."""
+        with self._update_lock:
+            cache = self._load_document(version)
+            districts_data = cache.get('districts', {})
+            
+            if not districts_data:
+                # Let the generator report the missing data
+                self.aggregates = None
+                self.summary = self.generator.generate_summary(generate_recommendations=False)
+                self.version = version
+                return
+            
+            if self.aggregates is None:
+                self.aggregates = CitySummaryAggregates.from_districts(districts_data)
+            else:
+                # Partial batch runs rewrite a few districts; only those are applied
+                self.aggregates.sync(districts_data)
+            
+            self.generated_at = cache.get('generated_at')
+            self._publish(self._summarize(), version)
+    
+    def _summarize(self):
+        return self.generator._complete_summary(
+            self.generated_at, self.aggregates.sections(), generate_recommendations=False
+        )
+    
+    def _publish(self, summary, version):
+        """Serve summary, keeping the previous narrative while a changed one is generated."""
+        if summary.get('recommendations_stale'):
+            previous = (self.summary or {}).get('strategic_recommendations')
+            if previous:
+                summary['strategic_recommendations'] = previous
+            else:
+                top_opps = summary.get('top_opportunities', [])
+                underserved = summary.get('underserved_cuisines', [])
+                summary['strategic_recommendations'] = (
+                    self.generator._generate_fallback_recommendations(top_opps, underserved)
+                    if len(top_opps) >= 2 and len(underserved) >= 2 else None
+                )
+        
+        self.summary = summary
+        self.version = version
+        
+        if summary.get('recommendations_stale'):
+            self._start_recommendations(version, summary)
+    
+    def _start_recommendations(self, version, summary):
+        """Generate the narrative for the latest stale summary on at most one thread."""
+        with self._lock:
+            # A running thread picks up the latest pending summary when it finishes
+            self._pending_narrative = (version, summary)
+            if self._narrating:
+                return
+            self._narrating = True
+        threading.Thread(target=self._narrate, daemon=True).start()
+    
+    def _narrate(self):
+        while True:
+            with self._lock:
+                pending, self._pending_narrative = self._pending_narrative, None
+                if pending is None:
+                    self._narrating = False
+                    return
+            try:
+                self._refresh_recommendations(*pending)
+            except Exception as e:
+                print(f"Error generating city summary recommendations: {e}")
+    
+    def _refresh_recommendations(self, version, summary):
+        """Generate and persist the narrative, then patch it into the summary."""
+        recommendations = self.generator._generate_strategic_recommendations(
+            summary['total_districts'], summary['top_opportunities'][:5], summary['underserved_cuisines'][:5]
+        )
+        
+        if self.version == version and self.summary is not None:
+            self.summary = {
+                **self.summary,
+                'strategic_recommendations': recommendations,
+                'recommendations_stale': False
+            }
+
+
 if __name__ == "__main__":
     generator = CitySummaryGenerator()
     summary = generator.generate_summary()
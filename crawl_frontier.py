@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Persistent crawl frontier for the Playwright scrapers.
+Every place URL has a state (pending / in_progress / done / failed), an
+attempt count, its last error, the earliest time it may be retried and a
+priority. Workers claim and complete URLs in SQLite transactions, so a
+crashed run resumes exactly where it stopped and failed visits are retried
+with exponential backoff, behind URLs that have not failed yet.
+"""
+
+import sqlite3
+import time
+from contextlib import contextmanager
+
+
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+FAILED = 'failed'
+
+DEFAULT_FRONTIER_FILE = 'crawl_frontier.db'
+
+
+class CrawlFrontier:
+    def __init__(self, path=DEFAULT_FRONTIER_FILE, max_attempts=3, backoff_seconds=30,
+                 max_backoff_seconds=3600):
+        """
+        Open (or create) a frontier.
+
+        URLs left in progress by a previous run that crashed go back to pending.
+
+        Args:
+            path: SQLite database file
+            max_attempts: Visits before a URL is marked failed for good
+            backoff_seconds: Delay before the first retry; doubles with every attempt
+            max_backoff_seconds: Upper bound of the retry delay
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS frontier (
+                    url TEXT PRIMARY KEY,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    next_eligible_at REAL NOT NULL DEFAULT 0,
+                    added_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_claim ON frontier (status, priority DESC, next_eligible_at)"
+            )
+
+        self.reset_in_progress()
+
+    def add(self, urls, priority=0):
+        """Queue new URLs; known URLs keep their state. Returns how many were new."""
+        now = time.time()
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO frontier (url, priority, added_at, updated_at) VALUES (?, ?, ?, ?)",
+                [(url, priority, now, now) for url in urls]
+            )
+            return conn.total_changes - before
+
+    def claim(self, limit=1):
+        """Atomically move up to limit eligible URLs to in_progress and return them.
+
+        Highest priority first, then the longest-waiting ones.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # Take the write lock up front so concurrent claimers never get the same URL
+            conn.execute("BEGIN IMMEDIATE")
+            urls = [row[0] for row in conn.execute(
+                "SELECT url FROM frontier WHERE status = ? AND next_eligible_at <= ? "
+                "ORDER BY priority DESC, next_eligible_at, rowid LIMIT ?",
+                (PENDING, now, limit)
+            )]
+            conn.executemany(
+                "UPDATE frontier SET status = ?, attempts = attempts + 1, updated_at = ? WHERE url = ?",
+                [(IN_PROGRESS, now, url) for url in urls]
+            )
+        return urls
+
+    def complete(self, urls):
+        """Mark URLs done (also URLs the frontier has not seen yet)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO frontier (url, status, added_at, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET status = excluded.status, last_error = NULL, "
+                "updated_at = excluded.updated_at",
+                [(url, DONE, now, now) for url in urls]
+            )
+
+    def fail(self, url, error):
+        """Record a failed visit: retry later with backoff, or fail for good after max_attempts.
+
+        A retried URL drops one priority level, so URLs that keep failing are
+        claimed after the ones that have not failed yet. Returns the new status.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT attempts FROM frontier WHERE url = ?", (url,)).fetchone()
+            attempts = row[0] if row else 1
+
+            if attempts >= self.max_attempts:
+                status, next_eligible_at = FAILED, now
+            else:
+                delay = min(self.backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+                status, next_eligible_at = PENDING, now + delay
+
+            conn.execute(
+                "UPDATE frontier SET status = ?, priority = priority - 1, last_error = ?, "
+                "next_eligible_at = ?, updated_at = ? WHERE url = ?",
+                (status, str(error)[:500], next_eligible_at, now, url)
+            )
+        return status
+
+    def retry_failed(self):
+        """Give permanently failed URLs a fresh set of attempts (at the default priority)."""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE frontier SET status = ?, attempts = 0, priority = 0, next_eligible_at = 0, "
+                "updated_at = ? WHERE status = ?",
+                (PENDING, time.time(), FAILED)
+            ).rowcount
+
+    def reset_in_progress(self):
+        """Return URLs claimed by a run that never completed them to pending."""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE frontier SET status = ?, updated_at = ? WHERE status = ?",
+                (PENDING, time.time(), IN_PROGRESS)
+            ).rowcount
+
+    def next_eligible_in(self):
+        """Seconds until the next pending URL may be claimed, or None if none is pending."""
+        with self._connect() as conn:
+            next_eligible_at = conn.execute(
+                "SELECT MIN(next_eligible_at) FROM frontier WHERE status = ?", (PENDING,)
+            ).fetchone()[0]
+        return None if next_eligible_at is None else max(0.0, next_eligible_at - time.time())
+
+    def pending_urls(self):
+        """URLs still to visit, in claim order."""
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT url FROM frontier WHERE status = ? ORDER BY priority DESC, next_eligible_at, rowid",
+                (PENDING,)
+            )]
+
+    def counts(self):
+        """Number of URLs per status."""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM frontier GROUP BY status"))
+        return {status: counts.get(status, 0) for status in (PENDING, IN_PROGRESS, DONE, FAILED)}
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection; commit on success and always close."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
@@ -5,17 +5,62 @@ Provides comprehensive metrics per district with detailed insights.
 """
 
 import json
+import hashlib
 import numpy as np
 from collections import Counter, defaultdict
-from scipy import stats
 import re
+from spatial import (
+    DEFAULT_COMPETITOR_RADII, attach_competitor_columns, competitor_column, compute_competitor_density,
+    load_pc4_graph
+)
+
+
+# Citywide reference data shared by every DistrictAnalytics instance,
+# keyed by dataset version so repeated requests and batch runs reuse it.
+_REFERENCE_CACHE = {}
+
+# Neighbourhood-smoothed district metrics, keyed by dataset version
+_SMOOTHED_CACHE = {}
+
+# Per-restaurant competitor count columns, keyed by dataset version and radii
+_DENSITY_CACHE = {}
+
+
+class CitywideReference:
+    """Citywide distributions used to benchmark individual districts."""
+
+    def __init__(self, restaurants, min_popularity=10):
+        ratings = [r['rating'] for r in restaurants if r.get('rating')]
+        reviews = [r['reviews'] for r in restaurants if r.get('reviews')]
+
+        self.sorted_ratings = np.sort(np.asarray(ratings, dtype=float))
+        self.mean_rating = float(np.mean(ratings)) if ratings else None
+        self.mean_reviews = float(np.mean(reviews)) if reviews else None
+
+        self.cuisine_counts = Counter(r['cuisine'] for r in restaurants if r.get('cuisine'))
+        # Popular cuisines, most common first
+        self.popular_cuisines = sorted(
+            ((c, n) for c, n in self.cuisine_counts.items() if n >= min_popularity),
+            key=lambda x: x[1],
+            reverse=True
+        )
+
+    def rating_percentile(self, value):
+        """Percentile rank of value among citywide ratings (scipy 'rank' kind)."""
+        n = len(self.sorted_ratings)
+        left = np.searchsorted(self.sorted_ratings, value, side='left')
+        right = np.searchsorted(self.sorted_ratings, value, side='right')
+        plus1 = 1 if left < right else 0
+        return round((left + right + plus1) * (50.0 / n), 0)
 
 
 class DistrictAnalytics:
-    def __init__(self, data_file='restaurants_data.json'):
+    def __init__(self, data_file='restaurants_data.json', competitor_radii=DEFAULT_COMPETITOR_RADII):
         """Initialize district analytics with restaurant data."""
-        with open(data_file, 'r', encoding='utf-8') as f:
-            self.restaurants = json.load(f)
+        with open(data_file, 'rb') as f:
+            raw = f.read()
+        self.dataset_version = hashlib.sha1(raw).hexdigest()
+        self.restaurants = json.loads(raw.decode('utf-8'))
         
         # Extract PC4 codes from addresses
         for r in self.restaurants:
@@ -26,15 +71,111 @@ class DistrictAnalytics:
             else:
                 r['pc4'] = None
         
+        # Per-restaurant competitor counts within each radius (bulk KD-tree query)
+        self.competitor_radii = tuple(competitor_radii)
+        self._attach_competitor_density()
+        
         # Group restaurants by district
         self.districts = defaultdict(list)
         for r in self.restaurants:
             if r.get('pc4'):
                 self.districts[r['pc4']].append(r)
+        
+        self.reference = self._get_reference()
+    
+    def _get_reference(self):
+        """Return citywide reference data, computed once per dataset version."""
+        reference = _REFERENCE_CACHE.get(self.dataset_version)
+        if reference is None:
+            reference = CitywideReference(self.restaurants)
+            _REFERENCE_CACHE.clear()
+            _REFERENCE_CACHE[self.dataset_version] = reference
+        return reference
+    
+    def _attach_competitor_density(self):
+        """Add competitor count columns to the restaurants, querying the KD-tree once per dataset version."""
+        cache_key = (self.dataset_version, self.competitor_radii)
+        columns = _DENSITY_CACHE.get(cache_key)
+        if columns is None:
+            columns = compute_competitor_density(self.restaurants, self.competitor_radii)
+            _DENSITY_CACHE.clear()
+            _DENSITY_CACHE[cache_key] = columns
+        else:
+            attach_competitor_columns(self.restaurants, columns)
+    
+    def get_smoothed_metrics(self, neighbour_weight=0.5):
+        """Get raw and neighbour-smoothed density, rating and diversity per PC4.
+        
+        All districts are smoothed at once with sparse matrix-vector products
+        over the PC4 adjacency graph.
+        """
+        cache_key = (self.dataset_version, neighbour_weight)
+        if cache_key in _SMOOTHED_CACHE:
+            return _SMOOTHED_CACHE[cache_key]
+        
+        graph = load_pc4_graph()
+        if graph is None:
+            return {}
+        
+        n = len(graph.pc4s)
+        counts = np.zeros(n)
+        rating_sums = np.zeros(n)
+        rated_counts = np.zeros(n)
+        diversity = np.zeros(n)
+        
+        for pc4, restaurants in self.districts.items():
+            i = graph.index.get(pc4)
+            if i is None:
+                continue
+            ratings = [r['rating'] for r in restaurants if r.get('rating')]
+            counts[i] = len(restaurants)
+            rating_sums[i] = sum(ratings)
+            rated_counts[i] = len(ratings)
+            diversity[i] = self._calc_cuisine_diversity(restaurants)
+        
+        ones = np.ones(n)
+        smoothed_density = graph.smooth_ratio(counts, graph.areas_km2, neighbour_weight)
+        smoothed_rating = graph.smooth_ratio(rating_sums, rated_counts, neighbour_weight)
+        smoothed_diversity = graph.smooth_ratio(diversity, ones, neighbour_weight)
+        smoothed_count = graph.smooth_ratio(counts, ones, neighbour_weight)
+        
+        metrics = {}
+        for pc4, i in graph.index.items():
+            area = graph.areas_km2[i]
+            metrics[pc4] = {
+                'area_km2': round(area, 3),
+                'neighbours': graph.neighbours(pc4),
+                'density': round(counts[i] / area, 1) if area > 0 else 0,
+                'smoothed_density': round(smoothed_density[i], 1) if not np.isnan(smoothed_density[i]) else 0,
+                'avg_rating': round(rating_sums[i] / rated_counts[i], 2) if rated_counts[i] else 0,
+                'smoothed_avg_rating': round(smoothed_rating[i], 2) if not np.isnan(smoothed_rating[i]) else 0,
+                'cuisine_diversity': int(diversity[i]),
+                'smoothed_cuisine_diversity': round(smoothed_diversity[i], 1),
+                'saturation_score': min(counts[i] / 10, 10),
+                'smoothed_saturation_score': round(min(smoothed_count[i] / 10, 10), 1)
+            }
+        
+        _SMOOTHED_CACHE.clear()
+        _SMOOTHED_CACHE[cache_key] = metrics
+        return metrics
+    
+    def get_district_fingerprints(self):
+        """Get a content fingerprint of the restaurant records in each district."""
+        fingerprints = {}
+        
+        for pc4, restaurants in self.districts.items():
+            record_hashes = sorted(
+                hashlib.sha1(json.dumps(r, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+                for r in restaurants
+            )
+            fingerprints[pc4] = hashlib.sha1(''.join(record_hashes).encode('utf-8')).hexdigest()
+        
+        return fingerprints
     
     def get_district_summary(self):
         """Get summary metrics for all districts."""
         summaries = []
+        smoothed = self.get_smoothed_metrics()
         
         for pc4, restaurants in self.districts.items():
             if len(restaurants) >= 3:  # Only include districts with 3+ restaurants
@@ -46,6 +187,14 @@ class DistrictAnalytics:
                     'cuisine_diversity': self._calc_cuisine_diversity(restaurants),
                     'market_saturation': self._calc_saturation_level(len(restaurants))
                 }
+                if pc4 in smoothed:
+                    spatial = smoothed[pc4]
+                    summary.update({
+                        'density': spatial['density'],
+                        'smoothed_density': spatial['smoothed_density'],
+                        'smoothed_avg_rating': spatial['smoothed_avg_rating'],
+                        'smoothed_cuisine_diversity': spatial['smoothed_cuisine_diversity']
+                    })
                 summaries.append(summary)
         
         # Sort by restaurant count
@@ -74,6 +223,10 @@ class DistrictAnalytics:
             'benchmarks': self._calc_benchmarks(pc4, restaurants)
         }
         
+        spatial_context = self.get_smoothed_metrics().get(pc4)
+        if spatial_context:
+            analytics['spatial_context'] = spatial_context
+        
         return analytics
     
     def _calc_overview_metrics(self, restaurants):
@@ -191,9 +344,31 @@ class DistrictAnalytics:
             'total_restaurants': count,
             'avg_competitors_per_cuisine': round(avg_competitors_per_cuisine, 1),
             'competitive_intensity': 'High' if avg_competitors_per_cuisine > 5 else 'Medium' if avg_competitors_per_cuisine > 2 else 'Low',
-            'entry_barriers': self._assess_entry_barriers(count, avg_competitors_per_cuisine)
+            'entry_barriers': self._assess_entry_barriers(count, avg_competitors_per_cuisine),
+            'nearby_competition': self._calc_nearby_competition(restaurants)
         }
     
+    def _calc_nearby_competition(self, restaurants):
+        """Average competitors around each restaurant, across postcode borders."""
+        nearby = {}
+        
+        for radius in self.competitor_radii:
+            all_counts = [r[competitor_column(radius)] for r in restaurants
+                          if r.get(competitor_column(radius)) is not None]
+            same_counts = [r[competitor_column(radius, same_cuisine=True)] for r in restaurants
+                           if r.get(competitor_column(radius, same_cuisine=True)) is not None]
+            
+            if not all_counts:
+                continue
+            
+            nearby[f'{radius}m'] = {
+                'avg_competitors': round(np.mean(all_counts), 1),
+                'avg_same_cuisine_competitors': round(np.mean(same_counts), 1) if same_counts else 0,
+                'isolated_share': round(sum(1 for c in same_counts if c == 0) / len(same_counts) * 100, 1) if same_counts else 0
+            }
+        
+        return nearby
+    
     def _calc_market_positioning(self, restaurants):
         """Analyze market positioning (quality vs price)."""
         ratings = [r['rating'] for r in restaurants if r.get('rating')]
@@ -226,23 +401,14 @@ class DistrictAnalytics:
     
     def _calc_growth_opportunities(self, pc4, restaurants):
         """Identify growth opportunities in the district."""
-        # Get all cuisines in dataset
-        all_cuisines = set(r['cuisine'] for r in self.restaurants if r.get('cuisine'))
         district_cuisines = set(r['cuisine'] for r in restaurants if r.get('cuisine'))
         
-        # Find popular missing cuisines
-        missing = all_cuisines - district_cuisines
-        popular_missing = []
-        
-        for cuisine in missing:
-            global_count = sum(1 for r in self.restaurants if r.get('cuisine') == cuisine)
-            if global_count >= 10:  # Popular globally but missing here
-                popular_missing.append({
-                    'cuisine': cuisine,
-                    'global_popularity': global_count
-                })
-        
-        popular_missing.sort(key=lambda x: x['global_popularity'], reverse=True)
+        # Find popular missing cuisines (popular globally but missing here)
+        popular_missing = [
+            {'cuisine': cuisine, 'global_popularity': global_count}
+            for cuisine, global_count in self.reference.popular_cuisines
+            if cuisine not in district_cuisines
+        ]
         
         # Quality gap
         avg_rating = self._calc_avg_rating(restaurants)
@@ -257,9 +423,7 @@ class DistrictAnalytics:
     
     def _calc_benchmarks(self, pc4, restaurants):
         """Calculate benchmarks comparing to citywide averages."""
-        # Citywide metrics
-        all_ratings = [r['rating'] for r in self.restaurants if r.get('rating')]
-        all_reviews = [r['reviews'] for r in self.restaurants if r.get('reviews')]
+        reference = self.reference
         
         # District metrics
         district_ratings = [r['rating'] for r in restaurants if r.get('rating')]
@@ -267,9 +431,9 @@ class DistrictAnalytics:
         
         return {
             'vs_citywide': {
-                'rating_diff': round(np.mean(district_ratings) - np.mean(all_ratings), 2) if district_ratings and all_ratings else 0,
-                'reviews_diff': round(np.mean(district_reviews) - np.mean(all_reviews), 1) if district_reviews and all_reviews else 0,
-                'rating_percentile': self._calc_percentile(np.mean(district_ratings), all_ratings) if district_ratings and all_ratings else 50
+                'rating_diff': round(np.mean(district_ratings) - reference.mean_rating, 2) if district_ratings and reference.mean_rating is not None else 0,
+                'reviews_diff': round(np.mean(district_reviews) - reference.mean_reviews, 1) if district_reviews and reference.mean_reviews is not None else 0,
+                'rating_percentile': reference.rating_percentile(np.mean(district_ratings)) if district_ratings and reference.mean_rating is not None else 50
             }
         }
     
@@ -322,10 +486,6 @@ class DistrictAnalytics:
         
         score = (saturation_factor + quality_factor + diversity_factor) / 3
         return round(min(score, 10), 1)
-    
-    def _calc_percentile(self, value, all_values):
-        """Calculate percentile of value in all_values."""
-        return round(stats.percentileofscore(all_values, value), 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution density rasters for the restaurant heatmap.
+Builds kernel-smoothed rasters of restaurant count, average rating and
+review volume in Web Mercator pixel space and cuts them into map tiles.
+"""
+
+import struct
+import threading
+import zlib
+import numpy as np
+from scipy import ndimage
+from spatial import extract_coordinates
+
+
+TILE_SIZE = 256
+CELL_PX = 8  # raster cell size in screen pixels, 32x32 cells per tile
+HEATMAP_ZOOMS = (11, 12, 13, 14, 15)
+HEATMAP_METRICS = ('count', 'rating', 'reviews')
+
+# Gaussian kernel bandwidth in metres
+KERNEL_BANDWIDTH_M = 120
+
+# Web Mercator ground resolution at the equator, metres per pixel at zoom 0
+EQUATOR_METERS_PER_PIXEL = 156543.03392
+
+
+class DensityRaster:
+    """Kernel-smoothed raster of one metric at one zoom level, stored as its non-empty tiles."""
+
+    def __init__(self, metric, zoom, tiles, vmax):
+        self.metric = metric
+        self.zoom = zoom
+        self.tiles = tiles  # {(x, y): square float32 cell array}
+        self.vmax = vmax
+
+    def tile(self, x, y):
+        """Return the cells covering tile (x, y) as a square float32 array."""
+        cells = self.tiles.get((x, y))
+        if cells is None:
+            size = TILE_SIZE // CELL_PX
+            cells = np.zeros((size, size), dtype=np.float32)
+        return cells
+
+    def tile_png(self, x, y):
+        """Render tile (x, y) as a colour-mapped RGBA PNG."""
+        return encode_png(colorize(self.tile(x, y), self.vmax, self.metric))
+
+
+def build_density_rasters(places, zoom):
+    """Build count, rating and review rasters for all places at one zoom level.
+
+    Only tiles within the kernel's reach of a place are computed: for each,
+    the points in the tile plus a kernel-radius margin are binned with a
+    vectorized bincount and smoothed with a Gaussian kernel, which gives the
+    same cells as smoothing one grid over the whole bounding box without
+    allocating it (outlying places would stretch that box over empty tiles).
+    Rating is the ratio of smoothed rating sums to smoothed rated counts, so
+    sparse cells do not produce spiky averages.
+    """
+    points = [(extract_coordinates(p), p) for p in places]
+    points = [(c, p) for c, p in points if c is not None]
+    if not points:
+        return {}
+
+    lats = np.array([c[0] for c, _ in points])
+    lons = np.array([c[1] for c, _ in points])
+    ratings = np.array([p.get('rating') or 0 for _, p in points], dtype=float)
+    reviews = np.array([p.get('reviews') or 0 for _, p in points], dtype=float)
+    weights = {
+        'count': None,
+        'rated': (ratings > 0).astype(float),
+        'rating_sum': ratings,
+        'review_sum': reviews,
+    }
+
+    px, py = lonlat_to_pixels(lats, lons, zoom)
+    cols = np.floor(px / CELL_PX).astype(int)
+    rows = np.floor(py / CELL_PX).astype(int)
+
+    cell_m = CELL_PX * EQUATOR_METERS_PER_PIXEL * np.cos(np.radians(lats.mean())) / (2 ** zoom)
+    sigma = max(KERNEL_BANDWIDTH_M / cell_m, 1.0)
+    # At least the kernel radius gaussian_filter uses with truncate=3.0
+    pad = int(np.ceil(3 * sigma))
+    cells = TILE_SIZE // CELL_PX
+    size = cells + 2 * pad
+    cell_km2 = (cell_m / 1000) ** 2
+
+    # Tiles holding a place, grown by the number of tiles the kernel can reach
+    reach = -(-pad // cells)
+    occupied = np.unique(np.stack([cols // cells, rows // cells], axis=1), axis=0)
+    offsets = np.array([(dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)])
+    candidates = np.unique((occupied[:, None, :] + offsets[None, :, :]).reshape(-1, 2), axis=0)
+
+    tiles = {metric: {} for metric in HEATMAP_METRICS}
+    for tx, ty in candidates.tolist():
+        col0 = tx * cells - pad
+        row0 = ty * cells - pad
+        inside = (cols >= col0) & (cols < col0 + size) & (rows >= row0) & (rows < row0 + size)
+        if not inside.any():
+            continue
+        flat = (rows[inside] - row0) * size + (cols[inside] - col0)
+
+        def smoothed(w):
+            grid = np.bincount(flat, weights=None if w is None else w[inside], minlength=size * size)
+            grid = grid.reshape(size, size).astype(np.float32)
+            filtered = ndimage.gaussian_filter(grid, sigma=sigma, mode='constant', truncate=3.0)
+            return filtered[pad:pad + cells, pad:pad + cells]
+
+        layer = {name: smoothed(w) for name, w in weights.items()}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Hide averages where the kernel carries less than ~0.1 restaurant
+            avg_rating = np.where(layer['rated'] > 0.1, layer['rating_sum'] / layer['rated'], 0.0)
+
+        values = {
+            'count': layer['count'] / cell_km2,
+            'rating': avg_rating,
+            'reviews': layer['review_sum'] / cell_km2,
+        }
+        for metric, cell_values in values.items():
+            if cell_values.any():
+                tiles[metric][(tx, ty)] = cell_values.astype(np.float32)
+
+    rasters = {}
+    for metric, metric_tiles in tiles.items():
+        nonzero = np.concatenate([t[t > 0] for t in metric_tiles.values()]) if metric_tiles else []
+        vmax = float(np.percentile(nonzero, 99)) if len(nonzero) else 1.0
+        rasters[metric] = DensityRaster(metric, zoom, metric_tiles, vmax)
+
+    return rasters
+
+
+class DensityRasterCache:
+    """Density rasters per (metric, zoom), invalidated when the dataset changes.
+
+    Shared by the precompute thread and request handlers; each zoom level is
+    built once per dataset version under a lock.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.rasters = {}
+        self._lock = threading.Lock()
+
+    def get(self, places, version, metric, zoom):
+        """Return the raster for metric at zoom, building the zoom level if needed."""
+        if metric not in HEATMAP_METRICS or zoom not in HEATMAP_ZOOMS:
+            return None
+
+        return self._build(places, version, zoom).get(metric)
+
+    def precompute(self, places, version):
+        """Build every zoom level for a dataset version."""
+        for zoom in HEATMAP_ZOOMS:
+            self._build(places, version, zoom)
+
+    def _build(self, places, version, zoom):
+        with self._lock:
+            rasters = self._rasters_for(version)
+            if zoom not in rasters:
+                rasters[zoom] = build_density_rasters(places, zoom)
+            return rasters[zoom]
+
+    def _rasters_for(self, version):
+        if version != self.version:
+            self.version = version
+            self.rasters = {}
+        return self.rasters
+
+
+def lonlat_to_pixels(lats, lons, zoom):
+    """Project lat/lon arrays to global Web Mercator pixel coordinates."""
+    scale = TILE_SIZE * (2 ** zoom)
+    lat_rad = np.radians(np.clip(lats, -85.0511, 85.0511))
+    px = (np.asarray(lons) + 180.0) / 360.0 * scale
+    py = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * scale
+    return px, py
+
+
+def colorize(values, vmax, metric):
+    """Map raster values to an RGBA heat ramp, upscaled to tile pixels."""
+    if metric == 'rating':
+        # Ratings are interesting between 3.5 and 5 stars
+        norm = np.where(values > 0, (values - 3.5) / 1.5, 0.0)
+    else:
+        norm = values / vmax if vmax > 0 else values
+    norm = np.clip(norm, 0.0, 1.0)
+
+    rgba = np.zeros(norm.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = 255
+    rgba[..., 1] = (255 * (1.0 - norm) ** 0.8).astype(np.uint8)
+    rgba[..., 2] = (64 * (1.0 - norm)).astype(np.uint8)
+    # Leave kernel tails below 2% of the scale fully transparent
+    rgba[..., 3] = np.where(norm > 0.02, 60 + 180 * norm, 0).astype(np.uint8)
+
+    return np.kron(rgba, np.ones((CELL_PX, CELL_PX, 1), dtype=np.uint8))
+
+
+def encode_png(rgba):
+    """Encode an (H, W, 4) uint8 array as a PNG image."""
+    height, width, _ = rgba.shape
+    # Each scanline is prefixed with filter type 0 (None)
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)])
+
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6))
+            + chunk(b'IEND', b''))
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+JSON helpers shared by the server, the batch analyzer and the city summary.
+"""
+
+import json
+import os
+import numpy as np
+
+
+def convert_numpy_types(obj):
+    """Recursively convert numpy types to Python native types."""
+    if isinstance(obj, (np.integer, np.int64, np.int32)):
+        return int(obj)
+    elif isinstance(obj, (np.floating, np.float64, np.float32)):
+        return float(obj)
+    elif isinstance(obj, (np.bool_, bool)):
+        return bool(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, dict):
+        return {key: convert_numpy_types(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_numpy_types(item) for item in obj]
+    return obj
+
+
+def write_json_atomic(path, data):
+    """Write data as JSON via a temp file and rename, so readers never see a partial file.
+
+    Returns the bytes written.
+    """
+    payload = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return payload
@@ -9,35 +9,241 @@ import json
 from typing import Dict, Optional
 import os
 import copy
+import hashlib
+import time
+from llm_cache import get_response_cache
+from llm_metrics import get_metrics
+from llm_health import get_health_monitor
+
+
+# Override with OLLAMA_BASE_URL, e.g. to point at mock_ollama.py
+DEFAULT_BASE_URL = os.environ.get('OLLAMA_BASE_URL', 'http://localhost:11434')
+
+
+# Shared instruction prefix for every district prompt. Sent as Ollama's
+# system prompt ahead of the district data so the evaluated prefix is the
+# same across a batch and its KV state can be reused.
+ANALYSIS_SYSTEM_PROMPT = """You are a restaurant market analyst providing insights for Amsterdam districts.
+You will receive the market data of one district, identified by its 4-digit postal code (PC4).
+
+TASK:
+Provide a comprehensive 300-400 word analysis covering:
+1. Market Overview (2-3 sentences on current state)
+2. Competitive Landscape (strengths and challenges)
+3. Business Opportunities (specific actionable insights)
+4. Strategic Recommendations (for new or existing businesses)
+
+Write in a professional, data-driven tone. Be specific and actionable."""
+
+# Instructions for packing several districts into one structured-output call
+BATCH_SYSTEM_PROMPT = """You are a restaurant market analyst providing insights for Amsterdam districts.
+You will receive compact market data for several districts, each identified by its 4-digit postal code (PC4).
+
+TASK:
+For EACH district provide a 300-400 word analysis covering:
+1. Market Overview (2-3 sentences on current state)
+2. Competitive Landscape (strengths and challenges)
+3. Business Opportunities (specific actionable insights)
+4. Strategic Recommendations (for new or existing businesses)
+
+Respond with a JSON object mapping every PC4 code to its analysis text, e.g. {"1012": "...", "1013": "..."}.
+Write in a professional, data-driven tone. Be specific and actionable."""
+
+# Output token budget per district in a batched call (JSON framing included)
+BATCH_TOKENS_PER_DISTRICT = 600
+
+# Structured insight sections, each written only from the analytics fields
+# it depends on so unchanged sections can be kept when the data changes
+INSIGHT_SECTIONS = {
+    'overview': {
+        'title': 'Market Overview',
+        'task': '2-3 sentences on the current state of the market',
+        'fields': ('overview', 'quality_metrics', 'benchmarks')
+    },
+    'competition': {
+        'title': 'Competitive Landscape',
+        'task': 'strengths and challenges of the competitive environment',
+        'fields': ('competition_analysis', 'cuisine_analysis')
+    },
+    'opportunities': {
+        'title': 'Business Opportunities',
+        'task': 'specific actionable opportunities',
+        'fields': ('growth_opportunities', 'cuisine_analysis')
+    },
+    'recommendation': {
+        'title': 'Strategic Recommendations',
+        'task': 'recommendations for new or existing businesses, including pricing and positioning',
+        'fields': ('price_analysis', 'market_positioning', 'competition_analysis', 'growth_opportunities')
+    }
+}
+
+SECTION_SYSTEM_PROMPT = """You are a restaurant market analyst providing insights for Amsterdam districts.
+You will receive market data of one district, identified by its 4-digit postal code (PC4), and the report sections to write.
+
+Respond with a JSON object containing exactly the requested section keys, each mapped to a 70-100 word paragraph.
+Write in a professional, data-driven tone. Be specific and actionable."""
+
+# Output token budget per section (JSON framing included)
+SECTION_TOKENS = 160
+
+
+def render_sections(sections: Dict) -> str:
+    """Render structured sections as the plain-text insight shown to users."""
+    return "\n\n".join(
+        f"**{spec['title']}:** {sections[name]['text']}"
+        for name, spec in INSIGHT_SECTIONS.items() if name in sections
+    )
 
 
 class LLMAnalyzer:
-    def __init__(self, model='llama3', base_url='http://localhost:11434'):
+    def __init__(self, model='llama3', base_url=DEFAULT_BASE_URL, response_cache=None,
+                 keep_alive='30m', metrics=None, num_predict=500, timeout=30, max_retries=2):
         """
         Initialize LLM analyzer.
         
         Args:
             model: Model name (e.g., 'llama3', 'mistral', 'phi')
             base_url: Ollama API base URL
+            response_cache: LLMResponseCache to use (defaults to the shared on-disk cache)
+            keep_alive: How long Ollama keeps the model (and its prompt cache) loaded
+            metrics: LLMMetrics sink for per-call timings (defaults to the shared sink)
+            num_predict: Output token budget of a district analysis
+            timeout: Seconds to wait for one generate request
+            max_retries: Attempts per district analysis
         """
         self.model = model
         self.base_url = base_url
         self.api_url = f"{base_url}/api/generate"
+        self.keep_alive = keep_alive
+        self.num_predict = num_predict
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.response_cache = response_cache if response_cache is not None else get_response_cache()
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.health = get_health_monitor(base_url)
     
-    def generate_district_analysis(self, pc4: str, analytics_data: Dict) -> Optional[str]:
-        """Generate AI analysis for a district."""
+    def generate_district_analysis(self, pc4: str, analytics_data: Dict, use_cache: bool = True,
+                                   fallback: bool = True, deadline: Optional[float] = None) -> Optional[str]:
+        """Generate AI analysis for a district.
+        
+        With fallback=False LLM errors are raised instead of answered with the
+        rule-based analysis, so a caller can try another model. deadline
+        (time.monotonic()) caps the time spent on the call including retries.
+        """
         # Filter out cannabis and coffee shops from analytics data before sending to LLM
         filtered_data = self._filter_sensitive_categories(analytics_data)
         
         prompt = self._create_analysis_prompt(pc4, filtered_data)
         
         try:
-            response = self._call_llm(prompt)
+            response = self._call_llm(
+                prompt,
+                max_retries=self.max_retries,
+                use_cache=use_cache,
+                system=ANALYSIS_SYSTEM_PROMPT,
+                num_predict=self.num_predict,
+                timeout=self.timeout,
+                deadline=deadline
+            )
             return response
         except Exception as e:
+            if not fallback:
+                raise
             print(f"Error generating analysis: {e}")
             return self._generate_fallback_analysis(pc4, filtered_data)
 
+    def generate_batch_analyses(self, districts: Dict[str, Dict], use_cache: bool = True) -> Dict[str, str]:
+        """Generate analyses for several districts in one structured-output call.
+        
+        Args:
+            districts: {pc4: analytics_data}
+        
+        Returns {pc4: analysis} for the districts that could be split out of the
+        response; callers fall back to single-district calls for the rest.
+        """
+        pc4s = list(districts)
+        prompt = "\n\n".join(
+            self._create_compact_prompt(pc4, self._filter_sensitive_categories(data))
+            for pc4, data in districts.items()
+        )
+        
+        try:
+            response = self._call_llm(
+                prompt,
+                system=BATCH_SYSTEM_PROMPT,
+                use_cache=use_cache,
+                num_predict=BATCH_TOKENS_PER_DISTRICT * len(pc4s),
+                response_format='json',
+                timeout=30 * len(pc4s)
+            )
+        except Exception as e:
+            print(f"Error generating batch analysis: {e}")
+            return {}
+        
+        return self._split_json_response(response, pc4s)
+    
+    def generate_section_analysis(self, pc4: str, analytics_data: Dict, previous_sections: Optional[Dict] = None,
+                                  use_cache: bool = True, deadline: Optional[float] = None):
+        """Generate structured insight sections, regenerating only stale ones.
+        
+        A section is reused from previous_sections when the fingerprint of the
+        analytics fields it depends on is unchanged; the rest are written in one
+        JSON-format call. Raises if the LLM fails or omits a requested section;
+        deadline is passed on to _call_llm.
+        
+        Returns (sections, regenerated): sections maps name to
+        {'text', 'fingerprint'}, regenerated lists the sections written now.
+        """
+        filtered_data = self._filter_sensitive_categories(analytics_data)
+        fingerprints = {name: self.section_fingerprint(name, filtered_data) for name in INSIGHT_SECTIONS}
+        
+        previous_sections = previous_sections or {}
+        sections = {
+            name: previous_sections[name] for name in INSIGHT_SECTIONS
+            if previous_sections.get(name, {}).get('fingerprint') == fingerprints[name]
+            and previous_sections[name].get('text')
+        }
+        stale = [name for name in INSIGHT_SECTIONS if name not in sections]
+        if not stale:
+            return sections, []
+        
+        response = self._call_llm(
+            self._create_section_prompt(pc4, filtered_data, stale),
+            max_retries=self.max_retries,
+            use_cache=use_cache,
+            system=SECTION_SYSTEM_PROMPT,
+            num_predict=SECTION_TOKENS * len(stale),
+            response_format='json',
+            timeout=self.timeout,
+            deadline=deadline
+        )
+        texts = self._split_json_response(response, stale)
+        
+        missing = [name for name in stale if name not in texts]
+        if missing:
+            raise Exception(f"Response lacks sections: {', '.join(missing)}")
+        
+        for name in stale:
+            sections[name] = {'text': texts[name], 'fingerprint': fingerprints[name]}
+        return sections, stale
+    
+    def section_fingerprint(self, name: str, data: Dict) -> str:
+        """Hash of the prompt data blocks a section is written from.
+        
+        Hashes the rendered text rather than the raw analytics, so fields the
+        prompt never shows (or shows rounded) don't make a section stale.
+        """
+        blocks = self._create_prompt_blocks(data)
+        material = "\n\n".join(blocks[field] for field in INSIGHT_SECTIONS[name]['fields'])
+        return hashlib.sha1(material.encode('utf-8')).hexdigest()
+    
+    def prompt_fingerprint(self, analytics_data: Dict) -> str:
+        """Hash of everything the section prompts of a district show, after filtering."""
+        filtered_data = self._filter_sensitive_categories(analytics_data)
+        return hashlib.sha1(''.join(
+            self.section_fingerprint(name, filtered_data) for name in INSIGHT_SECTIONS
+        ).encode('utf-8')).hexdigest()
+    
     def _filter_sensitive_categories(self, data):
         """Remove cannabis and coffee shop related data."""
         clean_data = copy.deepcopy(data)
@@ -59,8 +265,29 @@ class LLMAnalyzer:
         return clean_data
     
     def _create_analysis_prompt(self, pc4: str, data: Dict) -> str:
-        """Create structured prompt for district analysis."""
+        """Create the per-district data part of the analysis prompt.
+        
+        The instructions live in ANALYSIS_SYSTEM_PROMPT, which is identical for
+        every district so Ollama can reuse its evaluated prefix.
+        """
+        blocks = self._create_prompt_blocks(data)
+        return f"DISTRICT: {pc4}\n\n" + "\n\n".join(blocks.values())
+    
+    def _create_section_prompt(self, pc4: str, data: Dict, sections) -> str:
+        """Create a prompt with only the data blocks the requested sections depend on."""
+        blocks = self._create_prompt_blocks(data)
+        fields = {field for name in sections for field in INSIGHT_SECTIONS[name]['fields']}
         
+        section_lines = "\n".join(
+            f"- {name}: {INSIGHT_SECTIONS[name]['title']} ({INSIGHT_SECTIONS[name]['task']})"
+            for name in sections
+        )
+        data_blocks = "\n\n".join(block for field, block in blocks.items() if field in fields)
+        
+        return f"DISTRICT: {pc4}\n\n{data_blocks}\n\nSECTIONS TO WRITE:\n{section_lines}"
+    
+    def _create_prompt_blocks(self, data: Dict) -> Dict[str, str]:
+        """Render each analytics field as a prompt data block, keyed by field name."""
         overview = data.get('overview', {})
         quality = data.get('quality_metrics', {})
         price = data.get('price_analysis', {})
@@ -108,99 +335,246 @@ class LLMAnalyzer:
         rating_diff_str = f"{rating_diff:+.2f}"
         reviews_diff_str = f"{reviews_diff:+.0f}"
         
-        prompt = f"""You are a restaurant market analyst providing insights for Amsterdam district {pc4}.
-
-DATA OVERVIEW:
+        return {
+            'overview': f"""DATA OVERVIEW:
 - Total Restaurants: {total_restaurants}
 - Average Rating: {avg_rating}/5.0
 - Total Reviews: {total_reviews:,}
-- Cuisine Diversity: {cuisine_count} different cuisines
-
-QUALITY METRICS:
+- Cuisine Diversity: {cuisine_count} different cuisines""",
+            'quality_metrics': f"""QUALITY METRICS:
 - Rating Range: {min_rating} - {max_rating}
 - High-Rated (4.5+): {high_rated} restaurants
-- Review Engagement: {review_mean_str} avg reviews per restaurant
-
-PRICE ANALYSIS:
+- Review Engagement: {review_mean_str} avg reviews per restaurant""",
+            'price_analysis': f"""PRICE ANALYSIS:
 - Average Price Level: {avg_price}/4.0
 - Affordability Score: {affordability}/10
-- Distribution: Budget {price_dist.get('budget', 0)}, Moderate {price_dist.get('moderate', 0)}, Upscale {price_dist.get('upscale', 0)}
-
-CUISINE LANDSCAPE:
+- Distribution: Budget {price_dist.get('budget', 0)}, Moderate {price_dist.get('moderate', 0)}, Upscale {price_dist.get('upscale', 0)}""",
+            'cuisine_analysis': f"""CUISINE LANDSCAPE:
 - Total Cuisines: {cuisine.get('total_cuisines', 0)}
 - Diversity Index: {cuisine.get('diversity_index', 0)}
 - Top Cuisine: {top_cuisine}
-- Market Concentration: {is_concentrated}
-
-COMPETITION:
+- Market Concentration: {is_concentrated}""",
+            'competition_analysis': f"""COMPETITION:
 - Market Saturation: {saturation}
 - Competitive Intensity: {intensity}
-- Entry Barriers: {barriers}
-
-MARKET POSITIONING:
+- Entry Barriers: {barriers}""",
+            'market_positioning': f"""MARKET POSITIONING:
 - Category: {pos_category}
-- Quality/Price Ratio: {qp_ratio}
-
-GROWTH OPPORTUNITIES:
+- Quality/Price Ratio: {qp_ratio}""",
+            'growth_opportunities': f"""GROWTH OPPORTUNITIES:
 - Market Potential Score: {potential}/10
 - Quality Gap: {quality_gap}
-- Missing Popular Cuisines: {missing_count}
-
-BENCHMARKING:
+- Missing Popular Cuisines: {missing_count}""",
+            'benchmarks': f"""BENCHMARKING:
 - Rating vs Citywide: {rating_diff_str}
-- Reviews vs Citywide: {reviews_diff_str}
-
-TASK:
-Provide a comprehensive 300-400 word analysis covering:
-1. Market Overview (2-3 sentences on current state)
-2. Competitive Landscape (strengths and challenges)
-3. Business Opportunities (specific actionable insights)
-4. Strategic Recommendations (for new or existing businesses)
-
-Write in a professional, data-driven tone. Be specific and actionable."""
-
-        return prompt
+- Reviews vs Citywide: {reviews_diff_str}"""
+        }
     
-    def _call_llm(self, prompt: str, max_retries: int = 2) -> str:
-        """Call Ollama API to generate response."""
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "num_predict": 500  # Ollama uses num_predict instead of max_tokens
+    def _create_compact_prompt(self, pc4: str, data: Dict) -> str:
+        """Create a compact per-district data block for batched prompts."""
+        overview = data.get('overview', {})
+        price = data.get('price_analysis', {})
+        cuisine = data.get('cuisine_analysis', {})
+        competition = data.get('competition_analysis', {})
+        positioning = data.get('market_positioning', {})
+        opportunities = data.get('growth_opportunities', {})
+        vs_citywide = data.get('benchmarks', {}).get('vs_citywide', {})
+        
+        top_cuisines = ', '.join(c['cuisine'] for c in cuisine.get('top_cuisines', [])[:3]) or 'N/A'
+        missing = ', '.join(c['cuisine'] for c in opportunities.get('underserved_cuisines', [])[:3]) or 'none'
+        concentration = "High" if cuisine.get('concentration', {}).get('is_concentrated') else "Low"
+        
+        return (
+            f"DISTRICT {pc4}: {overview.get('total_restaurants', 0)} restaurants, "
+            f"rating {overview.get('avg_rating', 0)}/5.0 ({vs_citywide.get('rating_diff', 0):+.2f} vs city), "
+            f"{overview.get('total_reviews', 0):,} reviews, {overview.get('cuisines_count', 0)} cuisines\n"
+            f"- Top cuisines: {top_cuisines} (concentration {concentration})\n"
+            f"- Price level {price.get('average_price_level', 0)}/4.0, "
+            f"affordability {price.get('affordability_score', 0)}/10\n"
+            f"- Saturation {competition.get('market_saturation', 'N/A')}, "
+            f"intensity {competition.get('competitive_intensity', 'N/A')}, "
+            f"entry barriers {competition.get('entry_barriers', 'N/A')}\n"
+            f"- Positioning {positioning.get('positioning', 'N/A')} "
+            f"(quality/price {positioning.get('quality_price_ratio', 0)})\n"
+            f"- Potential {opportunities.get('market_potential_score', 0)}/10, "
+            f"quality gap {opportunities.get('quality_improvement_potential', 0)}, "
+            f"missing popular cuisines: {missing}"
+        )
+    
+    def _split_json_response(self, response: str, keys) -> Dict[str, str]:
+        """Split a JSON response into {key: text} (PC4s or section names), dropping anything malformed."""
+        try:
+            parsed = json.loads(response)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+        
+        # Tolerate {"districts": [{"pc4": ..., "analysis": ...}]} as well as {pc4: text}
+        if isinstance(parsed, dict) and isinstance(parsed.get('districts'), list):
+            parsed = parsed['districts']
+        if isinstance(parsed, list):
+            parsed = {
+                str(item.get('pc4')): item.get('analysis')
+                for item in parsed if isinstance(item, dict)
             }
+        if not isinstance(parsed, dict):
+            return {}
+        
+        return {
+            key: parsed[key].strip()
+            for key in keys
+            if isinstance(parsed.get(key), str) and parsed[key].strip()
         }
+    
+    def _call_llm(self, prompt: str, max_retries: int = 2, use_cache: bool = True,
+                  system: Optional[str] = None, num_predict: int = 500,
+                  response_format: Optional[str] = None, timeout: int = 30,
+                  deadline: Optional[float] = None) -> str:
+        """Call Ollama API to generate response.
+        
+        Responses are looked up in the shared response cache first; with
+        use_cache=False a fresh response is generated and replaces the entry.
+        With a deadline (time.monotonic()) each attempt waits at most until
+        then, and no attempt is started after it.
+        """
+        payload = self._build_payload(prompt, system, num_predict=num_predict, response_format=response_format)
+        started = time.perf_counter()
+        
+        cache_key = None
+        if self.response_cache is not None:
+            extra = {'format': response_format} if response_format else {}
+            cache_key = self.response_cache.make_key(self.model, payload['options'], prompt, system=system, **extra)
+            if use_cache:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    self.metrics.record(self.model, time.perf_counter() - started, cache_hit=True)
+                    return cached
         
         for attempt in range(max_retries):
+            attempt_timeout = timeout
+            if deadline is not None:
+                attempt_timeout = min(timeout, deadline - time.monotonic())
+                if attempt_timeout <= 0:
+                    self._record_failure(started, attempt, 'deadline')
+                    raise Exception("LLM latency budget exhausted")
+            
+            # Fail fast while Ollama is known to be down
+            if not self.health.allow_request():
+                self._record_failure(started, attempt, 'circuit_open')
+                raise Exception("Ollama is unavailable (circuit breaker open)")
+            
             try:
-                response = requests.post(
-                    self.api_url,
-                    json=payload,
-                    timeout=30
-                )
-                response.raise_for_status()
+                result = self._post_generate(payload, timeout=attempt_timeout)
+                text = result.get('response', '').strip()
+                self.health.record_success()
+                self.metrics.record(self.model, time.perf_counter() - started, result, retries=attempt)
                 
-                result = response.json()
-                return result.get('response', '').strip()
+                if cache_key and text:
+                    self.response_cache.put(cache_key, text, model=self.model)
+                return text
                 
-            except requests.exceptions.ConnectionError:
+            except requests.exceptions.ConnectionError as e:
+                self.health.record_failure(e)
                 if attempt == max_retries - 1:
+                    self._record_failure(started, attempt, 'connection')
                     raise Exception("Cannot connect to Ollama. Make sure it's running: 'ollama serve'")
                 continue
-            except requests.exceptions.Timeout:
+            except requests.exceptions.Timeout as e:
+                # A slow generation is a latency problem, not an outage; the
+                # health probe catches a hung server. Releases a half-open trial.
+                self.health.record_timeout(e)
                 if attempt == max_retries - 1:
+                    self._record_failure(started, attempt, 'timeout')
                     raise Exception("LLM request timed out")
                 continue
+            except requests.exceptions.HTTPError as e:
+                # Ollama answered, so this is a failure of this model (e.g. a
+                # 404 for a model that isn't pulled), not an outage
+                self.health.record_model_error(e)
+                status = e.response.status_code if e.response is not None else None
+                if attempt == max_retries - 1 or (status is not None and status < 500):
+                    self._record_failure(started, attempt, f"http_{status}")
+                    raise Exception(f"LLM error: {str(e)}")
+                continue
             except Exception as e:
+                # Only connection errors and timeouts count as outages
+                self.health.record_model_error(e)
                 if attempt == max_retries - 1:
+                    self._record_failure(started, attempt, str(e))
                     raise Exception(f"LLM error: {str(e)}")
                 continue
         
         return ""
     
+    def _record_failure(self, started: float, attempt: int, error: str):
+        """Record a call that failed after all retries."""
+        self.metrics.record(self.model, time.perf_counter() - started, retries=attempt, error=error)
+    
+    def _build_payload(self, prompt: str, system: Optional[str] = None, num_predict: int = 500,
+                       response_format: Optional[str] = None) -> Dict:
+        """Build an Ollama /api/generate request body."""
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "num_predict": num_predict  # Ollama uses num_predict instead of max_tokens
+            }
+        }
+        if system:
+            payload["system"] = system
+        if response_format:
+            payload["format"] = response_format
+        return payload
+    
+    def _post_generate(self, payload: Dict, timeout: int = 30) -> Dict:
+        """POST a generate request and return Ollama's full JSON response."""
+        response = requests.post(
+            self.api_url,
+            json=payload,
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    def measure_prompt_eval(self, districts, num_predict: int = 1) -> Dict:
+        """Compare prompt-eval cost of the old single-prompt layout and the split layout.
+        
+        Args:
+            districts: List of (pc4, analytics_data) pairs, evaluated in order
+            num_predict: Tokens to generate per call (kept tiny to isolate prompt eval)
+        
+        Returns mean prompt_eval_count and prompt_eval_duration (ms) per layout.
+        """
+        layouts = {
+            # Previous layout: district data first, instructions appended, no system prompt
+            'single_prompt': lambda pc4, data: self._build_payload(
+                f"{self._create_analysis_prompt(pc4, data)}\n\n{ANALYSIS_SYSTEM_PROMPT}", num_predict=num_predict
+            ),
+            # Shared system prefix first, district data last
+            'system_prefix': lambda pc4, data: self._build_payload(
+                self._create_analysis_prompt(pc4, data), system=ANALYSIS_SYSTEM_PROMPT, num_predict=num_predict
+            ),
+        }
+        
+        report = {}
+        for name, build in layouts.items():
+            counts, durations_ms = [], []
+            for pc4, data in districts:
+                result = self._post_generate(build(pc4, self._filter_sensitive_categories(data)), timeout=120)
+                counts.append(result.get('prompt_eval_count', 0))
+                durations_ms.append(result.get('prompt_eval_duration', 0) / 1e6)
+            
+            report[name] = {
+                'calls': len(districts),
+                'mean_prompt_eval_count': round(sum(counts) / len(counts), 1) if counts else 0,
+                'mean_prompt_eval_ms': round(sum(durations_ms) / len(durations_ms), 1) if durations_ms else 0
+            }
+        
+        return report
+    
     def _generate_fallback_analysis(self, pc4: str, data: Dict) -> str:
         """Generate simple rule-based analysis as fallback."""
         overview = data.get('overview', {})
@@ -253,18 +627,36 @@ Write in a professional, data-driven tone. Be specific and actionable."""
         return analysis
     
     def check_availability(self) -> bool:
-        """Check if LLM service is available."""
-        try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
+        """Check if LLM service is available (answered from the shared health monitor)."""
+        return self.health.is_available()
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='LLM analyzer test')
+    parser.add_argument('--measure-prefix',
+                        type=int,
+                        metavar='N',
+                        help='Measure prompt-eval time of both prompt layouts over N real districts')
+    args = parser.parse_args()
+    
     # Test the LLM analyzer
     analyzer = LLMAnalyzer()
     
+    if args.measure_prefix:
+        from district_analytics import DistrictAnalytics
+        
+        district_analytics = DistrictAnalytics()
+        pc4s = [d['pc4'] for d in district_analytics.get_district_summary()[:args.measure_prefix]]
+        districts = [(pc4, district_analytics.get_detailed_analytics(pc4)) for pc4 in pc4s]
+        
+        print(f"Measuring prompt eval over {len(districts)} districts...")
+        for layout, stats in analyzer.measure_prompt_eval(districts).items():
+            print(f"  {layout}: {stats['mean_prompt_eval_count']} prompt tokens evaluated, "
+                  f"{stats['mean_prompt_eval_ms']} ms prompt eval (mean of {stats['calls']} calls)")
+        raise SystemExit(0)
+    
     print("=" * 60)
     print("LLM ANALYZER TEST")
     print("=" * 60)
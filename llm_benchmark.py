@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Offline load tests for the LLM path.
+Starts mock_ollama.py in-process (unless --ollama-url is given) and measures
+p50/p95/p99 latency and throughput of the server's district endpoints and of
+BatchAnalyzer under increasing concurrency.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+
+def latency_report(latencies, errors, elapsed):
+    """Summarize per-request latencies (seconds) of one load run."""
+    latencies = np.asarray(latencies, dtype=float)
+    ok = len(latencies)
+
+    def pct(q):
+        return round(float(np.percentile(latencies, q)), 3) if ok else None
+
+    return {
+        'requests': ok + errors,
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 2),
+        'throughput_per_second': round(ok / elapsed, 2) if elapsed else None,
+        'mean': round(float(latencies.mean()), 3) if ok else None,
+        'p50': pct(50),
+        'p95': pct(95),
+        'p99': pct(99)
+    }
+
+
+def run_load(call, items, concurrency):
+    """Run call(item) for every item on a thread pool and report latencies."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(item):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            call(item)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, items))
+
+    return latency_report(latencies, errors, time.perf_counter() - start)
+
+
+def start_api_server(port, data_dir, uncached_pc4s=()):
+    """Run the FastAPI app in a background thread; returns its base URL.
+
+    The server reads and writes its district and city summary caches in
+    data_dir (starting from a copy of the real district cache), so
+    /regenerate runs never touch the project's cache files. Districts in
+    uncached_pc4s are left out of the copy, so the district endpoint has to
+    generate them live instead of answering from the cache.
+    """
+    import uvicorn
+    import server
+    from city_summary import CitySummaryCache
+
+    analyses_file = os.path.join(data_dir, os.path.basename(server.ANALYSES_CACHE_FILE))
+    if os.path.exists(server.ANALYSES_CACHE_FILE):
+        with open(server.ANALYSES_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        for pc4 in uncached_pc4s:
+            cache.get('districts', {}).pop(pc4, None)
+        with open(analyses_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+    server.ANALYSES_CACHE_FILE = analyses_file
+    server.CITY_SUMMARY_CACHE_FILE = os.path.join(data_dir, os.path.basename(server.CITY_SUMMARY_CACHE_FILE))
+    server.city_summary_cache = CitySummaryCache(server.ANALYSES_CACHE_FILE, server.CITY_SUMMARY_CACHE_FILE)
+    app = server.app
+
+    api = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=api.run, name='api-server', daemon=True).start()
+
+    deadline = time.time() + 60
+    while not api.started:
+        if time.time() > deadline:
+            raise RuntimeError("API server did not start")
+        time.sleep(0.1)
+    return f"http://127.0.0.1:{port}"
+
+
+def benchmark_server(server_url, pc4s, concurrency, endpoint='regenerate', total_requests=16):
+    """Load-test a district endpoint with total_requests spread over pc4s."""
+    targets = [pc4s[i % len(pc4s)] for i in range(total_requests)]
+
+    def call(pc4):
+        if endpoint == 'regenerate':
+            response = requests.post(f"{server_url}/api/analytics/district/{pc4}/regenerate", timeout=300)
+        else:
+            response = requests.get(f"{server_url}/api/analytics/district/{pc4}", timeout=300)
+        response.raise_for_status()
+        body = response.json()
+        # The endpoints answer 200 with success=False / no model when they used the fallback
+        if body.get('success') is False:
+            raise RuntimeError(body.get('error'))
+        if endpoint == 'district' and not body.get('cached') and body.get('model') is None:
+            raise RuntimeError("rule-based fallback")
+
+    return run_load(call, targets, concurrency)
+
+
+def benchmark_batch(pc4s, concurrency, batch_size=1):
+    """Time BatchAnalyzer's worker pool on pc4s without touching the real cache or reports."""
+    from batch_analyzer import BatchAnalyzer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = BatchAnalyzer(
+            cache_file=os.path.join(tmp, 'cache.json'),
+            concurrency=concurrency,
+            batch_size=batch_size
+        )
+        jobs = analyzer._compute_analytics(pc4s)
+
+        start = time.perf_counter()
+        entries = analyzer._generate_insights(jobs, use_llm=True, rate_limit_seconds=0)
+        elapsed = time.perf_counter() - start
+
+    # Districts answered with the rule-based fallback count as errors
+    latencies = [e['generation_time_seconds'] for e in entries.values() if e['llm_used']]
+    return latency_report(latencies, len(jobs) - len(latencies), elapsed)
+
+
+def print_report(title, reports):
+    print(f"\n{title}")
+    print("-" * 70)
+    print(f"{'conc':>5} {'reqs':>5} {'errs':>5} {'req/s':>8} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for concurrency, r in reports.items():
+        print(f"{concurrency:>5} {r['requests']:>5} {r['errors']:>5} {r['throughput_per_second'] or 0:>8} "
+              f"{r['mean'] or 0:>8} {r['p50'] or 0:>8} {r['p95'] or 0:>8} {r['p99'] or 0:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the LLM path against a mock Ollama')
+    parser.add_argument('--mode', choices=['server', 'batch', 'all'], default='all')
+    parser.add_argument('--ollama-url', help='Use this Ollama instead of starting the mock')
+    parser.add_argument('--server-url', help='Benchmark a running API server instead of starting one')
+    parser.add_argument('--port', type=int, default=8765, help='Port for the in-process API server')
+    parser.add_argument('--endpoint', choices=['regenerate', 'district'], default='regenerate')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--requests', type=int, default=16, help='Requests per server run')
+    parser.add_argument('--districts', type=int, default=16, help='Districts per batch run')
+    parser.add_argument('--batch-size', type=int, default=1, help='BatchAnalyzer districts per LLM call')
+    parser.add_argument('--mock-latency', type=float, default=0.05)
+    parser.add_argument('--mock-tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--mock-load-seconds', type=float, default=1.0)
+    parser.add_argument('--mock-failure-rate', type=float, default=0.0)
+    parser.add_argument('--mock-parallel', type=int, default=1)
+    parser.add_argument('--mock-models', nargs='+', help='Models served by the mock (default: all routed models)')
+    args = parser.parse_args()
+
+    # Measure real generations, and keep benchmark calls out of the metrics log
+    os.environ.setdefault('LLM_RESPONSE_CACHE', 'off')
+    os.environ.setdefault('LLM_METRICS_FILE', 'off')
+
+    mock = None
+    if args.ollama_url:
+        os.environ['OLLAMA_BASE_URL'] = args.ollama_url
+    else:
+        from mock_ollama import MockOllamaConfig, start_mock_server
+
+        mock_config = MockOllamaConfig(
+            latency=args.mock_latency,
+            tokens_per_second=args.mock_tokens_per_second,
+            load_seconds=args.mock_load_seconds,
+            failure_rate=args.mock_failure_rate,
+            parallel=args.mock_parallel,
+            seed=0
+        )
+        mock, url = start_mock_server(config=mock_config)
+        # Must be set before llm_analyzer is imported
+        os.environ['OLLAMA_BASE_URL'] = url
+
+        # Serve every model the router may pick
+        from llm_router import default_routes
+        mock_config.models = args.mock_models or sorted(
+            {model for route in default_routes().values() for model in route['models']}
+        )
+        print(f"Mock Ollama running at {url} (models: {', '.join(mock_config.models)})")
+
+    from district_analytics import DistrictAnalytics
+    pc4s = [d['pc4'] for d in DistrictAnalytics().get_district_summary()]
+
+    if args.mode in ('server', 'all'):
+        if args.server_url and args.endpoint == 'regenerate':
+            print(f"⚠️  /regenerate saves its insights into the district cache of {args.server_url}")
+        elif args.server_url:
+            print(f"⚠️  Districts cached by {args.server_url} are answered without calling the LLM")
+        server_dir = tempfile.TemporaryDirectory()
+        # The district endpoint answers cached districts from the cache file; time the LLM path instead
+        uncached = pc4s if args.endpoint == 'district' else ()
+        server_url = args.server_url or start_api_server(args.port, server_dir.name, uncached)
+        reports = {
+            c: benchmark_server(server_url, pc4s, c, args.endpoint, args.requests)
+            for c in args.concurrency
+        }
+        print_report(f"SERVER {args.endpoint.upper()} ENDPOINT ({server_url})", reports)
+
+    if args.mode in ('batch', 'all'):
+        reports = {
+            c: benchmark_batch(pc4s[:args.districts], c, args.batch_size)
+            for c in args.concurrency
+        }
+        print_report(f"BATCH ANALYZER (batch size {args.batch_size}, latency per district)", reports)
+
+    if mock:
+        mock.shutdown()
+    if args.mode in ('server', 'all'):
+        server_dir.cleanup()
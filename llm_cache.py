@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Persistent, content-addressed cache for LLM responses.
+Responses are keyed by a hash of (model, options, prompt) and stored in
+SQLite so the server, batch_analyzer.py and city_summary.py share them.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_CACHE_FILE = 'llm_response_cache.db'
+
+# Shared cache instances keyed by database path
+_CACHES = {}
+
+
+class LLMResponseCache:
+    def __init__(self, path=DEFAULT_CACHE_FILE, max_entries=5000,
+                 max_bytes=50 * 1024 * 1024, max_age_seconds=30 * 24 * 3600):
+        """
+        Initialize the response cache.
+
+        Args:
+            path: SQLite database file
+            max_entries: Evict least recently used entries above this count
+            max_bytes: Evict least recently used entries above this total size
+            max_age_seconds: Entries older than this are treated as missing
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+
+    @staticmethod
+    def make_key(model, options, prompt, **extra):
+        """Hash everything that determines the generated text."""
+        material = json.dumps(
+            {'model': model, 'options': options, 'prompt': prompt, **extra},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for key, or None."""
+        now = time.time()
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at = row
+            if now - created_at > self.max_age_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+
+        self.hits += 1
+        return response
+
+    def put(self, key, response, model=None):
+        """Store a response and evict entries beyond the size/age limits."""
+        now = time.time()
+        size = len(response.encode('utf-8'))
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now)
+            )
+            self._evict(conn, now)
+
+    def stats(self):
+        """Return entry count, total size and hit/miss counters for this process."""
+        with self._connect() as conn:
+            entries, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+
+        return {
+            'entries': entries,
+            'total_bytes': total_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then least recently used ones over the limits."""
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age_seconds,))
+
+        # Keep the most recently used entries within both count and byte budgets
+        conn.execute("""
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM (
+                    SELECT key,
+                           ROW_NUMBER() OVER (ORDER BY last_access DESC) AS rank,
+                           SUM(size) OVER (ORDER BY last_access DESC) AS running_bytes
+                    FROM responses
+                )
+                WHERE rank > ? OR running_bytes > ?
+            )
+        """, (self.max_entries, self.max_bytes))
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection; commit on success and always close."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def get_response_cache(path=None):
+    """Return the shared response cache, or None when disabled.
+
+    The path defaults to the LLM_RESPONSE_CACHE environment variable or
+    llm_response_cache.db; set LLM_RESPONSE_CACHE=off to disable caching.
+    """
+    path = path or os.environ.get('LLM_RESPONSE_CACHE', DEFAULT_CACHE_FILE)
+    if path.lower() in ('off', 'none', '0', ''):
+        return None
+
+    if path not in _CACHES:
+        _CACHES[path] = LLMResponseCache(path)
+    return _CACHES[path]
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Shared Ollama health state with background probing and a circuit breaker.
+Availability checks answer from memory instead of probing /api/tags on every
+request, and after repeated failures calls are rejected immediately until a
+probe or trial request shows Ollama is back.
+"""
+
+import threading
+import time
+import requests
+
+
+CLOSED = 'closed'        # Ollama healthy, requests allowed
+OPEN = 'open'            # Ollama failing, requests rejected without a network call
+HALF_OPEN = 'half_open'  # Cool-down elapsed, one trial request allowed
+
+# Shared monitors keyed by Ollama base URL
+_MONITORS = {}
+_MONITORS_LOCK = threading.Lock()
+
+
+class OllamaHealthMonitor:
+    def __init__(self, base_url, probe_interval=15, failure_threshold=3, reset_timeout=30,
+                 probe_timeout=2):
+        """
+        Initialize the health monitor.
+
+        Args:
+            base_url: Ollama API base URL
+            probe_interval: Seconds between background /api/tags probes
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before allowing a trial request
+            probe_timeout: Timeout of a single probe in seconds
+        """
+        self.base_url = base_url
+        self.probe_interval = probe_interval
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+
+        self.state = CLOSED
+        self.available = None  # unknown until the first probe
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.last_probe = None
+        self.last_error = None
+        self.models = None  # model names from the last successful probe
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start probing in a background thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='ollama-health', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background probe thread."""
+        self._stop.set()
+
+    def is_available(self):
+        """Return the cached up/down state.
+
+        Without a running probe thread (e.g. batch runs) a stale state is
+        refreshed with a synchronous probe.
+        """
+        running = self._thread is not None and self._thread.is_alive()
+        if not running and (self.last_probe is None or time.time() - self.last_probe > self.probe_interval):
+            self.probe()
+
+        with self._lock:
+            if self.state == OPEN and not self._cooled_down():
+                return False
+            return bool(self.available)
+
+    def allow_request(self):
+        """Return True if a generate request may be sent now.
+
+        An open breaker rejects requests until reset_timeout has passed, then
+        lets a single trial request through (half-open).
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN:
+                if not self._cooled_down():
+                    return False
+                self.state = HALF_OPEN
+
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        """Record a successful call or probe and close the breaker."""
+        with self._lock:
+            self.available = True
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self.opened_at = None
+            self.last_error = None
+            self._trial_in_flight = False
+
+    def record_failure(self, error=None):
+        """Record a failed call or probe; open the breaker past the threshold."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = str(error) if error else None
+            self._trial_in_flight = False
+
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"Ollama circuit breaker opened after {self.consecutive_failures} failure(s)")
+                self.state = OPEN
+                self.opened_at = time.time()
+                self.available = False
+
+    def record_timeout(self, error=None):
+        """Record a timed-out call.
+
+        A slow generation is a latency problem rather than an outage, so a
+        timeout does not count towards the threshold; a timed-out trial
+        request does reopen the breaker, so the next trial can start.
+        """
+        with self._lock:
+            trial = self.state == HALF_OPEN
+            self._trial_in_flight = False
+        if trial:
+            self.record_failure(error)
+
+    def record_model_error(self, error=None):
+        """Record a call Ollama answered with an error (e.g. a 404 for a model that isn't pulled).
+
+        The server is reachable, so this is a failure of that model only: it
+        does not count towards the threshold and closes a half-open breaker.
+        """
+        self.record_success()
+        with self._lock:
+            self.last_error = str(error) if error else None
+
+    def probe(self):
+        """Probe /api/tags once and update the health state."""
+        try:
+            response = requests.get(f"{self.base_url}/api/tags", timeout=self.probe_timeout)
+            ok = response.status_code == 200
+            error = None if ok else f"HTTP {response.status_code}"
+            if ok:
+                self.models = {m.get('name') for m in response.json().get('models', [])}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            ok, error = False, e
+
+        self.last_probe = time.time()
+        if ok:
+            self.record_success()
+        else:
+            self.record_failure(error)
+        return ok
+
+    def has_model(self, model):
+        """Whether Ollama reported the model as installed (True while unknown)."""
+        models = self.models
+        if models is None:
+            return True
+        return model in models or f"{model}:latest" in models
+
+    def status(self):
+        """Return the current health state for diagnostics."""
+        with self._lock:
+            return {
+                'base_url': self.base_url,
+                'available': self.available,
+                'circuit': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'opened_at': self.opened_at,
+                'last_probe': self.last_probe,
+                'last_error': self.last_error,
+                'models': sorted(self.models) if self.models is not None else None
+            }
+
+    def _cooled_down(self):
+        return self.opened_at is not None and time.time() - self.opened_at >= self.reset_timeout
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self.probe_interval)
+
+
+def get_health_monitor(base_url):
+    """Return the shared health monitor for an Ollama base URL."""
+    with _MONITORS_LOCK:
+        if base_url not in _MONITORS:
+            _MONITORS[base_url] = OllamaHealthMonitor(base_url)
+        return _MONITORS[base_url]
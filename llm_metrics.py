@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency metrics for LLM generations.
+Records Ollama's response metadata (token counts, prompt-eval, generation
+and model-load durations) for every call in a JSONL sink and summarizes
+them per batch run or per server process.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+
+DEFAULT_METRICS_FILE = 'llm_metrics.jsonl'
+
+# A load_duration above this means Ollama had to (re)load the model
+COLD_LOAD_SECONDS = 1.0
+
+# Shared sinks keyed by file path
+_SINKS = {}
+
+
+class LLMMetrics:
+    def __init__(self, path=DEFAULT_METRICS_FILE, max_records=10000):
+        """
+        Initialize the metrics sink.
+
+        Args:
+            path: JSONL file every record is appended to (None keeps them in memory only)
+            max_records: Number of recent records kept in memory for summaries
+        """
+        self.path = path
+        self.records = deque(maxlen=max_records)
+        self.total_recorded = 0
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, model, wall_seconds, result=None, retries=0, cache_hit=False, error=None, **extra):
+        """Record one generation, deriving rates from Ollama's nanosecond durations."""
+        result = result or {}
+        prompt_eval_s = result.get('prompt_eval_duration', 0) / 1e9
+        eval_s = result.get('eval_duration', 0) / 1e9
+        load_s = result.get('load_duration', 0) / 1e9
+
+        entry = {
+            'timestamp': time.time(),
+            'model': model,
+            'wall_seconds': round(wall_seconds, 4),
+            'cache_hit': cache_hit,
+            'retries': retries,
+            'error': error,
+            'prompt_eval_count': result.get('prompt_eval_count', 0),
+            'eval_count': result.get('eval_count', 0),
+            'prompt_eval_seconds': round(prompt_eval_s, 4),
+            'eval_seconds': round(eval_s, 4),
+            'load_seconds': round(load_s, 4),
+            'total_seconds': round(result.get('total_duration', 0) / 1e9, 4),
+            'prompt_tokens_per_second': round(result.get('prompt_eval_count', 0) / prompt_eval_s, 1) if prompt_eval_s else None,
+            'tokens_per_second': round(result.get('eval_count', 0) / eval_s, 1) if eval_s else None,
+            'cold_load': load_s > COLD_LOAD_SECONDS,
+            **extra
+        }
+
+        with self._lock:
+            self.records.append(entry)
+            self.total_recorded += 1
+            if self.path:
+                try:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(entry) + '\n')
+                except OSError as e:
+                    print(f"Warning: could not write LLM metrics: {e}")
+
+        return entry
+
+    def recent(self, model=None, since=None):
+        """Return a copy of the in-memory records, optionally for one model and after a timestamp."""
+        with self._lock:
+            records = list(self.records)
+        return [
+            r for r in records
+            if (model is None or r['model'] == model) and (since is None or r['timestamp'] >= since)
+        ]
+
+    def mark(self):
+        """Return a position to pass to summary() to cover only later records."""
+        with self._lock:
+            return self.total_recorded
+
+    def summary(self, since=0):
+        """Summarize records made after the given mark()."""
+        with self._lock:
+            skip = max(0, len(self.records) - (self.total_recorded - since))
+            records = list(self.records)[skip:]
+
+        generated = [r for r in records if not r['cache_hit'] and not r['error']]
+        wall = np.array([r['wall_seconds'] for r in generated]) if generated else np.array([])
+        eval_tokens = sum(r['eval_count'] for r in generated)
+        eval_seconds = sum(r['eval_seconds'] for r in generated)
+        prompt_tokens = sum(r['prompt_eval_count'] for r in generated)
+        prompt_seconds = sum(r['prompt_eval_seconds'] for r in generated)
+
+        models = {}
+        for r in generated:
+            m = models.setdefault(r['model'], {'generations': 0, 'eval_tokens': 0, 'eval_seconds': 0.0})
+            m['generations'] += 1
+            m['eval_tokens'] += r['eval_count']
+            m['eval_seconds'] += r['eval_seconds']
+        for m in models.values():
+            m['tokens_per_second'] = round(m['eval_tokens'] / m['eval_seconds'], 1) if m['eval_seconds'] else None
+            m['eval_seconds'] = round(m['eval_seconds'], 2)
+
+        return {
+            'calls': len(records),
+            'generations': len(generated),
+            'cache_hits': sum(1 for r in records if r['cache_hit']),
+            'errors': sum(1 for r in records if r['error']),
+            'retries': sum(r['retries'] for r in records),
+            'cold_loads': sum(1 for r in generated if r['cold_load']),
+            'load_seconds': round(sum(r['load_seconds'] for r in generated), 2),
+            'prompt_tokens': prompt_tokens,
+            'prompt_eval_seconds': round(prompt_seconds, 2),
+            'prompt_tokens_per_second': round(prompt_tokens / prompt_seconds, 1) if prompt_seconds else None,
+            'eval_tokens': eval_tokens,
+            'eval_seconds': round(eval_seconds, 2),
+            'tokens_per_second': round(eval_tokens / eval_seconds, 1) if eval_seconds else None,
+            'latency_seconds': {
+                'mean': round(float(wall.mean()), 2) if len(wall) else None,
+                'p50': round(float(np.percentile(wall, 50)), 2) if len(wall) else None,
+                'p95': round(float(np.percentile(wall, 95)), 2) if len(wall) else None,
+                'max': round(float(wall.max()), 2) if len(wall) else None
+            },
+            'models': models
+        }
+
+
+def format_summary(summary, title='LLM METRICS'):
+    """Render a summary() dict as a printable report."""
+    latency = summary['latency_seconds']
+    lines = [
+        title,
+        "-" * 70,
+        f"Calls: {summary['calls']} ({summary['generations']} generated, "
+        f"{summary['cache_hits']} cache hits, {summary['errors']} errors, {summary['retries']} retries)",
+        f"Generation: {summary['eval_tokens']:,} tokens in {summary['eval_seconds']}s "
+        f"({summary['tokens_per_second'] or 'n/a'} tok/s)",
+        f"Prompt eval: {summary['prompt_tokens']:,} tokens in {summary['prompt_eval_seconds']}s "
+        f"({summary['prompt_tokens_per_second'] or 'n/a'} tok/s)",
+        f"Model loads: {summary['cold_loads']} cold load(s), {summary['load_seconds']}s loading",
+        f"Latency: mean {latency['mean']}s, p50 {latency['p50']}s, p95 {latency['p95']}s, max {latency['max']}s",
+    ]
+    for model, m in summary['models'].items():
+        lines.append(f"  {model}: {m['generations']} generations, {m['tokens_per_second'] or 'n/a'} tok/s")
+    return "\n".join(lines)
+
+
+def get_metrics(path=None):
+    """Return the shared metrics sink.
+
+    The path defaults to the LLM_METRICS_FILE environment variable or
+    llm_metrics.jsonl; set LLM_METRICS_FILE=off to keep metrics in memory only.
+    """
+    path = path or os.environ.get('LLM_METRICS_FILE', DEFAULT_METRICS_FILE)
+    if path.lower() in ('off', 'none', '0', ''):
+        path = None
+
+    if path not in _SINKS:
+        _SINKS[path] = LLMMetrics(path)
+    return _SINKS[path]
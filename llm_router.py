@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Latency-aware model routing for district insights.
+Interactive requests go to small, fast models under a tight latency budget;
+batch jobs go to a larger model. Models whose recent latency breaches the
+route's budget are skipped in favour of the next (smaller) model, and the
+rule-based analysis is the last resort.
+"""
+
+import os
+import time
+import numpy as np
+from llm_analyzer import LLMAnalyzer, DEFAULT_BASE_URL
+from llm_health import get_health_monitor
+from llm_metrics import get_metrics
+
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+
+def _env_models(name, default):
+    value = os.environ.get(name)
+    return [m.strip() for m in value.split(',') if m.strip()] if value else default
+
+
+def default_routes():
+    """Routes per mode: candidate models in preference order and their budgets.
+
+    Model lists can be overridden with LLM_INTERACTIVE_MODELS / LLM_BATCH_MODELS
+    (comma-separated).
+    """
+    return {
+        INTERACTIVE: {
+            'models': _env_models('LLM_INTERACTIVE_MODELS', ['llama3.2:3b', 'llama3.2:1b']),
+            'latency_budget': 10.0,
+            'num_predict': 350,
+            'max_retries': 1
+        },
+        BATCH: {
+            'models': _env_models('LLM_BATCH_MODELS', ['llama3', 'llama3.2:3b']),
+            'latency_budget': 120.0,
+            'num_predict': 500,
+            'max_retries': 2
+        }
+    }
+
+
+class ModelRouter:
+    def __init__(self, routes=None, base_url=DEFAULT_BASE_URL, stats_window_seconds=300,
+                 min_samples=3, latency_percentile=90):
+        """
+        Initialize the router.
+
+        Args:
+            routes: Route config per mode (defaults to default_routes())
+            base_url: Ollama API base URL
+            stats_window_seconds: Only calls this recent count towards a model's latency
+            min_samples: Calls needed before a model can be ruled out on latency
+            latency_percentile: Percentile of recent latency compared against the budget
+        """
+        self.routes = routes or default_routes()
+        self.base_url = base_url
+        self.stats_window_seconds = stats_window_seconds
+        self.min_samples = min_samples
+        self.latency_percentile = latency_percentile
+        self.health = get_health_monitor(base_url)
+        self.metrics = get_metrics()
+        self._analyzers = {}
+
+    def route_district_analysis(self, pc4, analytics_data, mode=INTERACTIVE, use_cache=True):
+        """Generate a district analysis on the best model for mode.
+
+        Returns (insights, model); model is None when the rule-based fallback
+        was used.
+        """
+        insights, model = self._route(mode, pc4, lambda analyzer, deadline: analyzer.generate_district_analysis(
+            pc4, analytics_data, use_cache=use_cache, fallback=False, deadline=deadline
+        ))
+        if model is None:
+            route = self.routes[mode]
+            fallback = self._analyzer(route['models'][0], route)
+            filtered = fallback._filter_sensitive_categories(analytics_data)
+            return fallback._generate_fallback_analysis(pc4, filtered), None
+        return insights, model
+
+    def route_section_analysis(self, pc4, analytics_data, previous_sections=None, mode=BATCH, use_cache=True):
+        """Generate structured insight sections on the best model for mode.
+
+        Returns (sections, regenerated, model), or (None, [], None) when no
+        model succeeded.
+        """
+        result, model = self._route(mode, pc4, lambda analyzer, deadline: analyzer.generate_section_analysis(
+            pc4, analytics_data, previous_sections, use_cache=use_cache, deadline=deadline
+        ))
+        if model is None:
+            return None, [], None
+        sections, regenerated = result
+        return sections, regenerated, model
+
+    def candidates(self, mode):
+        """Installed models of a route whose recent latency is within its budget.
+
+        When none of the route's models is installed, any installed model is
+        used instead (the other routes' models first), so e.g. a deployment
+        with only llama3 still gets LLM insights on interactive requests.
+        """
+        route = self.routes[mode]
+        models = [model for model in route['models'] if self.health.has_model(model)]
+        if not models:
+            models = self._installed_fallbacks()
+        return [model for model in models if not self._breaches_budget(model, route['latency_budget'])]
+
+    def observed_latency(self, model):
+        """Recent latency percentile of a model in seconds, or None without enough calls."""
+        since = time.time() - self.stats_window_seconds
+        samples = [
+            r['wall_seconds'] for r in self.metrics.recent(model=model, since=since)
+            if not r['cache_hit'] and r['error'] != 'circuit_open'
+        ]
+        if len(samples) < self.min_samples:
+            return None
+        return float(np.percentile(samples, self.latency_percentile))
+
+    def status(self):
+        """Return routes with each model's observed latency and eligibility."""
+        report = {}
+        for mode, route in self.routes.items():
+            eligible = set(self.candidates(mode))
+            report[mode] = {
+                'latency_budget': route['latency_budget'],
+                'candidates': self.candidates(mode),
+                'models': [
+                    {
+                        'model': model,
+                        'installed': self.health.has_model(model),
+                        'observed_latency': self.observed_latency(model),
+                        'eligible': model in eligible
+                    }
+                    for model in route['models']
+                ]
+            }
+        return report
+
+    def _route(self, mode, pc4, generate):
+        """Call generate(analyzer, deadline) on each candidate model until one succeeds.
+
+        The route's latency budget covers the whole request: falling back to
+        the next model only gets the time the previous ones left.
+
+        Returns (result, model), or (None, None) when Ollama is down, every
+        candidate failed or the budget ran out.
+        """
+        route = self.routes[mode]
+        deadline = time.monotonic() + route['latency_budget']
+
+        if self.health.is_available():
+            for model in self.candidates(mode):
+                if time.monotonic() >= deadline:
+                    print(f"Latency budget of {route['latency_budget']}s exhausted for {pc4} ({mode})")
+                    break
+                try:
+                    result = generate(self._analyzer(model, route), deadline)
+                    if result:
+                        return result, model
+                except Exception as e:
+                    print(f"Model {model} failed for {pc4} ({mode}): {e}")
+
+        return None, None
+
+    def _installed_fallbacks(self):
+        """Installed models in fallback order: routed models first, then the rest by name."""
+        routed = []
+        for route in self.routes.values():
+            routed += [model for model in route['models'] if model not in routed and self.health.has_model(model)]
+
+        claimed = set(routed) | {f"{model}:latest" for model in routed}
+        return routed + sorted(set(self.health.models or ()) - claimed)
+
+    def _breaches_budget(self, model, budget):
+        # Stats age out of the window, so a skipped model is retried later
+        latency = self.observed_latency(model)
+        return latency is not None and latency > budget
+
+    def _analyzer(self, model, route):
+        key = (model, route['num_predict'], route['latency_budget'], route['max_retries'])
+        if key not in self._analyzers:
+            self._analyzers[key] = LLMAnalyzer(
+                model=model,
+                base_url=self.base_url,
+                num_predict=route['num_predict'],
+                timeout=route['latency_budget'],
+                max_retries=route['max_retries']
+            )
+        return self._analyzers[key]
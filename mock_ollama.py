@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Ollama API, for benchmarking the LLM path offline.
+Serves /api/tags and /api/generate (streaming and non-streaming) with
+configurable latency, generation speed, model load stalls and failures.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+FILLER_WORDS = (
+    "the district shows strong demand for casual dining with steady review growth "
+    "while competition among italian and asian restaurants remains intense and new "
+    "entrants should focus on quality service and differentiated concepts"
+).split()
+
+
+class MockOllamaConfig:
+    def __init__(self, models=('llama3',), latency=0.05, tokens_per_second=40.0,
+                 prompt_tokens_per_second=800.0, load_seconds=2.0, keep_alive=300,
+                 failure_rate=0.0, error_status=500, parallel=1, seed=None):
+        """
+        Behaviour of the mock server.
+
+        Args:
+            models: Model names reported by /api/tags
+            latency: Fixed network/queueing latency per request in seconds
+            tokens_per_second: Generation speed
+            prompt_tokens_per_second: Prompt evaluation speed
+            load_seconds: Model load time on the first request or after keep_alive idle
+            keep_alive: Seconds a model stays loaded when idle
+            failure_rate: Share of generate requests answered with error_status
+            error_status: HTTP status used for injected failures
+            parallel: Generations processed at once (Ollama's OLLAMA_NUM_PARALLEL)
+            seed: Random seed for reproducible failure injection
+        """
+        self.models = list(models)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.load_seconds = load_seconds
+        self.keep_alive = keep_alive
+        self.failure_rate = failure_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.slots = threading.Semaphore(max(1, parallel))
+        self.loaded_until = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    config = None  # MockOllamaConfig, set by make_server()
+
+    def do_GET(self):
+        if self.path != '/api/tags':
+            return self._send_json({'error': 'not found'}, status=404)
+        self._send_json({'models': [{'name': m, 'model': m} for m in self.config.models]})
+
+    def do_POST(self):
+        if self.path != '/api/generate':
+            return self._send_json({'error': 'not found'}, status=404)
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            return self._send_json({'error': 'invalid JSON'}, status=400)
+
+        config = self.config
+        with config.lock:
+            config.requests += 1
+            fail = config.random.random() < config.failure_rate
+            if fail:
+                config.failures += 1
+
+        time.sleep(config.latency)
+        if fail:
+            return self._send_json({'error': 'injected failure'}, status=config.error_status)
+
+        model = payload.get('model', config.models[0])
+        if model not in config.models:
+            return self._send_json({'error': f"model '{model}' not found"}, status=404)
+
+        # Generations queue for a slot like requests beyond OLLAMA_NUM_PARALLEL
+        with config.slots:
+            try:
+                self._generate(payload, model)
+            except (BrokenPipeError, ConnectionResetError):
+                # Client gave up (e.g. its timeout expired)
+                pass
+
+    def _generate(self, payload, model):
+        config = self.config
+        started = time.perf_counter()
+
+        now = time.time()
+        with config.lock:
+            cold = config.loaded_until.get(model, 0) < now
+            config.loaded_until[model] = now + config.keep_alive
+        load_s = config.load_seconds if cold else 0.0
+        time.sleep(load_s)
+
+        prompt_text = f"{payload.get('system', '')} {payload.get('prompt', '')}"
+        prompt_tokens = len(prompt_text.split())
+        prompt_s = prompt_tokens / config.prompt_tokens_per_second
+        time.sleep(prompt_s)
+
+        num_predict = payload.get('options', {}).get('num_predict', 128)
+        tokens = _response_tokens(payload, num_predict)
+        token_s = 1.0 / config.tokens_per_second
+
+        stream = payload.get('stream', True)
+        if stream:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.end_headers()
+            for token in tokens:
+                time.sleep(token_s)
+                self._write_line({'model': model, 'created_at': _timestamp(), 'response': token, 'done': False})
+        else:
+            time.sleep(token_s * len(tokens))
+
+        eval_s = token_s * len(tokens)
+        final = {
+            'model': model,
+            'created_at': _timestamp(),
+            'response': '' if stream else ''.join(tokens),
+            'done': True,
+            'done_reason': 'stop',
+            'total_duration': int((time.perf_counter() - started) * 1e9),
+            'load_duration': int(load_s * 1e9),
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': int(prompt_s * 1e9),
+            'eval_count': len(tokens),
+            'eval_duration': int(eval_s * 1e9)
+        }
+
+        if stream:
+            self._write_line(final)
+        else:
+            self._send_json(final)
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_line(self, body):
+        self.wfile.write(json.dumps(body).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _response_tokens(payload, num_predict):
+    """Build the response as a list of tokens, honouring format='json'."""
+    words = [FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(max(1, num_predict))]
+
+    if payload.get('format') == 'json':
+        # Answer section prompts with {section: text}, batched district prompts with {pc4: text}
+        prompt = payload.get('prompt', '')
+        if 'SECTIONS TO WRITE:' in prompt:
+            keys = re.findall(r'^- (\w+):', prompt.split('SECTIONS TO WRITE:')[1], re.MULTILINE)
+        else:
+            keys = re.findall(r'DISTRICT (\d{4})', prompt)
+        keys = keys or ['result']
+        per_key = max(1, len(words) // len(keys) - 4)
+        text = json.dumps({key: ' '.join(words[:per_key]) for key in keys})
+        # Roughly one token per 4 characters
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    return [w + ' ' for w in words]
+
+
+def _timestamp():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def make_server(host='127.0.0.1', port=11434, config=None):
+    """Create a mock Ollama HTTP server (call serve_forever() or use start_mock_server)."""
+    handler = type('ConfiguredMockOllamaHandler', (MockOllamaHandler,), {'config': config or MockOllamaConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_mock_server(host='127.0.0.1', port=0, config=None):
+    """Start a mock server in a background thread; returns (server, base_url)."""
+    server = make_server(host, port, config)
+    thread = threading.Thread(target=server.serve_forever, name='mock-ollama', daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mock Ollama server for offline benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--models', nargs='+', default=['llama3'], help='Model names to serve')
+    parser.add_argument('--latency', type=float, default=0.05, help='Fixed latency per request (s)')
+    parser.add_argument('--tokens-per-second', type=float, default=40.0, help='Generation speed')
+    parser.add_argument('--load-seconds', type=float, default=2.0, help='Cold model load time (s)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of requests that fail')
+    parser.add_argument('--error-status', type=int, default=500, help='HTTP status of injected failures')
+    parser.add_argument('--parallel', type=int, default=1, help='Concurrent generations')
+    parser.add_argument('--seed', type=int, help='Random seed for failure injection')
+    args = parser.parse_args()
+
+    config = MockOllamaConfig(
+        models=args.models,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        load_seconds=args.load_seconds,
+        failure_rate=args.failure_rate,
+        error_status=args.error_status,
+        parallel=args.parallel,
+        seed=args.seed
+    )
+    server = make_server(args.host, args.port, config)
+    print(f"Mock Ollama listening on http://{args.host}:{args.port} (models: {', '.join(args.models)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nServed {config.requests} generate requests ({config.failures} injected failures)")
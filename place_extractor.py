@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Field extraction for Google Maps place pages.
+PLACE_FIELDS_SCRIPT collects the raw text and attributes of every field
+(with its fallback selectors) in one page.evaluate call; parse_place_fields
+turns them into the record stored in restaurants_data.json / farms_data.json.
+"""
+
+import re
+
+
+PLACE_FIELDS_SCRIPT = """
+() => {
+    const first = selector => document.querySelector(selector);
+    const text = el => el ? el.textContent : null;
+    const attr = (el, name) => el ? el.getAttribute(name) : null;
+    const spans = selector => Array.from(document.querySelectorAll(selector));
+
+    return {
+        name: text(first('h1.DUwDvf') || first('h1')),
+        rating: text(first('div.F7nice span[aria-hidden="true"]')),
+        reviews_label: attr(first('div.F7nice span[aria-label*="review"]'), 'aria-label'),
+        price_label: attr(first('span[aria-label*="Price"]'), 'aria-label'),
+        // A span consisting of dollar signs only, anywhere on the page
+        price_symbols: spans('span').map(el => el.textContent)
+            .find(t => t && t.includes('$') && /^\\$+$/.test(t.trim())) || null,
+        price_in_rating: spans('div.F7nice span').map(el => el.textContent)
+            .find(t => t && t.includes('$')) || null,
+        address_label: attr(first('button[data-item-id="address"]'), 'aria-label'),
+        phone_label: attr(first('button[data-item-id*="phone"]'), 'aria-label'),
+        website: attr(first('a[data-item-id="authority"]'), 'href'),
+        category: text(first('button[jsaction*="category"]'))
+    };
+}
+"""
+
+
+def parse_place_fields(raw, url, include_price=True):
+    """Build a place record from the raw fields, or None when the name is missing.
+
+    Args:
+        raw: Dict returned by PLACE_FIELDS_SCRIPT
+        url: Current page URL (coordinates are read from it)
+        include_price: Whether to add price_level (restaurants only)
+    """
+    name = (raw.get('name') or '').strip()
+    if not name:
+        return None
+
+    place = {'name': name}
+
+    try:
+        place['rating'] = float(raw['rating'].replace(',', '.'))
+    except (AttributeError, KeyError, ValueError):
+        place['rating'] = None
+
+    reviews_match = re.search(r'([\d,.]+)\s*review', raw.get('reviews_label') or '')
+    place['reviews'] = int(reviews_match.group(1).replace(',', '').replace('.', '')) if reviews_match else None
+
+    if include_price:
+        price_level = None
+        if raw.get('price_label'):
+            price_level = raw['price_label'].replace('Price: ', '')
+        if not price_level and raw.get('price_symbols'):
+            price_level = raw['price_symbols'].strip()
+        if not price_level and raw.get('price_in_rating'):
+            # Just the dollar signs
+            price_level = ''.join(c for c in raw['price_in_rating'] if c == '$')
+        place['price_level'] = price_level
+
+    place['address'] = raw['address_label'].replace('Address: ', '') if raw.get('address_label') else None
+    place['phone'] = raw['phone_label'].replace('Phone: ', '') if raw.get('phone_label') else None
+    place['website'] = raw.get('website')
+    place['cuisine'] = raw.get('category')
+
+    coords_match = re.search(r'@(-?\d+\.\d+),(-?\d+\.\d+)', url or '')
+    place['latitude'] = float(coords_match.group(1)) if coords_match else None
+    place['longitude'] = float(coords_match.group(2)) if coords_match else None
+
+    return place
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Async rate limiting shared by the worker pools (LLM batch generation and
+concurrent scraping).
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter shared by the workers of a pool."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
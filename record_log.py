@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Append-only output for the scrapers.
+Scraped records are appended to a JSONL log next to the output file as they
+arrive and fsynced in batches; compaction folds the log into the
+deduplicated JSON file (restaurants_data.json / farms_data.json) with an
+atomic temp file + rename, so the full list is written once per run instead
+of on every periodic save.
+"""
+
+import json
+import os
+
+
+class RecordLog:
+    def __init__(self, output_file):
+        """
+        Args:
+            output_file: Compacted JSON file; the log is output_file + '.log'
+        """
+        self.output_file = output_file
+        self.log_file = f"{output_file}.log"
+        self.recovered = 0
+        self._log = None
+
+    def load(self, include_output=True):
+        """Records of the output file followed by those still in the log, deduplicated by URL.
+
+        Args:
+            include_output: Whether to start from the compacted output file;
+                records left in the log by an interrupted run are always included
+        """
+        records = []
+        if include_output and os.path.exists(self.output_file):
+            with open(self.output_file, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+
+        logged = []
+        if os.path.exists(self.log_file):
+            with open(self.log_file, 'rb') as f:
+                data = f.read()
+            complete = data[:data.rfind(b'\n') + 1]
+            if len(complete) < len(data):
+                # Cut a torn final line from a crash mid-write; appending after it
+                # would glue the next record onto the fragment and lose both
+                with open(self.log_file, 'r+b') as f:
+                    f.truncate(len(complete))
+                    f.flush()
+                    os.fsync(f.fileno())
+            for line in complete.decode('utf-8').splitlines():
+                try:
+                    logged.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        self.recovered = len(logged)
+        return dedupe_records(records + logged)
+
+    def append(self, record):
+        """Append one record; it is durable after the next sync()."""
+        if self._log is None:
+            self._log = open(self.log_file, 'a', encoding='utf-8')
+        self._log.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def sync(self):
+        """Flush appended records to disk."""
+        if self._log is not None:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+    def compact(self, records):
+        """Write the deduplicated records to the output file atomically and empty the log.
+
+        records must contain everything in the log (as returned by load() plus
+        the records appended since). Returns the number of records written.
+        """
+        records = dedupe_records(records)
+        tmp_path = f"{self.output_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.output_file)
+
+        # Only dropped once its records are safely in the output file
+        self.close()
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+        self.recovered = 0
+        return len(records)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def dedupe_records(records):
+    """Keep one record per URL (the latest, at the position of the first); records without a URL are kept."""
+    result = []
+    positions = {}
+    for record in records:
+        url = record.get('url')
+        if url in positions:
+            result[positions[url]] = record
+            continue
+        if url:
+            positions[url] = len(result)
+        result.append(record)
+    return result
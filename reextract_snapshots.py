@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Offline re-extraction of place records from a snapshot archive.
+Parses every archived place page with lxml on all cores and rebuilds
+restaurants_data.json (or farms_data.json) without touching the network,
+e.g. after fixing a selector for changed Google Maps markup.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from lxml import html as lxml_html
+from place_extractor import parse_place_fields
+from snapshot_archive import SnapshotArchive
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# XPath equivalents of the selectors in PLACE_FIELDS_SCRIPT
+NAME_XPATHS = (f"//h1[{_has_class('DUwDvf')}]", "//h1")
+RATING_XPATH = f"//div[{_has_class('F7nice')}]//span[@aria-hidden='true']"
+REVIEWS_XPATH = f"//div[{_has_class('F7nice')}]//span[contains(@aria-label, 'review')]/@aria-label"
+PRICE_LABEL_XPATH = "//span[contains(@aria-label, 'Price')]/@aria-label"
+RATING_AREA_SPANS_XPATH = f"//div[{_has_class('F7nice')}]//span"
+ADDRESS_XPATH = "//button[@data-item-id='address']/@aria-label"
+PHONE_XPATH = "//button[contains(@data-item-id, 'phone')]/@aria-label"
+WEBSITE_XPATH = "//a[@data-item-id='authority']/@href"
+CATEGORY_XPATH = "//button[contains(@jsaction, 'category')]"
+
+
+def extract_fields(page_html):
+    """Raw fields of a place page, in the shape returned by PLACE_FIELDS_SCRIPT."""
+    tree = lxml_html.fromstring(page_html)
+
+    def first_text(xpath):
+        elements = tree.xpath(xpath)
+        return elements[0].text_content() if elements else None
+
+    def first_value(xpath):
+        values = tree.xpath(xpath)
+        return str(values[0]) if values else None
+
+    name = None
+    for xpath in NAME_XPATHS:
+        name = first_text(xpath)
+        if name is not None:
+            break
+
+    span_texts = [span.text_content() for span in tree.iter('span')]
+    rating_area_texts = [span.text_content() for span in tree.xpath(RATING_AREA_SPANS_XPATH)]
+
+    return {
+        'name': name,
+        'rating': first_text(RATING_XPATH),
+        'reviews_label': first_value(REVIEWS_XPATH),
+        'price_label': first_value(PRICE_LABEL_XPATH),
+        'price_symbols': next(
+            (t for t in span_texts if '$' in t and t.strip() and set(t.strip()) == {'$'}), None
+        ),
+        'price_in_rating': next((t for t in rating_area_texts if '$' in t), None),
+        'address_label': first_value(ADDRESS_XPATH),
+        'phone_label': first_value(PHONE_XPATH),
+        'website': first_value(WEBSITE_XPATH),
+        'category': first_text(CATEGORY_XPATH)
+    }
+
+
+def reextract_entry(root, entry):
+    """Re-extract one archived page; returns the record or None (runs in a worker process)."""
+    page_html = SnapshotArchive(root).load(entry['sha256'])
+    record = parse_place_fields(
+        extract_fields(page_html), entry.get('page_url') or entry['url'],
+        include_price=entry.get('kind') != 'farm'
+    )
+    if record is not None:
+        record['url'] = entry['url']
+    return record
+
+
+def reextract_archive(root, kind, workers=None):
+    """Re-extract the latest snapshot of every URL of kind, in parallel.
+
+    Returns (records, skipped) with records in order of first capture.
+    """
+    entries = SnapshotArchive(root).entries(kind)
+    if not entries:
+        return [], 0
+
+    workers = workers or os.cpu_count() or 1
+    # Large chunks keep inter-process overhead small next to the parsing work
+    chunksize = max(1, len(entries) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(reextract_entry, [root] * len(entries), entries, chunksize=chunksize))
+
+    records = [r for r in results if r is not None]
+    return records, len(results) - len(records)
+
+
+def merge_records(existing, records):
+    """Replace existing records by URL, keeping those without a snapshot."""
+    by_url = {r['url']: r for r in records}
+    merged = [by_url.pop(r['url'], r) if r.get('url') else r for r in existing]
+    return merged + list(by_url.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Re-extract place records from archived snapshots')
+    parser.add_argument('--archive', required=True, help='Snapshot archive directory (snapshot_dir in the config)')
+    parser.add_argument('--kind', choices=['restaurant', 'farm'], default='restaurant')
+    parser.add_argument('--output', help='Output file (default: restaurants_data.json / farms_data.json)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: all cores)')
+    parser.add_argument('--archive-only', action='store_true',
+                        help='Drop existing records that have no snapshot instead of keeping them')
+    args = parser.parse_args()
+
+    output_file = args.output or ('farms_data.json' if args.kind == 'farm' else 'restaurants_data.json')
+
+    start = time.time()
+    records, skipped = reextract_archive(args.archive, args.kind, args.workers)
+    elapsed = time.time() - start
+    print(f"Re-extracted {len(records)} {args.kind} pages in {elapsed:.1f}s ({skipped} without a name)")
+
+    if not args.archive_only and os.path.exists(output_file):
+        with open(output_file, 'r', encoding='utf-8') as f:
+            records = merge_records(json.load(f), records)
+
+    tmp_path = f"{output_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, output_file)
+    print(f"✓ Saved {len(records)} records to {output_file}")
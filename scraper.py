@@ -11,6 +11,7 @@ from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from bs4 import BeautifulSoup
+from record_log import RecordLog
 
 
 class GoogleMapsRestaurantScraper:
@@ -19,7 +20,12 @@ class GoogleMapsRestaurantScraper:
         with open(config_path, 'r') as f:
             self.config = json.load(f)
         
-        self.restaurants = []
+        # Records are appended to a log as they are scraped and compacted into
+        # the output file by save_data; a log left by an interrupted run is picked up
+        self.record_log = RecordLog(self.config.get('output_file', 'restaurants_data.json'))
+        self.restaurants = self.record_log.load(include_output=False)
+        if self.restaurants:
+            print(f"Recovered {len(self.restaurants)} restaurants from an interrupted run.")
         self.driver = None
         
     def setup_driver(self):
@@ -233,7 +239,12 @@ class GoogleMapsRestaurantScraper:
                 
                 if data and data.get('name') != 'Unknown':
                     self.restaurants.append(data)
+                    self.record_log.append(data)
                     print(f"  ✓ {data['name']} - Rating: {data.get('rating', 'N/A')}")
+                    
+                    # fsync in batches rather than per record
+                    if len(self.restaurants) % 10 == 0:
+                        self.record_log.sync()
                 
                 # Go back to results list
                 try:
@@ -256,14 +267,11 @@ class GoogleMapsRestaurantScraper:
                 self.driver.quit()
     
     def save_data(self):
-        """Save scraped data to JSON file."""
-        output_file = self.config.get('output_file', 'restaurants_data.json')
+        """Compact the scraped data into the JSON output file."""
+        count = self.record_log.compact(self.restaurants)
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.restaurants, f, indent=2, ensure_ascii=False)
-        
-        print(f"\n✓ Data saved to {output_file}")
-        print(f"Total restaurants: {len(self.restaurants)}")
+        print(f"\n✓ Data saved to {self.record_log.output_file}")
+        print(f"Total restaurants: {count}")
 
 
 if __name__ == "__main__":
@@ -1,9 +1,14 @@
 import json
 import os
 import time
-import re
 import asyncio
 from playwright.async_api import async_playwright
+from scraper_pool import extract_pages, DEFAULT_CONCURRENCY
+from scraper_network import ResourceBlocker, TrafficMeter, format_traffic
+from place_extractor import PLACE_FIELDS_SCRIPT, parse_place_fields
+from snapshot_archive import SnapshotArchive
+from record_log import RecordLog
+from crawl_frontier import CrawlFrontier, DONE, FAILED
 
 
 class GoogleMapsFarmScraper:
@@ -16,21 +21,31 @@ class GoogleMapsFarmScraper:
         self.seen_urls = set()
         self.farm_urls = []
         
-        # Load existing data if available
+        # Load existing data if available; records are appended to a log next to
+        # the output file and compacted into it at the end of a run
+        self.record_log = RecordLog(self.config.get('output_file', 'farms_data.json'))
         try:
-            output_file = self.config.get('output_file', 'farms_data.json')
-            with open(output_file, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-                self.farms = existing_data
-                # Mark existing URLs as seen
-                for farm in existing_data:
-                    if farm.get('url'):
-                        self.seen_urls.add(farm['url'])
-                print(f"Loaded {len(self.farms)} existing farms. Skipping {len(self.seen_urls)} known URLs.")
-        except FileNotFoundError:
-            print("No existing data found. Starting fresh.")
+            self.farms = self.record_log.load()
+            # Mark existing URLs as seen
+            for farm in self.farms:
+                if farm.get('url'):
+                    self.seen_urls.add(farm['url'])
+            if self.farms:
+                print(f"Loaded {len(self.farms)} existing farms ({self.record_log.recovered} from the log). Skipping {len(self.seen_urls)} known URLs.")
+            else:
+                print("No existing data found. Starting fresh.")
         except Exception as e:
             print(f"Error loading existing data: {e}")
+        
+        # Optional archive of raw place pages for offline re-extraction
+        snapshot_dir = self.config.get('snapshot_dir')
+        self.archive = SnapshotArchive(snapshot_dir) if snapshot_dir else None
+        
+        # Per-URL crawl state; farms already in the data file count as done
+        self.frontier = CrawlFrontier(self.config.get('frontier_file', 'crawl_frontier_farms.db'))
+        self.frontier.complete(self.seen_urls)
+        # Extracted but not yet saved; only completed in the frontier once saved
+        self.unsaved_urls = []
 
     async def scrape(self):
         """Main scraping method using Collect-Then-Visit strategy."""
@@ -40,10 +55,12 @@ class GoogleMapsFarmScraper:
                 headless=self.config.get('headless', False)
             )
             
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
+            context = await self.new_context(browser)
+            
+            # Only DOM text is read: skip images, fonts, map tiles and telemetry
+            blocker = ResourceBlocker.from_config(self.config)
+            if blocker:
+                await blocker.attach(context)
             
             page = await context.new_page()
             
@@ -69,28 +86,28 @@ class GoogleMapsFarmScraper:
                 print("\nPHASE 2: Extracting Data from URLs")
                 print("=" * 60)
                 
-                for idx, url in enumerate(self.farm_urls, 1):
-                    print(f"[{idx}/{len(self.farm_urls)}] Processing: {url.split('?')[0][:80]}...")
-                    
-                    try:
-                        await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-                        await asyncio.sleep(1.5)  # Let dynamic content settle
-                        
-                        data = await self.extract_farm_data(page)
-                        
-                        if data:
-                            data['url'] = url
-                            self.farms.append(data)
-                            print(f"  ✓ {data.get('name', 'Unknown')} ({data.get('rating', 'N/A')}★)")
-                            
-                            # Save periodically
-                            if idx % 5 == 0:
-                                self.save_data()
-                        else:
-                            print("  ⚠ Failed to extract data")
-                            
-                    except Exception as e:
-                        print(f"  ⚠ Error visiting URL: {e}")
+                # Pool of pages claiming URLs from the frontier; results arrive in claim order
+                # (URLs pending from an interrupted run are visited too)
+                self.farm_urls = self.frontier.pending_urls()
+                meter = TrafficMeter()
+                await extract_pages(
+                    context,
+                    self.farm_urls,
+                    self.extract_farm_data,
+                    self.handle_result,
+                    concurrency=self.config.get('concurrency', DEFAULT_CONCURRENCY),
+                    request_delay=self.config.get('request_delay'),
+                    settle_seconds=1.5,  # Let dynamic content settle
+                    meter=meter,
+                    snapshot=self.snapshot if self.archive else None,
+                    ready_selector='h1',  # The extractor's wait target
+                    frontier=self.frontier
+                )
+                
+                print(f"\nFrontier: {self.frontier.counts()}")
+                print(format_traffic(meter.summary()))
+                if blocker:
+                    print(f"Blocked {blocker.blocked} of {blocker.blocked + blocker.allowed} requests")
                 
             except Exception as e:
                 print(f"Error during scraping: {e}")
@@ -99,7 +116,40 @@ class GoogleMapsFarmScraper:
             
             finally:
                 await browser.close()
+                self.compact_data()
+    
+    async def new_context(self, browser):
+        """Browser context with the scraper's viewport and user agent."""
+        return await browser.new_context(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        )
+    
+    async def snapshot(self, page, url):
+        """Archive the visited page's place panel."""
+        await self.archive.capture(page, url, 'farm')
+    
+    def handle_result(self, idx, url, data, error):
+        """Record one visited URL (called in URL order by the page pool)."""
+        counts = self.frontier.counts()
+        # Extracted URLs are only completed in the frontier once saved; +1 for this one
+        visited = counts[DONE] + counts[FAILED] + len(self.unsaved_urls) + 1
+        print(f"[{visited}/{sum(counts.values())}] Processing: {url.split('?')[0][:80]}...")
+        
+        if error is not None:
+            print(f"  ⚠ Error visiting URL: {error} ({self.frontier.fail(url, error)})")
+        elif data:
+            data['url'] = url
+            self.farms.append(data)
+            self.record_log.append(data)
+            self.unsaved_urls.append(url)
+            print(f"  ✓ {data.get('name', 'Unknown')} ({data.get('rating', 'N/A')}★)")
+            
+            # Save periodically
+            if len(self.unsaved_urls) >= 5:
                 self.save_data()
+        else:
+            print(f"  ⚠ Failed to extract data ({self.frontier.fail(url, 'no data extracted')})")
     
     async def collect_urls(self, page, search_query):
         """Collect farm URLs for the search query."""
@@ -157,14 +207,17 @@ class GoogleMapsFarmScraper:
             # Extract URLs
             links = await page.locator('div[role="feed"] > div > div > a').all()
             new_urls = 0
+            frontier_urls = []
             
             for link in links:
                 href = await link.get_attribute('href')
                 if href and href not in self.seen_urls:
                     self.seen_urls.add(href)
                     self.farm_urls.append(href)
+                    frontier_urls.append(href)
                     new_urls += 1
             
+            self.frontier.add(frontier_urls)
             print(f"  ✓ Added {new_urls} new unique URLs")
             
         except Exception as e:
@@ -173,120 +226,35 @@ class GoogleMapsFarmScraper:
     async def extract_farm_data(self, page):
         """Extract data from the current farm page."""
         try:
-            farm_data = {}
-            
-            # Extract name
             try:
                 await page.wait_for_selector('h1', state='visible', timeout=5000)
-                name_element = page.locator('h1.DUwDvf').first
-                if await name_element.count() == 0:
-                    name_element = page.locator('h1').first
-                
-                name = await name_element.text_content()
-                farm_data['name'] = name.strip() if name else 'Unknown'
-            except Exception as e:
-                farm_data['name'] = 'Unknown'
-            
-            # Skip if name is Unknown
-            if farm_data['name'] == 'Unknown':
-                return None
-            
-            # Extract rating
-            try:
-                rating_element = page.locator('div.F7nice span[aria-hidden="true"]').first
-                if await rating_element.count() > 0:
-                    rating_text = await rating_element.text_content()
-                    farm_data['rating'] = float(rating_text.replace(',', '.'))
-                else:
-                    farm_data['rating'] = None
-            except:
-                farm_data['rating'] = None
-            
-            # Extract number of reviews
-            try:
-                reviews_element = page.locator('div.F7nice span[aria-label*="review"]').first
-                if await reviews_element.count() > 0:
-                    reviews_text = await reviews_element.get_attribute('aria-label')
-                    reviews_match = re.search(r'([\d,.]+)\s*review', reviews_text)
-                    if reviews_match:
-                        farm_data['reviews'] = int(reviews_match.group(1).replace(',', '').replace('.', ''))
-                    else:
-                        farm_data['reviews'] = None
-                else:
-                    farm_data['reviews'] = None
             except:
-                farm_data['reviews'] = None
-            
-            # Extract address
-            try:
-                address_button = page.locator('button[data-item-id="address"]').first
-                if await address_button.count() > 0:
-                    address_label = await address_button.get_attribute('aria-label')
-                    farm_data['address'] = address_label.replace('Address: ', '')
-                else:
-                    farm_data['address'] = None
-            except:
-                farm_data['address'] = None
-            
-            # Extract phone
-            try:
-                phone_button = page.locator('button[data-item-id*="phone"]').first
-                if await phone_button.count() > 0:
-                    phone_label = await phone_button.get_attribute('aria-label')
-                    farm_data['phone'] = phone_label.replace('Phone: ', '')
-                else:
-                    farm_data['phone'] = None
-            except:
-                farm_data['phone'] = None
-            
-            # Extract website
-            try:
-                website_link = page.locator('a[data-item-id="authority"]').first
-                if await website_link.count() > 0:
-                    farm_data['website'] = await website_link.get_attribute('href')
-                else:
-                    farm_data['website'] = None
-            except:
-                farm_data['website'] = None
-            
-            # Extract farm type (using cuisine field for compatibility)
-            try:
-                cuisine_button = page.locator('button[jsaction*="category"]').first
-                if await cuisine_button.count() > 0:
-                    farm_data['cuisine'] = await cuisine_button.text_content()
-                else:
-                    farm_data['cuisine'] = None
-            except:
-                farm_data['cuisine'] = None
-            
-            # Extract coordinates from URL
-            try:
-                current_url = page.url
-                coords_match = re.search(r'@(-?\d+\.\d+),(-?\d+\.\d+)', current_url)
-                if coords_match:
-                    farm_data['latitude'] = float(coords_match.group(1))
-                    farm_data['longitude'] = float(coords_match.group(2))
-                else:
-                    farm_data['latitude'] = None
-                    farm_data['longitude'] = None
-            except:
-                farm_data['latitude'] = None
-                farm_data['longitude'] = None
+                return None
             
-            return farm_data
+            # Every field and fallback selector is read in one round trip;
+            # the farm type is stored in the cuisine field for compatibility
+            raw = await page.evaluate(PLACE_FIELDS_SCRIPT)
+            return parse_place_fields(raw, page.url, include_price=False)
             
         except Exception as e:
             print(f"  Error extracting data: {e}")
             return None
     
     def save_data(self):
-        """Save scraped data to JSON file."""
-        output_file = self.config.get('output_file', 'farms_data.json')
+        """Make the records appended since the last save durable (fsync the log)."""
+        self.record_log.sync()
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.farms, f, indent=2, ensure_ascii=False)
+        print(f"  ✓ Saved {len(self.farms)} farms to {self.record_log.log_file}")
         
-        print(f"  ✓ Saved {len(self.farms)} farms to {output_file}")
+        # Only now are the visits durable
+        self.frontier.complete(self.unsaved_urls)
+        self.unsaved_urls = []
+    
+    def compact_data(self):
+        """Write the deduplicated farms to the output JSON file and empty the log."""
+        self.save_data()
+        count = self.record_log.compact(self.farms)
+        print(f"  ✓ Compacted {count} farms into {self.record_log.output_file}")
 
 
 async def main():
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Network shaping and measurement for the Playwright scrapers.
+ResourceBlocker aborts requests the extractors never look at (images,
+fonts, media, map tiles, telemetry); TrafficMeter records bytes
+transferred and load time per visited page so the effect can be compared.
+"""
+
+import asyncio
+import time
+import numpy as np
+
+
+# Resource types the extractors never read; the DOM, scripts, XHR and styles still load
+BLOCKED_RESOURCE_TYPES = ('image', 'font', 'media')
+
+# URL fragments of map tiles and telemetry endpoints
+BLOCKED_URL_PATTERNS = (
+    '/maps/vt',              # Vector and raster map tiles
+    '/kh/v=',                # Satellite tiles
+    'khms',                  # Satellite tile hosts
+    'streetviewpixels',      # Street View thumbnails
+    '/gen_204',              # Click and impression pings
+    '/log204',
+    'play.google.com/log',
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net'
+)
+
+
+class ResourceBlocker:
+    def __init__(self, blocked_types=BLOCKED_RESOURCE_TYPES, blocked_patterns=BLOCKED_URL_PATTERNS,
+                 allowed_patterns=()):
+        """
+        Abort heavy or irrelevant requests on a browser context.
+
+        Args:
+            blocked_types: Playwright resource types to abort
+            blocked_patterns: URL substrings to abort regardless of type
+            allowed_patterns: URL substrings that are never aborted (wins over both)
+        """
+        self.blocked_types = set(blocked_types)
+        self.blocked_patterns = tuple(blocked_patterns)
+        self.allowed_patterns = tuple(allowed_patterns)
+        self.blocked = 0
+        self.allowed = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Blocker from scraper config, or None when block_resources is false."""
+        if not config.get('block_resources', True):
+            return None
+        return cls(allowed_patterns=config.get('resource_allowlist', []))
+
+    async def attach(self, context):
+        """Route every request of context through the blocker."""
+        await context.route('**/*', self._handle)
+
+    def should_block(self, url, resource_type):
+        if any(pattern in url for pattern in self.allowed_patterns):
+            return False
+        return resource_type in self.blocked_types or any(pattern in url for pattern in self.blocked_patterns)
+
+    async def _handle(self, route):
+        request = route.request
+        if self.should_block(request.url, request.resource_type):
+            self.blocked += 1
+            await route.abort()
+        else:
+            self.allowed += 1
+            await route.continue_()
+
+
+class TrafficMeter:
+    """Bytes transferred and load time of each page visit."""
+
+    def __init__(self):
+        self.visits = []
+        self._pending = {}
+        self._bytes = {}
+        self._requests = {}
+
+    def attach(self, page):
+        """Count the traffic of page; call once per page."""
+        page.on('requestfinished', lambda request: self._on_finished(page, request))
+
+    def start(self, page):
+        """Begin a visit: the page's counters are reset."""
+        self._bytes[page] = 0
+        self._requests[page] = 0
+        self._pending[page] = []
+
+    async def finish(self, page, url, load_seconds):
+        """End a visit and record it."""
+        pending = self._pending.pop(page, [])
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        self.visits.append({
+            'url': url,
+            'bytes': self._bytes.pop(page, 0),
+            'requests': self._requests.pop(page, 0),
+            'load_seconds': round(load_seconds, 3)
+        })
+
+    def summary(self):
+        """Per-page averages and load time percentiles over all visits."""
+        if not self.visits:
+            return {'pages': 0}
+
+        transferred = np.array([v['bytes'] for v in self.visits], dtype=float)
+        load = np.array([v['load_seconds'] for v in self.visits], dtype=float)
+        return {
+            'pages': len(self.visits),
+            'total_bytes': int(transferred.sum()),
+            'mean_bytes': int(transferred.mean()),
+            'mean_requests': round(float(np.mean([v['requests'] for v in self.visits])), 1),
+            'load_p50': round(float(np.percentile(load, 50)), 3),
+            'load_p95': round(float(np.percentile(load, 95)), 3)
+        }
+
+    def _on_finished(self, page, request):
+        if page not in self._pending:
+            return
+        self._requests[page] += 1
+        self._pending[page].append(asyncio.ensure_future(self._add_size(page, request)))
+
+    async def _add_size(self, page, request):
+        sizes = await request.sizes()
+        if page in self._bytes:
+            self._bytes[page] += sizes['responseHeadersSize'] + sizes['responseBodySize']
+
+
+def format_traffic(summary, title="PAGE TRAFFIC"):
+    """Readable report of TrafficMeter.summary()."""
+    if not summary.get('pages'):
+        return f"{title}: no pages visited"
+    return (
+        f"{title}: {summary['pages']} pages, {summary['total_bytes'] / 1e6:.1f} MB total, "
+        f"{summary['mean_bytes'] / 1e3:.0f} KB and {summary['mean_requests']} requests per page, "
+        f"load p50 {summary['load_p50']}s / p95 {summary['load_p95']}s"
+    )
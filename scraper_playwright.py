@@ -1,10 +1,19 @@
 import json
 import os
 import time
-import re
 import asyncio
 import argparse
 from playwright.async_api import async_playwright
+from scraper_pool import extract_pages, DEFAULT_CONCURRENCY
+from scraper_network import ResourceBlocker, TrafficMeter, format_traffic
+from place_extractor import PLACE_FIELDS_SCRIPT, parse_place_fields
+from snapshot_archive import SnapshotArchive
+from record_log import RecordLog
+from crawl_frontier import CrawlFrontier, DEFAULT_FRONTIER_FILE, DONE, FAILED
+
+
+# Log entries after which the collected-URL log is folded into the JSON file
+COLLECTED_LOG_COMPACT_ENTRIES = 5000
 
 
 class GoogleMapsRestaurantScraper:
@@ -17,42 +26,90 @@ class GoogleMapsRestaurantScraper:
         self.seen_urls = set()
         self.restaurant_urls = []
         
-        # Load existing data if available
+        # Load existing data if available; records are appended to a log next to
+        # the output file and compacted into it at the end of a run
+        self.record_log = RecordLog(self.config.get('output_file', 'restaurants_data.json'))
         try:
-            output_file = self.config.get('output_file', 'restaurants_data.json')
-            with open(output_file, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-                self.restaurants = existing_data
-                # Mark existing URLs as seen
-                for r in existing_data:
-                    if r.get('url'):
-                        self.seen_urls.add(r['url'])
-                print(f"Loaded {len(self.restaurants)} existing restaurants. Skipping {len(self.seen_urls)} known URLs.")
-        except FileNotFoundError:
-            print("No existing data found. Starting fresh.")
+            self.restaurants = self.record_log.load()
+            # Mark existing URLs as seen
+            for r in self.restaurants:
+                if r.get('url'):
+                    self.seen_urls.add(r['url'])
+            if self.restaurants:
+                print(f"Loaded {len(self.restaurants)} existing restaurants ({self.record_log.recovered} from the log). Skipping {len(self.seen_urls)} known URLs.")
+            else:
+                print("No existing data found. Starting fresh.")
         except Exception as e:
             print(f"Error loading existing data: {e}")
+        
+        # Optional archive of raw place pages for offline re-extraction
+        snapshot_dir = self.config.get('snapshot_dir')
+        self.archive = SnapshotArchive(snapshot_dir) if snapshot_dir else None
 
         
         self.collected_urls_file = 'collected_urls.json'
+        # New URLs are appended here and folded into the file above now and then
+        self.collected_urls_log = f"{self.collected_urls_file}.log"
+        self.collected_log_entries = 0
         self.all_collected_urls = set()
         self.load_collected_urls()
         
+        # Per-URL crawl state; restaurants already in the data file count as done
+        self.frontier = CrawlFrontier(self.config.get('frontier_file', DEFAULT_FRONTIER_FILE))
+        self.frontier.add(self.all_collected_urls)
+        self.frontier.complete(self.seen_urls)
+        # Extracted but not yet saved; only completed in the frontier once saved
+        self.unsaved_urls = []
+        
     def load_collected_urls(self):
-        """Load previously collected URLs."""
+        """Load previously collected URLs (compacted file plus the append log)."""
         try:
             if os.path.exists(self.collected_urls_file):
                 with open(self.collected_urls_file, 'r') as f:
                     self.all_collected_urls = set(json.load(f))
-                print(f"Loaded {len(self.all_collected_urls)} previously collected URLs.")
+            if os.path.exists(self.collected_urls_log):
+                with open(self.collected_urls_log, 'rb') as f:
+                    data = f.read()
+                complete = data[:data.rfind(b'\n') + 1]
+                if len(complete) < len(data):
+                    # Cut a torn last line from a crash mid-write, so the next
+                    # append starts on a fresh line instead of extending it
+                    with open(self.collected_urls_log, 'r+b') as f:
+                        f.truncate(len(complete))
+                for url in complete.decode('utf-8').splitlines():
+                    if url:
+                        self.all_collected_urls.add(url)
+                        self.collected_log_entries += 1
+            print(f"Loaded {len(self.all_collected_urls)} previously collected URLs.")
         except Exception as e:
             print(f"Error loading collected URLs: {e}")
 
+    def append_collected_urls(self, urls):
+        """Append newly collected URLs to the log; compact it once it grows large."""
+        if not urls:
+            return
+        try:
+            with open(self.collected_urls_log, 'a') as f:
+                f.write(''.join(f"{url}\n" for url in urls))
+            self.collected_log_entries += len(urls)
+        except Exception as e:
+            print(f"Error saving collected URLs: {e}")
+            return
+        
+        if self.collected_log_entries >= COLLECTED_LOG_COMPACT_ENTRIES:
+            self.save_collected_urls()
+
     def save_collected_urls(self):
-        """Save collected URLs to file."""
+        """Compact: rewrite the full URL file atomically and empty the log."""
         try:
-            with open(self.collected_urls_file, 'w') as f:
+            tmp_path = f"{self.collected_urls_file}.tmp"
+            with open(tmp_path, 'w') as f:
                 json.dump(list(self.all_collected_urls), f)
+            os.replace(tmp_path, self.collected_urls_file)
+            # Only dropped once its URLs are safely in the compacted file
+            if os.path.exists(self.collected_urls_log):
+                os.remove(self.collected_urls_log)
+            self.collected_log_entries = 0
         except Exception as e:
             print(f"Error saving collected URLs: {e}")
         
@@ -64,24 +121,25 @@ class GoogleMapsRestaurantScraper:
                 headless=self.config.get('headless', False)
             )
             
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
+            context = await self.new_context(browser)
+            
+            # Only DOM text is read: skip images, fonts, map tiles and telemetry
+            blocker = ResourceBlocker.from_config(self.config)
+            if blocker:
+                await blocker.attach(context)
             
             page = await context.new_page()
             
             try:
                 # Check if we can resume Phase 2 directly
-                # URLs we know about MINUS URLs we have data for
-                unvisited_urls = [url for url in self.all_collected_urls if url not in self.seen_urls]
+                # URLs still pending in the frontier (never visited, or waiting for a retry)
+                unvisited_urls = self.frontier.pending_urls()
                 
                 if len(unvisited_urls) > 0:
                     print("=" * 60)
                     print(f"RESUMING: Found {len(unvisited_urls)} collected but unvisited URLs.")
                     print("Skipping Phase 1 (Search) and jumping to Phase 2 (Extraction).")
                     print("=" * 60)
-                    self.restaurant_urls = unvisited_urls
                 else:
                     # PHASE 1: COLLECT URLS
                     print("=" * 60)
@@ -96,6 +154,8 @@ class GoogleMapsRestaurantScraper:
                         print(f"\n[Query {query_idx}/{len(search_queries)}] {search_query}")
                         await self.collect_urls(page, search_query)
                         
+                    self.save_collected_urls()
+                    
                     print(f"\n{'=' * 60}")
                     print(f"Total unique URLs collected: {len(self.restaurant_urls)}")
                     print(f"{'=' * 60}")
@@ -104,28 +164,27 @@ class GoogleMapsRestaurantScraper:
                 print("\nPHASE 2: Extracting Data from URLs")
                 print("=" * 60)
                 
-                for idx, url in enumerate(self.restaurant_urls, 1):
-                    print(f"[{idx}/{len(self.restaurant_urls)}] Processing: {url.split('?')[0]}")
-                    
-                    try:
-                        await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-                        await asyncio.sleep(1) # Small delay to let dynamic content settle
-                        
-                        data = await self.extract_restaurant_data(page)
-                        
-                        if data:
-                            data['url'] = url
-                            self.restaurants.append(data)
-                            print(f"  ✓ {data.get('name', 'Unknown')} ({data.get('rating', 'N/A')}★)")
-                            
-                            # Save periodically
-                            if idx % 10 == 0:
-                                self.save_data()
-                        else:
-                            print("  ⚠ Failed to extract data")
-                            
-                    except Exception as e:
-                        print(f"  ⚠ Error visiting URL: {e}")
+                # Pool of pages claiming URLs from the frontier; results arrive in claim order
+                self.restaurant_urls = self.frontier.pending_urls()
+                meter = TrafficMeter()
+                await extract_pages(
+                    context,
+                    self.restaurant_urls,
+                    self.extract_restaurant_data,
+                    self.handle_result,
+                    concurrency=self.config.get('concurrency', DEFAULT_CONCURRENCY),
+                    request_delay=self.config.get('request_delay'),
+                    settle_seconds=1,  # Small delay to let dynamic content settle
+                    meter=meter,
+                    snapshot=self.snapshot if self.archive else None,
+                    ready_selector='h1',  # The extractor's wait target
+                    frontier=self.frontier
+                )
+                
+                print(f"\nFrontier: {self.frontier.counts()}")
+                print(format_traffic(meter.summary()))
+                if blocker:
+                    print(f"Blocked {blocker.blocked} of {blocker.blocked + blocker.allowed} requests")
                 
             except Exception as e:
                 print(f"Error during scraping: {e}")
@@ -134,7 +193,86 @@ class GoogleMapsRestaurantScraper:
             
             finally:
                 await browser.close()
+                self.compact_data()
+    
+    async def compare_resource_blocking(self, sample_size=10):
+        """Visit the same places with and without resource blocking and compare traffic.
+        
+        Uses URLs of already scraped restaurants; nothing is saved.
+        """
+        urls = [r['url'] for r in self.restaurants if r.get('url')][:sample_size]
+        if not urls:
+            print("No scraped restaurants to sample URLs from.")
+            return {}
+        
+        report = {}
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=self.config.get('headless', False))
+            try:
+                blocking = ResourceBlocker(allowed_patterns=self.config.get('resource_allowlist', []))
+                for label, blocker in (('unblocked', None), ('blocked', blocking)):
+                    # Fresh context each time so the browser cache doesn't favour the second run
+                    context = await self.new_context(browser)
+                    if blocker:
+                        await blocker.attach(context)
+                    
+                    meter = TrafficMeter()
+                    extracted = []
+                    await extract_pages(
+                        context,
+                        urls,
+                        self.extract_restaurant_data,
+                        lambda idx, url, data, error: extracted.append(data is not None),
+                        concurrency=1,
+                        request_delay=self.config.get('request_delay'),
+                        settle_seconds=1,
+                        meter=meter
+                    )
+                    await context.close()
+                    
+                    report[label] = {**meter.summary(), 'extracted': sum(extracted)}
+                    print(format_traffic(report[label], title=label.upper()))
+            finally:
+                await browser.close()
+        
+        if 'blocked' in report and report['unblocked'].get('pages') and report['blocked'].get('pages'):
+            saved = 1 - report['blocked']['mean_bytes'] / max(1, report['unblocked']['mean_bytes'])
+            print(f"Bytes per page reduced by {saved:.0%}; "
+                  f"extracted {report['blocked']['extracted']}/{len(urls)} vs {report['unblocked']['extracted']}/{len(urls)}")
+        return report
+    
+    async def new_context(self, browser):
+        """Browser context with the scraper's viewport and user agent."""
+        return await browser.new_context(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        )
+    
+    async def snapshot(self, page, url):
+        """Archive the visited page's place panel."""
+        await self.archive.capture(page, url, 'restaurant')
+    
+    def handle_result(self, idx, url, data, error):
+        """Record one visited URL (called in URL order by the page pool)."""
+        counts = self.frontier.counts()
+        # Extracted URLs are only completed in the frontier once saved; +1 for this one
+        visited = counts[DONE] + counts[FAILED] + len(self.unsaved_urls) + 1
+        print(f"[{visited}/{sum(counts.values())}] Processing: {url.split('?')[0]}")
+        
+        if error is not None:
+            print(f"  ⚠ Error visiting URL: {error} ({self.frontier.fail(url, error)})")
+        elif data:
+            data['url'] = url
+            self.restaurants.append(data)
+            self.record_log.append(data)
+            self.unsaved_urls.append(url)
+            print(f"  ✓ {data.get('name', 'Unknown')} ({data.get('rating', 'N/A')}★)")
+            
+            # Save periodically
+            if len(self.unsaved_urls) >= 10:
                 self.save_data()
+        else:
+            print(f"  ⚠ Failed to extract data ({self.frontier.fail(url, 'no data extracted')})")
     
     async def collect_urls(self, page, search_query):
         """Collect restaurant URLs for a single search query."""
@@ -192,6 +330,8 @@ class GoogleMapsRestaurantScraper:
             # Extract URLs
             links = await page.locator('div[role="feed"] > div > div > a').all()
             new_urls = 0
+            frontier_urls = []
+            collected_urls = []
             
             for link in links:
                 href = await link.get_attribute('href')
@@ -199,14 +339,18 @@ class GoogleMapsRestaurantScraper:
                     # Add to persistent collection
                     if href not in self.all_collected_urls:
                         self.all_collected_urls.add(href)
-                        self.save_collected_urls()
+                        collected_urls.append(href)
                     
                     # Add to current run if not seen in data
                     if href not in self.seen_urls:
                         self.seen_urls.add(href)
                         self.restaurant_urls.append(href)
+                        frontier_urls.append(href)
                         new_urls += 1
             
+            # One append per query instead of a full rewrite per link
+            self.append_collected_urls(collected_urls)
+            self.frontier.add(frontier_urls)
             print(f"  ✓ Added {new_urls} new unique URLs")
             
         except Exception as e:
@@ -215,149 +359,19 @@ class GoogleMapsRestaurantScraper:
     async def extract_restaurant_data(self, page):
         """Extract data from the current restaurant page."""
         try:
-            restaurant_data = {}
-            
-            # Extract name
+            # Wait for the main heading to be visible
             try:
-                # Wait for the main heading to be visible
-                try:
-                    await page.wait_for_selector('h1', state='visible', timeout=5000)
-                except:
-                    print("  ⚠ Timeout waiting for h1")
-
-                name_element = page.locator('h1.DUwDvf').first
-                if await name_element.count() == 0:
-                    name_element = page.locator('h1').first
-                
-                name = await name_element.text_content()
-                restaurant_data['name'] = name.strip() if name else 'Unknown'
-            except Exception as e:
-                print(f"  ⚠ Error extracting name: {e}")
-                restaurant_data['name'] = 'Unknown'
-            
-            # Skip if name is Unknown
-            if restaurant_data['name'] == 'Unknown':
-                print(f"  ⚠ Skipping {page.url} - Name not found")
-                return None
-            
-            # Extract rating
-            try:
-                rating_element = page.locator('div.F7nice span[aria-hidden="true"]').first
-                if await rating_element.count() > 0:
-                    rating_text = await rating_element.text_content()
-                    restaurant_data['rating'] = float(rating_text.replace(',', '.'))
-                else:
-                    restaurant_data['rating'] = None
+                await page.wait_for_selector('h1', state='visible', timeout=5000)
             except:
-                restaurant_data['rating'] = None
+                print("  ⚠ Timeout waiting for h1")
             
-            # Extract number of reviews
-            try:
-                reviews_element = page.locator('div.F7nice span[aria-label*="review"]').first
-                if await reviews_element.count() > 0:
-                    reviews_text = await reviews_element.get_attribute('aria-label')
-                    reviews_match = re.search(r'([\d,.]+)\s*review', reviews_text)
-                    if reviews_match:
-                        restaurant_data['reviews'] = int(reviews_match.group(1).replace(',', '').replace('.', ''))
-                    else:
-                        restaurant_data['reviews'] = None
-                else:
-                    restaurant_data['reviews'] = None
-            except:
-                restaurant_data['reviews'] = None
-            
-            # Extract price level
-            try:
-                # Try multiple selectors for price level
-                price_level = None
-                
-                # Strategy 1: Look for aria-label with "Price:"
-                price_element = page.locator('span[aria-label*="Price"]').first
-                if await price_element.count() > 0:
-                    price_text = await price_element.get_attribute('aria-label')
-                    if price_text:
-                        price_level = price_text.replace('Price: ', '')
-                
-                # Strategy 2: Look for dollar signs in the page
-                if not price_level:
-                    # Look for elements containing only $ symbols
-                    dollar_elements = await page.locator('span:has-text("$")').all()
-                    for elem in dollar_elements:
-                        text = await elem.text_content()
-                        if text and all(c in '$' for c in text.strip()):
-                            price_level = text.strip()
-                            break
-                
-                # Strategy 3: Look in the F7nice div (same area as rating)
-                if not price_level:
-                    price_in_rating_area = page.locator('div.F7nice span:has-text("$")').first
-                    if await price_in_rating_area.count() > 0:
-                        text = await price_in_rating_area.text_content()
-                        if text and '$' in text:
-                            # Extract just the dollar signs
-                            price_level = ''.join(c for c in text if c == '$')
-                
-                restaurant_data['price_level'] = price_level
-            except Exception as e:
-                print(f"  ⚠ Error extracting price: {e}")
-                restaurant_data['price_level'] = None
-            
-            # Extract address
-            try:
-                address_button = page.locator('button[data-item-id="address"]').first
-                if await address_button.count() > 0:
-                    address_label = await address_button.get_attribute('aria-label')
-                    restaurant_data['address'] = address_label.replace('Address: ', '')
-                else:
-                    restaurant_data['address'] = None
-            except:
-                restaurant_data['address'] = None
-            
-            # Extract phone
-            try:
-                phone_button = page.locator('button[data-item-id*="phone"]').first
-                if await phone_button.count() > 0:
-                    phone_label = await phone_button.get_attribute('aria-label')
-                    restaurant_data['phone'] = phone_label.replace('Phone: ', '')
-                else:
-                    restaurant_data['phone'] = None
-            except:
-                restaurant_data['phone'] = None
-            
-            # Extract website
-            try:
-                website_link = page.locator('a[data-item-id="authority"]').first
-                if await website_link.count() > 0:
-                    restaurant_data['website'] = await website_link.get_attribute('href')
-                else:
-                    restaurant_data['website'] = None
-            except:
-                restaurant_data['website'] = None
-            
-            # Extract cuisine type
-            try:
-                cuisine_button = page.locator('button[jsaction*="category"]').first
-                if await cuisine_button.count() > 0:
-                    restaurant_data['cuisine'] = await cuisine_button.text_content()
-                else:
-                    restaurant_data['cuisine'] = None
-            except:
-                restaurant_data['cuisine'] = None
-            
-            # Extract coordinates from URL
-            try:
-                current_url = page.url
-                coords_match = re.search(r'@(-?\d+\.\d+),(-?\d+\.\d+)', current_url)
-                if coords_match:
-                    restaurant_data['latitude'] = float(coords_match.group(1))
-                    restaurant_data['longitude'] = float(coords_match.group(2))
-                else:
-                    restaurant_data['latitude'] = None
-                    restaurant_data['longitude'] = None
-            except:
-                restaurant_data['latitude'] = None
-                restaurant_data['longitude'] = None
+            # Every field and fallback selector is read in one round trip
+            raw = await page.evaluate(PLACE_FIELDS_SCRIPT)
+            restaurant_data = parse_place_fields(raw, page.url)
             
+            # Skip if name is Unknown
+            if restaurant_data is None:
+                print(f"  ⚠ Skipping {page.url} - Name not found")
             return restaurant_data
             
         except Exception as e:
@@ -365,13 +379,20 @@ class GoogleMapsRestaurantScraper:
             return None
     
     def save_data(self):
-        """Save scraped data to JSON file."""
-        output_file = self.config.get('output_file', 'restaurants_data.json')
+        """Make the records appended since the last save durable (fsync the log)."""
+        self.record_log.sync()
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.restaurants, f, indent=2, ensure_ascii=False)
+        print(f"  ✓ Saved {len(self.restaurants)} restaurants to {self.record_log.log_file}")
         
-        print(f"  ✓ Saved {len(self.restaurants)} restaurants to {output_file}")
+        # Only now are the visits durable
+        self.frontier.complete(self.unsaved_urls)
+        self.unsaved_urls = []
+    
+    def compact_data(self):
+        """Write the deduplicated restaurants to the output JSON file and empty the log."""
+        self.save_data()
+        count = self.record_log.compact(self.restaurants)
+        print(f"  ✓ Compacted {count} restaurants into {self.record_log.output_file}")
 
 
 async def main():
@@ -384,9 +405,21 @@ async def main():
     parser.add_argument('--config', 
                         default='config.json',
                         help='Path to configuration file (default: config.json)')
+    parser.add_argument('--retry-failed',
+                        action='store_true',
+                        help='Give URLs that failed every attempt another round of attempts')
+    parser.add_argument('--compare-blocking',
+                        type=int,
+                        metavar='N',
+                        help='Compare traffic with and without resource blocking on N scraped URLs, then exit')
     
     args = parser.parse_args()
     
+    if args.compare_blocking:
+        scraper = GoogleMapsRestaurantScraper(config_path=args.config)
+        await scraper.compare_resource_blocking(args.compare_blocking)
+        return
+    
     print("=" * 60)
     print(f"Google Maps {args.type.capitalize()} Scraper - Amsterdam")
     print("Robust Collect-Then-Visit Strategy")
@@ -396,6 +429,8 @@ async def main():
     print("=" * 60)
     
     scraper = GoogleMapsRestaurantScraper(config_path=args.config)
+    if args.retry_failed:
+        print(f"Retrying {scraper.frontier.retry_failed()} failed URLs")
     await scraper.scrape()
     
     print("\n" + "=" * 60)
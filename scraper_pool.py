@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Concurrent detail-page extraction for the Playwright scrapers.
+A pool of pages in one browser context takes URLs from a shared queue;
+results are handed back in input order so progress output and periodic
+saves behave as in a sequential run.
+"""
+
+import asyncio
+import time
+from rate_limiter import TokenBucket
+
+
+DEFAULT_CONCURRENCY = 4
+
+
+async def extract_pages(context, urls, extract, on_result, concurrency=DEFAULT_CONCURRENCY,
+                        request_delay=None, settle_seconds=1.0, timeout_ms=30000, meter=None, snapshot=None,
+                        frontier=None, retry_wait=120, ready_selector=None, ready_timeout_ms=5000):
+    """Visit every URL on a pool of pages and extract it.
+
+    Args:
+        context: Playwright browser context the pages are opened in
+        urls: URLs to visit (ignored when frontier is given)
+        extract: async extract(page) -> record or None, called once the page settled
+        on_result: on_result(idx, url, data, error) called in input order (idx from 1)
+        concurrency: Number of pages visiting URLs at once
+        request_delay: Minimum seconds between navigations across the whole pool
+        settle_seconds: Delay after navigation to let dynamic content settle
+        timeout_ms: Navigation timeout
+        meter: Optional TrafficMeter recording bytes and load time per visit
+        snapshot: Optional async snapshot(page, url) called before extraction,
+            once ready_selector is visible
+        frontier: Optional CrawlFrontier to claim URLs from instead; on_result
+            must complete or fail every URL it is given
+        retry_wait: With a frontier, how long workers wait for URLs in backoff
+            before giving up
+        ready_selector: Selector of the content the snapshot should contain
+            (the extractor's own wait target); snapshots are taken even if it
+            never shows up
+        ready_timeout_ms: How long to wait for ready_selector
+    """
+    queue = asyncio.Queue()
+    if frontier is None:
+        for item in enumerate(urls, 1):
+            queue.put_nowait(item)
+    claimed = 0
+
+    # Politeness limit: navigations are spaced out across workers, not per worker
+    bucket = TokenBucket(1 / request_delay) if request_delay else None
+    finished = {}
+    next_idx = 1
+
+    def merge(idx, result):
+        # Hand results over in input order as soon as the next one is complete
+        nonlocal next_idx
+        finished[idx] = result
+        while next_idx in finished:
+            url, data, error = finished.pop(next_idx)
+            on_result(next_idx, url, data, error)
+            next_idx += 1
+
+    # Pages whose renderer crashed; is_closed() stays False for them
+    crashed = set()
+
+    async def new_page():
+        page = await context.new_page()
+        page.on('crash', crashed.add)
+        if meter:
+            meter.attach(page)
+        return page
+
+    async def replace_page(page):
+        if page is not None:
+            crashed.discard(page)
+            if not page.is_closed():
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+        return await new_page()
+
+    async def take_snapshot(page, url):
+        # Archived before extraction so pages the extractor can't parse are kept too,
+        # but only once the content has rendered; a failed snapshot never costs the record
+        try:
+            if ready_selector:
+                try:
+                    await page.wait_for_selector(ready_selector, state='visible', timeout=ready_timeout_ms)
+                except Exception:
+                    pass
+            await snapshot(page, url)
+        except Exception as e:
+            print(f"  ⚠ Snapshot failed for {url}: {e}")
+
+    async def next_url():
+        """Next (idx, url) to visit, or None when the worker is done."""
+        nonlocal claimed
+        if frontier is None:
+            try:
+                return queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return None
+
+        while True:
+            urls = await asyncio.to_thread(frontier.claim)
+            if urls:
+                claimed += 1
+                return claimed, urls[0]
+            # Wait for URLs in backoff unless the next retry is too far off
+            wait = await asyncio.to_thread(frontier.next_eligible_in)
+            if wait is None or wait > retry_wait:
+                return None
+            await asyncio.sleep(max(wait, 0.1))
+
+    async def worker():
+        page = None
+        try:
+            while True:
+                item = await next_url()
+                if item is None:
+                    return
+                idx, url = item
+
+                if bucket:
+                    await bucket.acquire()
+
+                # A failing URL (or page) only costs its own result; the worker
+                # moves on and opens a new page for the next one
+                try:
+                    if page is None or page.is_closed() or page in crashed:
+                        # None until the new page exists, so a failed
+                        # creation is retried on the next URL
+                        previous, page = page, None
+                        page = await replace_page(previous)
+                    if meter:
+                        meter.start(page)
+                    started = time.perf_counter()
+                    await page.goto(url, wait_until='domcontentloaded', timeout=timeout_ms)
+                    load_seconds = time.perf_counter() - started
+                    await asyncio.sleep(settle_seconds)
+                    if meter:
+                        # After the settle delay, so late requests are counted too
+                        await meter.finish(page, url, load_seconds)
+                    if snapshot:
+                        await take_snapshot(page, url)
+                    result = (url, await extract(page), None)
+                except Exception as e:
+                    result = (url, None, e)
+                merge(idx, result)
+        finally:
+            if page is not None and not page.is_closed():
+                await page.close()
+
+    size = concurrency if frontier is not None else min(concurrency, queue.qsize())
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, size))]
+    await asyncio.gather(*workers)
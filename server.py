@@ -1,37 +1,27 @@
 from fastapi import FastAPI, Query, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import json
 import os
+import hashlib
+import threading
+from datetime import datetime
 from typing import Optional, List
 import uvicorn
 from analytics import RestaurantAnalytics
 from district_analytics import DistrictAnalytics
-from llm_analyzer import LLMAnalyzer
-import numpy as np
+from llm_analyzer import DEFAULT_BASE_URL
+from llm_metrics import get_metrics, format_summary
+from llm_health import get_health_monitor
+from llm_router import ModelRouter, INTERACTIVE
+from city_summary import CitySummaryCache, DISTRICT_CACHE_FILE, RECOMMENDATIONS_CACHE_FILE
+from spatial import DEFAULT_COMPETITOR_RADII, compute_competitor_density
+from heatmap import DensityRasterCache, HEATMAP_METRICS, HEATMAP_ZOOMS, TILE_SIZE, CELL_PX
+from json_utils import convert_numpy_types
 from pathlib import Path
 
 
-# Helper to convert numpy types to Python types
-def convert_numpy_types(obj):
-    """Recursively convert numpy types to Python native types."""
-    if isinstance(obj, (np.integer, np.int64, np.int32)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float64, np.float32)):
-        return float(obj)
-    elif isinstance(obj, (np.bool_, bool)):
-        return bool(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, dict):
-        return {key: convert_numpy_types(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_numpy_types(item) for item in obj]
-    return obj
-
-
-
 app = FastAPI(title="Amsterdam Restaurants API", version="1.0.0")
 
 # Enable CORS
@@ -46,21 +36,39 @@ app.add_middleware(
 # Data storage
 RESTAURANTS_FILE = "restaurants_data.json"
 FARMS_FILE = "farms_data.json"
+ANALYSES_CACHE_FILE = DISTRICT_CACHE_FILE
+CITY_SUMMARY_CACHE_FILE = RECOMMENDATIONS_CACHE_FILE
+COMPETITOR_RADII = DEFAULT_COMPETITOR_RADII
 restaurants_data = []
+restaurants_version = None
 farms_data = []
+heatmap_cache = DensityRasterCache()
+model_router = ModelRouter()
+city_summary_cache = CitySummaryCache(ANALYSES_CACHE_FILE, CITY_SUMMARY_CACHE_FILE)
 
 
 def load_restaurants():
     """Load restaurant data from JSON file."""
-    global restaurants_data
+    global restaurants_data, restaurants_version
     
     if os.path.exists(RESTAURANTS_FILE):
-        with open(RESTAURANTS_FILE, 'r', encoding='utf-8') as f:
-            restaurants_data = json.load(f)
+        with open(RESTAURANTS_FILE, 'rb') as f:
+            raw = f.read()
+        restaurants_version = hashlib.sha1(raw).hexdigest()
+        restaurants_data = json.loads(raw.decode('utf-8'))
+        compute_competitor_density(restaurants_data, COMPETITOR_RADII)
+        
+        # Build heatmap rasters for every zoom level off the request path
+        threading.Thread(
+            target=heatmap_cache.precompute,
+            args=(restaurants_data, restaurants_version),
+            daemon=True
+        ).start()
         print(f"Loaded {len(restaurants_data)} restaurants from {RESTAURANTS_FILE}")
     else:
         print(f"Warning: {RESTAURANTS_FILE} not found. Run scraper.py first.")
         restaurants_data = []
+        restaurants_version = None
 
 
 def load_farms():
@@ -81,6 +89,19 @@ async def startup_event():
     """Load data on startup."""
     load_restaurants()
     load_farms()
+    # Probe Ollama in the background so requests never wait on a health check
+    get_health_monitor(DEFAULT_BASE_URL).start()
+    # Build the city summary before the first dashboard request
+    threading.Thread(target=city_summary_cache.warm, daemon=True).start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the Ollama health probe and report LLM throughput for this server process."""
+    get_health_monitor(DEFAULT_BASE_URL).stop()
+    summary = get_metrics().summary()
+    if summary['calls']:
+        print(format_summary(summary, title="LLM THROUGHPUT (server process)"))
 
 
 @app.get("/")
@@ -283,6 +304,49 @@ async def get_map_data():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/heatmap/meta")
+async def get_heatmap_meta():
+    """Describe the available heatmap metrics, zoom levels and tile format."""
+    return {
+        "version": restaurants_version,
+        "metrics": list(HEATMAP_METRICS),
+        "zooms": list(HEATMAP_ZOOMS),
+        "tile_size": TILE_SIZE,
+        "cells_per_tile": TILE_SIZE // CELL_PX,
+        "formats": ["png", "bin"]
+    }
+
+
+@app.get("/api/heatmap/{metric}/{z}/{x}/{y}")
+async def get_heatmap_tile(
+    metric: str,
+    z: int,
+    x: int,
+    y: int,
+    format: str = Query("png", description="Tile format: png or bin (raw float32 cells)")
+):
+    """Get a density heatmap tile (slippy-map XYZ addressing)."""
+    raster = heatmap_cache.get(restaurants_data, restaurants_version, metric, z)
+    if raster is None:
+        raise HTTPException(status_code=404, detail="Unknown heatmap metric or zoom level")
+    
+    headers = {
+        "Cache-Control": "public, max-age=3600",
+        "ETag": f'"{restaurants_version}-{metric}-{z}-{x}-{y}-{format}"'
+    }
+    
+    if format == "bin":
+        cells = raster.tile(x, y)
+        headers.update({
+            "X-Raster-Shape": f"{cells.shape[0]}x{cells.shape[1]}",
+            "X-Raster-Dtype": "float32-le",
+            "X-Raster-Max": str(raster.vmax)
+        })
+        return Response(cells.astype('<f4').tobytes(), media_type="application/octet-stream", headers=headers)
+    
+    return Response(raster.tile_png(x, y), media_type="image/png", headers=headers)
+
+
 @app.post("/api/reload")
 async def reload_data():
     """Reload restaurant data from file."""
@@ -488,7 +552,7 @@ async def get_districts_summary():
 async def get_district_analytics(pc4: str):
     """Get detailed analytics for a specific district."""
     # Try to load from cache first
-    cache_file = Path('district_analyses_cache.json')
+    cache_file = Path(ANALYSES_CACHE_FILE)
     if cache_file.exists():
         with open(cache_file, 'r', encoding='utf-8') as f:
             cache = json.load(f)
@@ -497,6 +561,7 @@ async def get_district_analytics(pc4: str):
                 # Return cached analytics and insights
                 result = cached_data['analytics'].copy()
                 result['ai_insights'] = cached_data['ai_insights']
+                result['ai_sections'] = cached_data.get('sections')
                 result['cached'] = True
                 result['generated_at'] = cached_data['generated_at']
                 return convert_numpy_types(result)
@@ -508,21 +573,11 @@ async def get_district_analytics(pc4: str):
     if analytics_data is None or 'error' in analytics_data:
         raise HTTPException(status_code=404, detail="District not found or insufficient data")
     
-    # Try to generate LLM insights
-    llm = LLMAnalyzer()
-    insights = None
-    
-    try:
-        if llm.check_availability():
-            insights = llm.generate_district_analysis(pc4, analytics_data)
-        else:
-            # Use fallback analysis
-            insights = llm._generate_fallback_analysis(pc4, analytics_data)
-    except Exception as e:
-        print(f"Error generating insights: {e}")
-        insights = llm._generate_fallback_analysis(pc4, analytics_data)
+    # Interactive request: small model under a latency budget, rule-based as last resort
+    insights, model = model_router.route_district_analysis(pc4, analytics_data, mode=INTERACTIVE)
     
     analytics_data['ai_insights'] = insights
+    analytics_data['model'] = model
     analytics_data['cached'] = False
     
     # Convert numpy types to Python native types for JSON serialization
@@ -540,28 +595,55 @@ async def regenerate_district_insights(pc4: str):
     if analytics_data is None or 'error' in analytics_data:
         raise HTTPException(status_code=404, detail="District not found or insufficient data")
     
-    llm = LLMAnalyzer()
+    # Bypass the response cache so the user gets a fresh generation
+    insights, model = model_router.route_district_analysis(pc4, analytics_data, mode=INTERACTIVE, use_cache=False)
+    if model is None:
+        return {"insights": insights, "success": False, "error": "No LLM model available within the latency budget"}
     
-    try:
-        insights = llm.generate_district_analysis(pc4, analytics_data)
-        return {"insights": insights, "success": True}
-    except Exception as e:
-        # Return fallback
-        insights = llm._generate_fallback_analysis(pc4, analytics_data)
-        return {"insights": insights, "success": False, "error": str(e)}
+    # Persist the new insights and apply the district to the city summary as a delta
+    city_summary_cache.update_district(pc4, {
+        'analytics': analytics_data,
+        'ai_insights': insights,
+        'sections': None,
+        'llm_used': True,
+        'model': model,
+        'generated_at': datetime.now().isoformat()
+    })
+    return {"insights": insights, "success": True, "model": model}
 
 
 @app.get("/api/analytics/city-summary")
 async def get_city_summary():
     """Get city-wide summary with strategic recommendations."""
-    from city_summary import CitySummaryGenerator
-    
-    generator = CitySummaryGenerator()
-    summary = generator.generate_summary()
+    # Answered from memory; rebuilt in the background when the district cache changes
+    summary = city_summary_cache.get()
     
     return convert_numpy_types(summary)
 
 
+@app.get("/api/llm/metrics")
+async def get_llm_metrics():
+    """Get LLM token throughput and latency for this server process."""
+    metrics = get_metrics()
+    return {
+        "since": metrics.started_at,
+        "summary": metrics.summary(),
+        "recent": list(metrics.records)[-20:]
+    }
+
+
+@app.get("/api/llm/health")
+async def get_llm_health():
+    """Get the cached Ollama availability and circuit breaker state."""
+    return get_health_monitor(DEFAULT_BASE_URL).status()
+
+
+@app.get("/api/llm/routing")
+async def get_llm_routing():
+    """Get per-mode model routing with each model's observed latency."""
+    return model_router.status()
+
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Content-addressed archive of place page snapshots.
+The scrapers store the place panel's HTML gzip-compressed under its SHA-256
+(identical snapshots are stored once) and append one index line per visit,
+so reextract_snapshots.py can re-parse every page offline when Google
+changes its markup.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+
+# The place panel holds every extracted field; the whole document if it is missing
+SNAPSHOT_SCRIPT = """
+() => (document.querySelector('div[role="main"]') || document.documentElement).outerHTML
+"""
+
+
+class SnapshotArchive:
+    def __init__(self, root):
+        """
+        Open (or create) an archive directory.
+
+        Args:
+            root: Directory holding objects/ (compressed snapshots) and index.jsonl
+        """
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.index_file = self.root / 'index.jsonl'
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+
+    async def capture(self, page, url, kind):
+        """Snapshot the place panel of page, visited as url."""
+        html = await page.evaluate(SNAPSHOT_SCRIPT)
+        return self.store(url, page.url, html, kind)
+
+    def store(self, url, page_url, html, kind):
+        """Store one snapshot and index it; returns its digest."""
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(data))
+            os.replace(tmp_path, path)
+
+        entry = {
+            'url': url,
+            'page_url': page_url,
+            'kind': kind,
+            'sha256': digest,
+            'captured_at': datetime.now().isoformat()
+        }
+        with open(self.index_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return digest
+
+    def entries(self, kind=None):
+        """Latest index entry per URL, in order of first capture."""
+        latest = {}
+        if not self.index_file.exists():
+            return []
+
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn final line from a crash mid-write
+                    continue
+                if kind is None or entry.get('kind') == kind:
+                    latest[entry['url']] = entry
+        return list(latest.values())
+
+    def load(self, digest):
+        """HTML of a stored snapshot."""
+        with open(self._object_path(digest), 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+
+    def _object_path(self, digest):
+        # Fan out over 256 subdirectories to keep directories small
+        return self.objects_dir / digest[:2] / f"{digest}.html.gz"
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Spatial helpers for district analytics.
+Builds the PC4 adjacency graph from the postcode polygons, provides
+neighbourhood-smoothed metrics computed for all districts at once, and
+counts nearby competitors for every restaurant with a KD-tree.
+"""
+
+import hashlib
+import json
+import os
+import re
+import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+
+GEOJSON_FILE = 'static/amsterdam_pc4.geojson'
+ADJACENCY_FILE = 'static/amsterdam_pc4_adjacency.npz'
+
+# Approximate metres per degree latitude
+METERS_PER_DEGREE = 111320.0
+
+# Radii (metres) used for per-restaurant competitor counts
+DEFAULT_COMPETITOR_RADII = (100, 250, 500)
+
+# Loaded graphs keyed by (geojson path, mtime)
+_GRAPH_CACHE = {}
+
+
+class PC4Graph:
+    """Sparse adjacency graph between PC4 districts."""
+
+    def __init__(self, pc4s, adjacency, areas_km2):
+        self.pc4s = list(pc4s)
+        self.index = {pc4: i for i, pc4 in enumerate(self.pc4s)}
+        self.adjacency = adjacency.tocsr()
+        self.areas_km2 = np.asarray(areas_km2, dtype=float)
+        self.degree = np.asarray(self.adjacency.sum(axis=1)).ravel()
+
+    @classmethod
+    def from_geojson(cls, geojson):
+        """Build the graph from polygons; districts sharing a vertex are neighbours."""
+        features = [f for f in geojson['features'] if f['properties'].get('pc4')]
+        pc4s = [f['properties']['pc4'] for f in features]
+
+        vertex_ids = {}
+        rows, cols = [], []
+        areas = []
+
+        for i, feature in enumerate(features):
+            polygons = _polygons(feature['geometry'])
+            areas.append(sum(_polygon_area_km2(p) for p in polygons))
+
+            for polygon in polygons:
+                for ring in polygon:
+                    for lon, lat in ring:
+                        key = (round(lon, 6), round(lat, 6))
+                        rows.append(i)
+                        cols.append(vertex_ids.setdefault(key, len(vertex_ids)))
+
+        # District x vertex incidence; B @ B.T counts shared vertices
+        incidence = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(features), len(vertex_ids))
+        )
+        incidence.data[:] = 1
+        shared = (incidence @ incidence.T).tocsr()
+        shared.setdiag(0)
+        shared.eliminate_zeros()
+        adjacency = (shared > 0).astype(float)
+
+        return cls(pc4s, adjacency, areas)
+
+    def neighbours(self, pc4):
+        """Return the PC4 codes adjacent to pc4."""
+        i = self.index.get(pc4)
+        if i is None:
+            return []
+        row = self.adjacency.getrow(i)
+        return [self.pc4s[j] for j in row.indices]
+
+    def smooth_ratio(self, numerator, denominator, neighbour_weight=0.5):
+        """Neighbour-weighted ratio: (x_i + w*sum_j x_j) / (y_i + w*sum_j y_j)."""
+        numerator = np.asarray(numerator, dtype=float)
+        denominator = np.asarray(denominator, dtype=float)
+
+        num = numerator + neighbour_weight * (self.adjacency @ numerator)
+        den = denominator + neighbour_weight * (self.adjacency @ denominator)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(den > 0, num / den, np.nan)
+
+    def save(self, path, source_hash):
+        """Store the graph as a sparse matrix alongside its source hash."""
+        adjacency = self.adjacency.tocsr()
+        np.savez_compressed(
+            path,
+            data=adjacency.data,
+            indices=adjacency.indices,
+            indptr=adjacency.indptr,
+            shape=np.asarray(adjacency.shape),
+            pc4s=np.asarray(self.pc4s),
+            areas_km2=self.areas_km2,
+            source_hash=np.asarray(source_hash)
+        )
+
+    @classmethod
+    def load(cls, path, source_hash):
+        """Load a stored graph, or None if it was built from other polygons."""
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                if str(f['source_hash']) != source_hash:
+                    return None
+                adjacency = sparse.csr_matrix(
+                    (f['data'], f['indices'], f['indptr']),
+                    shape=tuple(f['shape'])
+                )
+                return cls([str(p) for p in f['pc4s']], adjacency, f['areas_km2'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def load_pc4_graph(geojson_path=GEOJSON_FILE, adjacency_path=ADJACENCY_FILE):
+    """Return the PC4 graph, building and storing it on first use."""
+    if not os.path.exists(geojson_path):
+        return None
+
+    cache_key = (geojson_path, os.path.getmtime(geojson_path))
+    graph = _GRAPH_CACHE.get(cache_key)
+    if graph is not None:
+        return graph
+
+    with open(geojson_path, 'rb') as f:
+        raw = f.read()
+    source_hash = hashlib.sha1(raw).hexdigest()
+
+    graph = PC4Graph.load(adjacency_path, source_hash)
+    if graph is None:
+        graph = PC4Graph.from_geojson(json.loads(raw.decode('utf-8')))
+        try:
+            graph.save(adjacency_path, source_hash)
+        except OSError as e:
+            print(f"Warning: could not store PC4 adjacency: {e}")
+
+    _GRAPH_CACHE.clear()
+    _GRAPH_CACHE[cache_key] = graph
+    return graph
+
+
+def extract_coordinates(place):
+    """Return (lat, lon) for a place, falling back to the Google Maps URL."""
+    if place.get('latitude') is not None and place.get('longitude') is not None:
+        return place['latitude'], place['longitude']
+
+    match = re.search(r'!3d(-?\d+\.\d+)!4d(-?\d+\.\d+)', place.get('url') or '')
+    if match:
+        return float(match.group(1)), float(match.group(2))
+    return None
+
+
+def project_to_meters(lats, lons):
+    """Project lat/lon arrays to a local planar x/y grid in metres."""
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    lat0 = np.radians(lats.mean()) if len(lats) else 0.0
+    x = lons * METERS_PER_DEGREE * np.cos(lat0)
+    y = lats * METERS_PER_DEGREE
+    return np.column_stack([x, y])
+
+
+def competitor_column(radius, same_cuisine=False):
+    """Name of the competitor count column for a radius."""
+    prefix = 'same_cuisine_competitors' if same_cuisine else 'competitors'
+    return f"{prefix}_{radius}m"
+
+
+def compute_competitor_density(places, radii=DEFAULT_COMPETITOR_RADII):
+    """Count all-cuisine and same-cuisine competitors within each radius.
+
+    Every place is queried at once against a KD-tree of all points; counts
+    exclude the place itself. Results are stored on each place as
+    competitors_<r>m / same_cuisine_competitors_<r>m columns (None when the
+    place has no coordinates) and returned as a dict of arrays.
+    """
+    coords = [extract_coordinates(p) for p in places]
+    located = np.array([i for i, c in enumerate(coords) if c is not None], dtype=int)
+
+    columns = {}
+    for radius in radii:
+        columns[competitor_column(radius)] = np.full(len(places), -1, dtype=int)
+        columns[competitor_column(radius, same_cuisine=True)] = np.full(len(places), -1, dtype=int)
+
+    if len(located):
+        xy = project_to_meters(
+            [coords[i][0] for i in located],
+            [coords[i][1] for i in located]
+        )
+        cuisines = np.array([places[i].get('cuisine') or '' for i in located], dtype=object)
+
+        tree = cKDTree(xy)
+        for radius in radii:
+            counts = tree.query_ball_point(xy, r=radius, return_length=True) - 1
+            columns[competitor_column(radius)][located] = counts
+
+        # One tree per cuisine; places without a cuisine have no same-cuisine peers
+        for cuisine in np.unique(cuisines):
+            if not cuisine:
+                continue
+            members = np.flatnonzero(cuisines == cuisine)
+            cuisine_tree = cKDTree(xy[members])
+            for radius in radii:
+                counts = cuisine_tree.query_ball_point(xy[members], r=radius, return_length=True) - 1
+                columns[competitor_column(radius, same_cuisine=True)][located[members]] = counts
+
+    attach_competitor_columns(places, columns)
+    return columns
+
+
+def attach_competitor_columns(places, columns):
+    """Store competitor count arrays on the places they were computed for."""
+    for name, values in columns.items():
+        for place, value in zip(places, values.tolist()):
+            place[name] = value if value >= 0 else None
+
+
+def _polygons(geometry):
+    """Return a list of polygons (lists of rings) for a GeoJSON geometry."""
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+def _polygon_area_km2(polygon):
+    """Area of a polygon in km² using a local equirectangular projection."""
+    area = 0.0
+
+    for ring_idx, ring in enumerate(polygon):
+        coords = np.asarray(ring, dtype=float)
+        if len(coords) < 3:
+            continue
+        lat0 = np.radians(coords[:, 1].mean())
+        x = coords[:, 0] * METERS_PER_DEGREE * np.cos(lat0)
+        y = coords[:, 1] * METERS_PER_DEGREE
+        ring_area = 0.5 * abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1)))
+        # First ring is the outer boundary, the rest are holes
+        area += ring_area if ring_idx == 0 else -ring_area
+
+    return area / 1e6
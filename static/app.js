@@ -152,6 +152,14 @@ async function initMap() {
         maxZoom: 19
     }).addTo(map);
 
+    // Density heatmap overlays, served as pre-rendered tiles by the API
+    const heatmapOptions = { opacity: 0.7, minNativeZoom: 11, maxNativeZoom: 15, maxZoom: 19 };
+    L.control.layers(null, {
+        'Restaurant Density': L.tileLayer(`${API_BASE}/api/heatmap/count/{z}/{x}/{y}`, heatmapOptions),
+        'Average Rating': L.tileLayer(`${API_BASE}/api/heatmap/rating/{z}/{x}/{y}`, heatmapOptions),
+        'Review Volume': L.tileLayer(`${API_BASE}/api/heatmap/reviews/{z}/{x}/{y}`, heatmapOptions)
+    }, { position: 'topright' }).addTo(map);
+
     // Load recommendations
     await loadRecommendations();
     await loadMapData();
@@ -804,7 +812,11 @@ function renderDistrictAnalytics(data) {
         'Saturation Score': d => `${d.saturation_score || 0}/10`,
         'Competitive Intensity': 'competitive_intensity',
         'Avg Competitors/Cuisine': 'avg_competitors_per_cuisine',
-        'Entry Barriers': 'entry_barriers'
+        'Entry Barriers': 'entry_barriers',
+        'Nearby Competitors (250 m)': d => {
+            const nearby = d.nearby_competition?.['250m'];
+            return nearby ? `${nearby.avg_competitors} avg (${nearby.avg_same_cuisine_competitors} same cuisine)` : 'N/A';
+        }
     });
 
     // Positioning
@@ -833,6 +845,17 @@ function renderDistrictAnalytics(data) {
         'Rating Percentile': d => `${d.rating_percentile || 50}th percentile`
     });
 
+    // Neighbourhood-smoothed metrics (district + adjacent PC4s)
+    const spatial = data.spatial_context;
+    if (spatial) {
+        document.getElementById('districtBenchmarks').innerHTML += renderMetricList(spatial, {
+            'Density': d => `${d.density} / km² (neighbourhood ${d.smoothed_density} / km²)`,
+            'Neighbourhood Rating': d => `${d.smoothed_avg_rating}⭐`,
+            'Neighbourhood Diversity': d => `${d.smoothed_cuisine_diversity} cuisines`,
+            'Adjacent Districts': d => (d.neighbours || []).join(', ')
+        });
+    }
+
     // Setup regenerate button
     const regenerateBtn = document.getElementById('regenerateInsights');
     if (regenerateBtn) {
@@ -1261,6 +1284,9 @@ function createRestaurantCard(restaurant) {
     const phone = restaurant.phone || 'Phone not available';
     const cuisine = restaurant.cuisine || 'Cuisine not specified';
     const priceLevel = restaurant.price_level || 'Price not available';
+    const nearbyCompetitors = restaurant.competitors_250m != null
+        ? `${restaurant.competitors_250m} competitors within 250 m (${restaurant.same_cuisine_competitors_250m} same cuisine)`
+        : '';
 
     // Create Google Maps link
     const mapsUrl = restaurant.latitude && restaurant.longitude
@@ -1296,6 +1322,13 @@ function createRestaurantCard(restaurant) {
                 <span>${escapeHtml(priceLevel)}</span>
             </div>
             
+            ${nearbyCompetitors ? `
+                <div class="info-row">
+                    <span class="info-icon">🏘️</span>
+                    <span>${nearbyCompetitors}</span>
+                </div>
+            ` : ''}
+            
             <div class="info-row">
                 <span class="cuisine-tag">${escapeHtml(cuisine)}</span>
             </div>